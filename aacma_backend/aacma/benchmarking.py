@@ -0,0 +1,39 @@
+"""
+Helpers for the ``benchmark_*`` management commands.
+
+Benchmarks seed large synthetic datasets, so they always run against a
+throwaway test database rather than the configured one. Audit entries are
+written inline there, as under ``manage.py test`` (``aacma.test_runner``):
+the in-memory test database fails a background thread's write while the
+benchmark holds a table lock, instead of waiting for it.
+"""
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.test import override_settings
+
+
+@contextmanager
+def benchmark_database(verbosity: int = 0):
+    old_name = connection.creation.create_test_db(
+        verbosity=verbosity, autoclobber=True, serialize=False
+    )
+    try:
+        with override_settings(AUDIT_LOG_WRITER={**settings.AUDIT_LOG_WRITER, "ASYNC": False}):
+            yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+
+
+def best_of(func, repeat: int = 5) -> float:
+    """Best wall-clock time of ``func()`` over ``repeat`` runs, in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
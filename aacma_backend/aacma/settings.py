@@ -34,7 +34,8 @@ INSTALLED_APPS = [
     "notifications.apps.NotificationsConfig",
     "reports",
     "audit",
-    "governance"
+    "governance",
+    "jobs",
   
 ]
 
@@ -70,6 +71,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "aacma.wsgi.application"
+TEST_RUNNER = "aacma.test_runner.TestRunner"
 
 DATABASES = {
     "default": {
@@ -78,6 +80,27 @@ DATABASES = {
     }
 }
 
+# Shared cache. Set DJANGO_REDIS_URL to share it between worker processes
+# (requires the `redis` package); otherwise each process has its own.
+DJANGO_REDIS_URL = os.getenv("DJANGO_REDIS_URL")
+CACHES = {
+    "default": (
+        {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": DJANGO_REDIS_URL,
+        }
+        if DJANGO_REDIS_URL
+        else {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "aacma-default",
+        }
+    )
+}
+
+# Cached analytics sections (see accounts.analytics) expire after this many
+# seconds even if no source model change invalidates them first.
+ANALYTICS_CACHE_TTL_SECONDS = int(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", "300"))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -164,3 +187,112 @@ SWAGGER_SETTINGS = {
     },
 }
 
+
+# Buffered audit log writer (see audit.writer). Set AUDIT_LOG_ASYNC=False to
+# write entries inline; manage.py test always does (aacma.test_runner).
+AUDIT_LOG_WRITER = {
+    "ASYNC": os.getenv("AUDIT_LOG_ASYNC", "True") == "True",
+    "BATCH_SIZE": int(os.getenv("AUDIT_LOG_BATCH_SIZE", "200")),
+    "FLUSH_INTERVAL_SECONDS": float(os.getenv("AUDIT_LOG_FLUSH_INTERVAL", "1.0")),
+    "QUEUE_MAX_SIZE": int(os.getenv("AUDIT_LOG_QUEUE_MAX_SIZE", "10000")),
+    "ENQUEUE_TIMEOUT_SECONDS": 0.01,
+}
+
+# Audit log retention (see audit.archive). Closed partitions older than
+# RETENTION_DAYS are moved to gzip JSONL segments under ROOT by the
+# `archive_audit_logs` command, or by a background thread in each web process
+# every AUTO_ARCHIVE_INTERVAL_SECONDS when AUTO_ARCHIVE is enabled.
+AUDIT_LOG_ARCHIVE = {
+    "ROOT": os.getenv("AUDIT_LOG_ARCHIVE_ROOT", str(BASE_DIR / "audit_archive")),
+    "GRANULARITY": os.getenv("AUDIT_LOG_ARCHIVE_GRANULARITY", "day"),
+    "RETENTION_DAYS": int(os.getenv("AUDIT_LOG_RETENTION_DAYS", "30")),
+    "AUTO_ARCHIVE": os.getenv("AUDIT_LOG_AUTO_ARCHIVE", "False") == "True",
+    "AUTO_ARCHIVE_INTERVAL_SECONDS": 3600,
+}
+
+# Request-level audit sampling (see audit.rules). First matching rule wins;
+# unmatched requests are always logged. Writes are only affected by rules
+# with include_writes=True, and /api/auth/ is always logged. Single driver
+# location pings are folded into per-minute counts; set
+# AUDIT_LOG_AGGREGATE_LOCATION_PINGS=False to log them one by one. Batch
+# uploads are always logged.
+AUDIT_LOG_RULES = [
+    {
+        "name": "driver-location-pings",
+        "path": "/api/driver/location/",
+        "methods": ["POST"],
+        "status": ["2xx"],
+        "include_writes": os.getenv("AUDIT_LOG_AGGREGATE_LOCATION_PINGS", "True") == "True",
+        "decision": "aggregate",
+    },
+    {
+        "name": "notification-polling",
+        "path_prefix": "/api/notifications/",
+        "methods": ["GET"],
+        "status": ["2xx"],
+        "decision": "sample",
+        "rate": 5,
+    },
+    {
+        "name": "analytics-dashboards",
+        "path_prefix": "/api/central/role/analytics/",
+        "methods": ["GET"],
+        "status": ["2xx"],
+        "decision": "sample",
+        "rate": 10,
+    },
+    {
+        "name": "live-fleet-stream",
+        "path_prefix": "/api/fleet/stream/",
+        "decision": "skip",
+    },
+    {
+        "name": "live-fleet-polling",
+        "path_prefix": "/api/fleet/live/",
+        "methods": ["GET"],
+        "status": ["2xx"],
+        "decision": "sample",
+        "rate": 1,
+    },
+    {
+        "name": "job-polling",
+        "path_prefix": "/api/jobs/",
+        "methods": ["GET"],
+        "status": ["2xx"],
+        "decision": "sample",
+        "rate": 5,
+    },
+]
+
+# Background job queue (see jobs.queue). Run workers with
+# `python manage.py run_workers --workers N`, or set JOB_EMBEDDED_WORKER=True
+# to run one worker thread inside each web process instead.
+JOB_QUEUE = {
+    "HANDLERS": {
+        "reports.citywide": "reports.jobs.generate_citywide_report",
+    },
+    "POLL_INTERVAL_SECONDS": float(os.getenv("JOB_POLL_INTERVAL", "1.0")),
+    "TIMEOUT_SECONDS": int(os.getenv("JOB_TIMEOUT_SECONDS", "900")),
+    "HEARTBEAT_SECONDS": 30,
+    "MAX_ATTEMPTS": 3,
+    "RETRY_DELAY_SECONDS": 30,
+    "EMBEDDED_WORKER": os.getenv("JOB_EMBEDDED_WORKER", "False") == "True",
+}
+
+# Latest vehicle positions (see fleet.positions). Fixes are held in memory and
+# the shared cache and written to Vehicle.last_location_* at most once per
+# FLUSH_INTERVAL_SECONDS per vehicle. Set FLEET_POSITION_ASYNC=False to flush
+# inline instead of from a background thread.
+FLEET_POSITIONS = {
+    "ASYNC": os.getenv("FLEET_POSITION_ASYNC", "True") == "True",
+    "FLUSH_INTERVAL_SECONDS": float(os.getenv("FLEET_POSITION_FLUSH_INTERVAL", "10")),
+    "CACHE_TTL_SECONDS": 3600,
+}
+
+# Live fleet stream (see fleet.stream). Each /api/fleet/stream/ listener holds
+# a server thread for up to five minutes, so each web process serves at most
+# MAX_LISTENERS streams and answers 503 beyond that. Keep it well below
+# gunicorn's --threads so ordinary requests still find a free thread.
+FLEET_STREAM = {
+    "MAX_LISTENERS": int(os.getenv("FLEET_STREAM_MAX_LISTENERS", "40")),
+}
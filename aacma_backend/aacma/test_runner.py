@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """
+    ``manage.py test`` with the buffered audit writer and the vehicle position
+    store running inline: their background threads write on connections of
+    their own, which cannot see a test's uncommitted rows and wait on
+    SQLite's lock while a test holds it.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.AUDIT_LOG_WRITER = {**settings.AUDIT_LOG_WRITER, "ASYNC": False}
+        settings.FLEET_POSITIONS = {**settings.FLEET_POSITIONS, "ASYNC": False}
@@ -38,6 +38,7 @@ urlpatterns = [
     path("api/notifications/", include("notifications.urls")),
     path("api/reports/", include("reports.urls")),
     path("api/audit/", include("audit.urls")),
+    path("api/jobs/", include("jobs.urls")),
     # Swagger / Redoc docs
     path(
         "api/docs/swagger/",
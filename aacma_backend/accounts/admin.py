@@ -14,7 +14,7 @@ class UserAdmin(BaseUserAdmin):
         ),
         (
             _("Role & Type"),
-            {"fields": ("user_type", "role", "is_verified")},
+            {"fields": ("user_type", "role", "company", "is_verified")},
         ),
         (
             _("Permissions"),
@@ -0,0 +1,430 @@
+"""
+Analytics snapshot service behind the `role/analytics/*` endpoints.
+
+The overview payload is split into independent sections. Each section is
+computed on its own, cached with a TTL under a per-section version key, and
+invalidated by bumping that version when one of its source models changes
+(see `accounts.signals`). Sub-endpoints compute only the section they serve.
+
+Every section accepts an `AnalyticsFilters` built from the `from`, `to`,
+`zone`, `company` and `waste_type` query parameters, and pushes each filter
+into the queries of the models it applies to. Cached entries are keyed by
+the filters as well as the section version.
+"""
+from __future__ import annotations
+
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+from rest_framework.exceptions import ValidationError
+
+from fleet.models import Vehicle
+from governance.models import ApprovalRequest
+from reports.facts import day_start
+from reports.models import DailyCollectionFact, DailyComplaintFact
+from routes import utilization
+from routes.models import Route
+from waste_collections.models import CollectionRequest, CollectionRecord
+
+CACHE_PREFIX = "analytics:section"
+WASTE_TYPES = {value for value, _ in CollectionRequest.WASTE_TYPES}
+
+
+class AnalyticsFilters:
+    """
+    Filters shared by every analytics section.
+
+    ``start`` and ``end`` are local days, ``end`` exclusive (the ``to`` query
+    parameter is inclusive). Fact tables are filtered on their ``day``, so
+    each measure is restricted by its own date: created requests by
+    ``created_at``, completions by ``collected_at`` and so on.
+    """
+
+    def __init__(self, start=None, end=None, zone=None, company=None, waste_type=None):
+        self.start = start
+        self.end = end
+        self.zone = zone
+        self.company = company
+        self.waste_type = waste_type
+
+    @classmethod
+    def from_query_params(cls, params) -> "AnalyticsFilters":
+        errors = {}
+
+        def parse(name, convert):
+            raw = params.get(name)
+            if raw in (None, ""):
+                return None
+            try:
+                return convert(raw)
+            except ValueError:
+                errors[name] = f"Invalid value {raw!r}."
+
+        start = parse("from", date.fromisoformat)
+        to = parse("to", date.fromisoformat)
+        zone = parse("zone", int)
+        company = parse("company", int)
+        waste_type = params.get("waste_type") or None
+        if waste_type is not None and waste_type not in WASTE_TYPES:
+            errors["waste_type"] = f"Must be one of {', '.join(sorted(WASTE_TYPES))}."
+        if start and to and start > to:
+            errors["to"] = "Must not be before 'from'."
+        if errors:
+            raise ValidationError(errors)
+        return cls(start, to + timedelta(days=1) if to else None, zone, company, waste_type)
+
+    def cache_key(self) -> str:
+        parts = [
+            f"{name}={value}"
+            for name, value in (
+                ("start", self.start),
+                ("end", self.end),
+                ("zone", self.zone),
+                ("company", self.company),
+                ("waste_type", self.waste_type),
+            )
+            if value is not None
+        ]
+        return "&".join(parts) or "all"
+
+    def apply(self, queryset, *, day=None, moment=None, zone=None, company=None, waste_type=None):
+        """
+        Filter ``queryset`` by the lookups given for it: ``day`` for a date
+        field, ``moment`` for a datetime field. Filters with no lookup do not
+        apply to that model and are ignored.
+        """
+        lookups = {}
+        if self.start:
+            if day:
+                lookups[f"{day}__gte"] = self.start
+            if moment:
+                lookups[f"{moment}__gte"] = day_start(self.start)
+        if self.end:
+            if day:
+                lookups[f"{day}__lt"] = self.end
+            if moment:
+                lookups[f"{moment}__lt"] = day_start(self.end)
+        if zone and self.zone is not None:
+            lookups[zone] = self.zone
+        if company and self.company is not None:
+            lookups[company] = self.company
+        if waste_type and self.waste_type is not None:
+            lookups[waste_type] = self.waste_type
+        return queryset.filter(**lookups)
+
+    def collection_facts(self):
+        return self.apply(
+            DailyCollectionFact.objects, day="day", zone="zone", company="company", waste_type="waste_type"
+        )
+
+    def complaint_facts(self):
+        return self.apply(DailyComplaintFact.objects, day="day", zone="zone", company="company")
+
+    def routes(self):
+        return self.apply(Route.objects, day="scheduled_date", zone="zone", company="company")
+
+
+NO_FILTERS = AnalyticsFilters()
+
+
+def _seconds_to_hours(seconds, count):
+    if not count:
+        return 0.0
+    return round(seconds / count / 3600, 2)
+
+
+def compute_totals(filters: AnalyticsFilters = NO_FILTERS):
+    open_requests = ~Q(status__in=["completed", "cancelled"])
+    collections = filters.collection_facts().aggregate(
+        collection_requests=Coalesce(Sum("requests_created"), 0),
+        completed_requests=Coalesce(Sum("requests_created", filter=Q(status="completed")), 0),
+        open_requests=Coalesce(Sum("requests_created", filter=open_requests), 0),
+    )
+    complaints = filters.complaint_facts().aggregate(
+        open_complaints=Coalesce(Sum("reports_count", filter=~Q(status__in=["resolved", "closed"])), 0)
+    )
+    return {"totals": {**collections, **complaints}}
+
+
+def compute_trends(filters: AnalyticsFilters = NO_FILTERS):
+    collections_monthly, completed_monthly, volume_monthly = [], [], []
+    rows = (
+        filters.collection_facts()
+        .annotate(month=TruncMonth("day"))
+        .values("month")
+        .annotate(
+            created=Sum("requests_created"),
+            completed=Sum("requests_completed"),
+            weight=Sum("collected_weight_kg"),
+        )
+        .order_by("month")
+    )
+    for row in rows:
+        # Months are reported as aware datetimes, as the raw-table queries returned them.
+        month = day_start(row["month"])
+        if row["created"]:
+            collections_monthly.append({"month": month, "total": row["created"]})
+        if row["completed"]:
+            completed_monthly.append({"month": month, "total": row["completed"]})
+        if row["weight"]:
+            volume_monthly.append({"month": month, "total_weight_kg": row["weight"]})
+    complaints_monthly = (
+        filters.complaint_facts()
+        .filter(reports_count__gt=0)
+        .annotate(month=TruncMonth("day"))
+        .values("month")
+        .annotate(total=Sum("reports_count"))
+        .order_by("month")
+    )
+    return {
+        "collections_monthly": collections_monthly,
+        "collections_completed_monthly": completed_monthly,
+        "complaints_monthly": [{**row, "month": day_start(row["month"])} for row in complaints_monthly],
+        "collection_volume_trends": volume_monthly,
+    }
+
+
+def _fold(totals: dict, name: str) -> list:
+    return [{name: key, "total": total} for key, total in sorted(totals.items()) if total]
+
+
+def compute_distributions(filters: AnalyticsFilters = NO_FILTERS):
+    by_status, by_waste_type = defaultdict(int), defaultdict(int)
+    completion_seconds = completion_count = 0
+    rows = (
+        filters.collection_facts()
+        .values("status", "waste_type")
+        .annotate(
+            created=Sum("requests_created"),
+            completed=Sum("requests_completed"),
+            seconds=Sum("completion_seconds_sum"),
+        )
+        .order_by()
+    )
+    for row in rows:
+        by_status[row["status"]] += row["created"]
+        by_waste_type[row["waste_type"]] += row["created"]
+        if row["status"] == "completed":
+            completion_seconds += row["seconds"]
+            completion_count += row["completed"]
+    return {
+        "complaints_status_distribution": list(
+            filters.complaint_facts()
+            .values("status")
+            .annotate(total=Sum("reports_count"))
+            .filter(total__gt=0)
+            .order_by("status")
+        ),
+        "request_status_distribution": _fold(by_status, "status"),
+        "waste_type_distribution": _fold(by_waste_type, "waste_type"),
+        "route_status_distribution": list(
+            filters.routes().values("status").annotate(total=Count("id")).order_by("status")
+        ),
+        "vehicle_status_distribution": list(
+            filters.apply(Vehicle.objects, company="company")
+            .values("current_status").annotate(total=Count("id")).order_by("current_status")
+        ),
+        "average_completion_hours": _seconds_to_hours(completion_seconds, completion_count),
+    }
+
+
+def compute_approvals(filters: AnalyticsFilters = NO_FILTERS):
+    by_type = list(
+        filters.apply(ApprovalRequest.objects, moment="created_at")
+        .values("request_type")
+        .annotate(total=Count("id"), pending=Count("id", filter=Q(status="pending")))
+        .order_by("request_type")
+    )
+    return {
+        "approvals_pending": sum(row["pending"] for row in by_type),
+        "approvals_by_type": [{"request_type": row["request_type"], "total": row["total"]} for row in by_type],
+    }
+
+
+def _breakdown(filters: AnalyticsFilters, dimension: str):
+    """Per-``dimension`` request, completion and weight totals from the collection facts."""
+    return (
+        filters.collection_facts()
+        .values(f"{dimension}__id", f"{dimension}__name")
+        .annotate(
+            total_requests=Sum("requests_created"),
+            completed=Sum("requests_created", filter=Q(status="completed")),
+            completion_seconds=Sum("completion_seconds_sum", filter=Q(status="completed")),
+            completion_count=Sum("requests_completed", filter=Q(status="completed")),
+            total_weight_kg=Sum("collected_weight_kg"),
+        )
+        .filter(total_requests__gt=0)
+        .order_by(f"{dimension}__name")
+    )
+
+
+def compute_company_performance(filters: AnalyticsFilters = NO_FILTERS):
+    company_performance = []
+    for item in _breakdown(filters, "company"):
+        total = item["total_requests"]
+        completed = item["completed"] or 0
+        company_performance.append(
+            {
+                "company_id": item["company__id"],
+                "company_name": item["company__name"] or "Unassigned",
+                "total_requests": total,
+                "completed_requests": completed,
+                "completion_rate": round((completed / total) * 100, 2) if total else 0,
+                "avg_completion_hours": _seconds_to_hours(
+                    item["completion_seconds"] or 0, item["completion_count"]
+                ),
+                "total_collected_weight_kg": float(item["total_weight_kg"] or 0),
+            }
+        )
+    return {"company_performance": company_performance}
+
+
+def compute_area_insights(filters: AnalyticsFilters = NO_FILTERS):
+    return {
+        "area_insights": [
+            {
+                "zone_id": item["zone__id"],
+                "zone_name": item["zone__name"] or "Unassigned",
+                "total_requests": item["total_requests"],
+                "completed_requests": item["completed"] or 0,
+                "total_collected_weight_kg": float(item["total_weight_kg"] or 0),
+            }
+            for item in _breakdown(filters, "zone")
+        ]
+    }
+
+
+def compute_utilization(filters: AnalyticsFilters = NO_FILTERS):
+    return utilization.compute(filters.routes())
+
+
+def compute_recent_activity(filters: AnalyticsFilters = NO_FILTERS):
+    recent_requests = (
+        filters.apply(
+            CollectionRequest.objects,
+            moment="created_at",
+            zone="zone",
+            company="assigned_company",
+            waste_type="waste_type",
+        )
+        .select_related("assigned_company", "zone")
+        .order_by("-created_at")[:200]
+    )
+    recent_records = (
+        filters.apply(
+            CollectionRecord.objects,
+            moment="collected_at",
+            zone="collection_request__zone",
+            company="collection_request__assigned_company",
+            waste_type="collection_request__waste_type",
+        )
+        .select_related("collection_request", "vehicle", "driver")
+        .order_by("-created_at")[:200]
+    )
+    return {
+        "recent_requests": [
+            {
+                "request_id": req.id,
+                "request_type": req.waste_type,
+                "submitted_at": req.created_at.isoformat(),
+                "assigned_company": req.assigned_company.name if req.assigned_company else None,
+                "status": req.status,
+                "status_updated_at": req.updated_at.isoformat() if req.updated_at else None,
+                "completed_at": req.collected_at.isoformat() if req.collected_at else None,
+                "latitude": req.latitude,
+                "longitude": req.longitude,
+                "zone": req.zone.name if req.zone else None,
+            }
+            for req in recent_requests
+        ],
+        "recent_collection_records": [
+            {
+                "record_id": record.id,
+                "request_id": record.collection_request_id,
+                "truck_id": record.vehicle_id,
+                "driver_id": record.driver_id,
+                "collected_at": record.collected_at.isoformat(),
+                "actual_weight_kg": record.actual_weight_kg,
+            }
+            for record in recent_records
+        ],
+    }
+
+
+# Section name -> compute function. Order matches the overview payload.
+SECTIONS = {
+    "totals": compute_totals,
+    "trends": compute_trends,
+    "distributions": compute_distributions,
+    "approvals": compute_approvals,
+    "company_performance": compute_company_performance,
+    "area_insights": compute_area_insights,
+    "utilization": compute_utilization,
+    "recent_activity": compute_recent_activity,
+}
+
+# Source model -> (sections it feeds, fields that matter or None for all).
+# A save whose update_fields miss every listed field does not invalidate.
+SECTION_SOURCES = {
+    "collections.CollectionRequest": (["recent_activity"], None),
+    "collections.CollectionRecord": (["recent_activity"], None),
+    "governance.ApprovalRequest": (["approvals"], None),
+    "routes.Route": (["distributions", "utilization"], None),
+    "fleet.Vehicle": (["distributions", "utilization"], {"current_status", "plate_number"}),
+    "companies.WasteCompany": (["company_performance", "recent_activity"], {"name"}),
+    "zones.Zone": (["area_insights", "recent_activity"], {"name"}),
+    "accounts.User": (["recent_activity"], {"zone", "zone_id"}),
+}
+
+# Fact model -> sections built from it, invalidated whenever its rows are
+# replaced (see reports.facts.facts_refreshed).
+FACT_SECTIONS = {
+    DailyCollectionFact: ["totals", "trends", "distributions", "company_performance", "area_insights"],
+    DailyComplaintFact: ["totals", "trends", "distributions"],
+}
+
+
+def _version_key(section: str) -> str:
+    return f"{CACHE_PREFIX}:{section}:version"
+
+
+def _current_version(section: str) -> int:
+    key = _version_key(section)
+    version = cache.get(key)
+    if version is None:
+        # Time-based seed so a lost version key never resurrects stale data.
+        version = int(time.time() * 1000)
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def get_section(section: str, filters: AnalyticsFilters = NO_FILTERS) -> dict:
+    """Return one cached section, computing it on a miss."""
+    key = f"{CACHE_PREFIX}:{section}:v{_current_version(section)}:{filters.cache_key()}"
+    data = cache.get(key)
+    if data is None:
+        data = SECTIONS[section](filters)
+        cache.set(key, data, timeout=getattr(settings, "ANALYTICS_CACHE_TTL_SECONDS", 300))
+    return data
+
+
+def get_snapshot(filters: AnalyticsFilters = NO_FILTERS) -> dict:
+    snapshot = {}
+    for section in SECTIONS:
+        snapshot.update(get_section(section, filters))
+    return snapshot
+
+
+def invalidate(sections) -> None:
+    for section in sections:
+        key = _version_key(section)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, int(time.time() * 1000), timeout=None)
@@ -20,6 +20,8 @@ from .role_views import (
     analytics_company_performance,
     analytics_area_insights,
     analytics_vehicle_utilization,
+    analytics_percentiles,
+    analytics_heatmap,
     audit_overview,
 )
 
@@ -50,6 +52,8 @@ urlpatterns = [
     path("role/analytics/company-performance/", analytics_company_performance, name="role-analytics-company-performance"),
     path("role/analytics/area-insights/", analytics_area_insights, name="role-analytics-area-insights"),
     path("role/analytics/vehicle-utilization/", analytics_vehicle_utilization, name="role-analytics-vehicle-utilization"),
+    path("role/analytics/percentiles/", analytics_percentiles, name="role-analytics-percentiles"),
+    path("role/analytics/heatmap/", analytics_heatmap, name="role-analytics-heatmap"),
     path("role/audit/overview/", audit_overview, name="role-audit-overview"),
 ]
 
@@ -0,0 +1,147 @@
+import random
+from io import StringIO
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from aacma.benchmarking import benchmark_database, best_of
+from accounts.models import Role, User
+from accounts.role_views import (
+    analytics_area_insights,
+    analytics_company_performance,
+    analytics_overview,
+    analytics_vehicle_utilization,
+)
+from companies.models import WasteCompany
+from complaints.models import WasteReport
+from reports.facts import refresh_collection_facts, refresh_complaint_facts, source_day_range
+from waste_collections.models import CollectionRecord, CollectionRequest
+
+# Queries each endpoint may issue on a cold cache, whatever the data volume.
+# Raise a limit only together with the change that needs the extra query.
+PINNED_QUERIES = {
+    "overview": (analytics_overview, 15),
+    "company-performance": (analytics_company_performance, 1),
+    "area-insights": (analytics_area_insights, 1),
+    "vehicle-utilization": (analytics_vehicle_utilization, 2),
+}
+
+STATUSES = ["pending", "assigned", "in_progress", "completed", "cancelled"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Count the queries issued by the analytics endpoints on a cold and a warm "
+        "cache, and fail if a cold request exceeds its pinned query count. Runs "
+        "against a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=20_000)
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            user = self._seed(options["requests"])
+            factory = APIRequestFactory()
+            failures = []
+            self.stdout.write(f"{'endpoint':<22} {'cold q':>7} {'warm q':>7} {'cold ms':>9} {'warm ms':>9}")
+            for name, (view, limit) in PINNED_QUERIES.items():
+
+                def call():
+                    request = factory.get(f"/api/central/role/analytics/{name}/")
+                    force_authenticate(request, user=user)
+                    response = view(request)
+                    if response.status_code != 200:
+                        raise CommandError(f"{name} returned {response.status_code}")
+
+                def cold():
+                    cache.clear()
+                    call()
+
+                cache.clear()
+                with CaptureQueriesContext(connection) as cold_queries:
+                    call()
+                with CaptureQueriesContext(connection) as warm_queries:
+                    call()
+                self.stdout.write(
+                    f"{name:<22} {len(cold_queries):>7} {len(warm_queries):>7} "
+                    f"{best_of(cold, options['repeat']):>9.1f} {best_of(call, options['repeat']):>9.1f}"
+                )
+                if len(cold_queries) > limit:
+                    failures.append(f"{name}: {len(cold_queries)} queries (pinned at {limit})")
+            if failures:
+                raise CommandError("Analytics query count regressed:\n" + "\n".join(failures))
+            self.stdout.write(self.style.SUCCESS("Query counts within pinned limits."))
+
+    def _seed(self, count):
+        call_command("seed_data", stdout=StringIO())
+        call_command("seed_waste_company_sample", stdout=StringIO())
+        self.stdout.write(f"Seeding {count:,} collection requests...")
+        user = User.objects.create_user(
+            username="bench-analytics",
+            password="bench-analytics",
+            user_type="central_authority",
+            role=Role.objects.get(slug="analytics"),
+        )
+        template = CollectionRequest.objects.first()
+        companies = list(WasteCompany.objects.all()) + [None]
+        rng = random.Random(0)
+        # bulk_create skips the fact-table signals; the facts are rebuilt below.
+        requests = CollectionRequest.objects.bulk_create(
+            [
+                CollectionRequest(
+                    resident_id=template.resident_id,
+                    waste_type=template.waste_type,
+                    preferred_date=template.preferred_date,
+                    preferred_time=template.preferred_time,
+                    address=template.address,
+                    status=rng.choice(STATUSES),
+                    assigned_company=rng.choice(companies),
+                )
+                for _ in range(count)
+            ],
+            batch_size=2000,
+        )
+        # created_at is auto_now_add, so spread the rows over a year afterwards.
+        now = timezone.now()
+        ids = [request.pk for request in requests]
+        days = 365
+        chunk = max(count // days, 1)
+        for offset in range(0, count, chunk):
+            created = now - timedelta(days=offset // chunk % days, hours=rng.randint(0, 23))
+            in_chunk = CollectionRequest.objects.filter(pk__in=ids[offset : offset + chunk])
+            in_chunk.update(created_at=created)
+            in_chunk.filter(status="completed").update(collected_at=created + timedelta(hours=rng.randint(1, 72)))
+        CollectionRecord.objects.bulk_create(
+            [
+                CollectionRecord(collection_request_id=pk, collected_at=collected_at, actual_weight_kg=rng.uniform(1, 60))
+                for pk, collected_at in CollectionRequest.objects.filter(
+                    pk__in=ids, collected_at__isnull=False
+                ).values_list("pk", "collected_at")
+            ],
+            batch_size=2000,
+        )
+        WasteReport.objects.bulk_create(
+            [
+                WasteReport(
+                    resident_id=template.resident_id,
+                    report_type="missed_collection",
+                    description="benchmark",
+                    location_address=template.address,
+                    status=rng.choice(["pending", "resolved", "closed"]),
+                )
+                for _ in range(count // 10)
+            ],
+            batch_size=2000,
+        )
+        start, end = source_day_range()
+        refresh_collection_facts(start, end)
+        refresh_complaint_facts(start, end)
+        return user
@@ -51,6 +51,7 @@ class Command(BaseCommand):
         )
         manager.role = company_role
         manager.user_type = "waste_company"
+        manager.company = company
         if created_manager or not manager.has_usable_password():
             manager.set_password("Paassword@2029")
         manager.save()
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def link_single_company(apps, schema_editor):
+    # Company views used to act for the first company. With exactly one
+    # company that is unambiguous, so keep those accounts working.
+    WasteCompany = apps.get_model("companies", "WasteCompany")
+    User = apps.get_model("accounts", "User")
+    companies = list(WasteCompany.objects.values_list("id", flat=True)[:2])
+    if len(companies) == 1:
+        User.objects.filter(user_type="waste_company", company__isnull=True).update(
+            company_id=companies[0]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0001_initial"),
+        ("companies", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="company",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="staff",
+                to="companies.wastecompany",
+            ),
+        ),
+        migrations.RunPython(link_single_company, migrations.RunPython.noop),
+    ]
@@ -54,6 +54,10 @@ class User(AbstractUser):
     zone = models.ForeignKey(
         "zones.Zone", on_delete=models.SET_NULL, null=True, blank=True
     )
+    # The company a waste_company user works for.
+    company = models.ForeignKey(
+        "companies.WasteCompany", on_delete=models.SET_NULL, null=True, blank=True, related_name="staff"
+    )
     is_verified = models.BooleanField(default=False)
     profile_image = models.ImageField(upload_to="profiles/", null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
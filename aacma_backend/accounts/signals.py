@@ -0,0 +1,33 @@
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from reports.facts import facts_refreshed
+
+from . import analytics
+
+
+def _make_invalidator(sections, fields):
+    def invalidate_analytics(sender, update_fields=None, raw=False, **kwargs):
+        if raw:
+            return
+        if fields is not None and update_fields is not None and not fields.intersection(update_fields):
+            return
+        transaction.on_commit(lambda: analytics.invalidate(sections))
+
+    return invalidate_analytics
+
+
+for _label, (_sections, _fields) in analytics.SECTION_SOURCES.items():
+    _model = apps.get_model(_label)
+    _receiver = _make_invalidator(_sections, _fields)
+    post_save.connect(_receiver, sender=_model, weak=False, dispatch_uid=f"analytics-{_label}-save")
+    post_delete.connect(_receiver, sender=_model, weak=False, dispatch_uid=f"analytics-{_label}-delete")
+
+
+def _invalidate_fact_sections(sender, **kwargs):
+    transaction.on_commit(lambda: analytics.invalidate(analytics.FACT_SECTIONS[sender]))
+
+
+for _model in analytics.FACT_SECTIONS:
+    facts_refreshed.connect(_invalidate_fact_sections, sender=_model, dispatch_uid=f"analytics-{_model.__name__}")
@@ -0,0 +1,247 @@
+from datetime import date, time, timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from companies.models import WasteCompany
+from complaints.models import WasteReport
+from fleet.models import Vehicle
+from reports.facts import refresh_collection_facts, source_day_range
+from reports.models import DailyCollectionFact
+from routes.models import Route
+from waste_collections.models import CollectionRecord, CollectionRequest
+from zones.models import Zone
+
+from . import analytics
+from .management.commands.benchmark_analytics_queries import PINNED_QUERIES
+from .models import Role, User
+
+# Queries each overview section issues on a cold cache; they add up to the
+# overview's pinned count.
+SECTION_QUERIES = {
+    "totals": 2,
+    "trends": 2,
+    "distributions": 4,
+    "approvals": 1,
+    "company_performance": 1,
+    "area_insights": 1,
+    "utilization": 2,
+    "recent_activity": 2,
+}
+
+
+class AnalyticsQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        company = WasteCompany.objects.create(
+            name="Clean City", license_number="L-1", contact_email="a@example.com", contact_phone="1", address="-"
+        )
+        zone = Zone.objects.create(name="Bole", code="BL")
+        resident = User.objects.create_user("resident", password="x", user_type="resident", zone=zone)
+        vehicle = Vehicle.objects.create(
+            plate_number="AA-1", vehicle_type="compactor", capacity_kg=5000, company=company
+        )
+        for status in ("pending", "completed"):
+            request = CollectionRequest.objects.create(
+                resident=resident,
+                waste_type="general",
+                preferred_date=date.today(),
+                preferred_time="morning",
+                address="-",
+                status=status,
+                assigned_company=company,
+            )
+        CollectionRecord.objects.create(collection_request=request, collected_at=timezone.now(), actual_weight_kg=12)
+        WasteReport.objects.create(resident=resident, report_type="other", description="-", location_address="-")
+        Route.objects.create(
+            name="Bole morning",
+            company=company,
+            zone=zone,
+            assigned_vehicle=vehicle,
+            scheduled_date=date.today(),
+            scheduled_start_time=time(6, 0),
+        )
+        role = Role.objects.create(name="Analytics", slug="analytics", level="Strategic", authority_type="Central")
+        cls.user = User.objects.create_user("analyst", password="x", user_type="central_authority", role=role)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_sections(self):
+        self.assertEqual(list(SECTION_QUERIES), list(analytics.SECTIONS))
+        for section, queries in SECTION_QUERIES.items():
+            with self.subTest(section), self.assertNumQueries(queries):
+                analytics.get_section(section)
+            # Served from the cache the second time.
+            with self.subTest(section, cache="warm"), self.assertNumQueries(0):
+                analytics.get_section(section)
+
+    def test_endpoints(self):
+        self.assertEqual(PINNED_QUERIES["overview"][1], sum(SECTION_QUERIES.values()))
+        factory = APIRequestFactory()
+        for name, (view, queries) in PINNED_QUERIES.items():
+            request = factory.get(f"/api/central/role/analytics/{name}/")
+            force_authenticate(request, user=self.user)
+            cache.clear()
+            with self.subTest(name), self.assertNumQueries(queries):
+                self.assertEqual(view(request).status_code, 200)
+
+
+class AnalyticsCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = WasteCompany.objects.create(
+            name="Clean City", license_number="L-1", contact_email="a@example.com", contact_phone="1", address="-"
+        )
+        cls.zone = Zone.objects.create(name="Bole", code="BL")
+        cls.resident = User.objects.create_user("resident", password="x", user_type="resident")
+        cls.vehicle = Vehicle.objects.create(
+            plate_number="AA-1", vehicle_type="compactor", capacity_kg=5000, company=cls.company
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def versions(self) -> dict:
+        return {section: analytics._current_version(section) for section in analytics.SECTIONS}
+
+    def invalidated(self, change) -> set:
+        before = self.versions()
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        after = self.versions()
+        return {section for section in before if before[section] != after[section]}
+
+    def request(self, **fields):
+        return CollectionRequest.objects.create(
+            resident=self.resident,
+            waste_type="general",
+            preferred_date=date.today(),
+            preferred_time="morning",
+            address="-",
+            **fields,
+        )
+
+    def test_sources_invalidate_their_sections(self):
+        self.assertEqual(
+            self.invalidated(self.request),
+            {"recent_activity", *analytics.FACT_SECTIONS[DailyCollectionFact]},
+        )
+        self.vehicle.fuel_level = 50
+        self.assertEqual(self.invalidated(lambda: self.vehicle.save(update_fields=["fuel_level"])), set())
+        self.vehicle.current_status = "active"
+        self.assertEqual(
+            self.invalidated(lambda: self.vehicle.save(update_fields=["current_status"])),
+            {"distributions", "utilization"},
+        )
+        self.assertEqual(
+            self.invalidated(lambda: Zone.objects.create(name="Yeka", code="YK")), {"area_insights", "recent_activity"}
+        )
+
+    def test_cached_until_invalidated(self):
+        self.assertEqual(analytics.get_section("totals")["totals"]["collection_requests"], 0)
+        # A fact row written behind the signals' back is not seen yet...
+        DailyCollectionFact.objects.create(
+            day=timezone.localdate(), waste_type="general", status="pending", requests_created=5
+        )
+        self.assertEqual(analytics.get_section("totals")["totals"]["collection_requests"], 0)
+        # ...until a change to the facts invalidates the section.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.request(status="completed")
+        totals = analytics.get_section("totals")["totals"]
+        self.assertEqual((totals["collection_requests"], totals["completed_requests"]), (6, 1))
+
+    def test_filters_are_cached_separately(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.request(zone=self.zone)
+            self.request()
+        zone_only = analytics.AnalyticsFilters(zone=self.zone.pk)
+        self.assertEqual(analytics.get_section("totals", zone_only)["totals"]["collection_requests"], 1)
+        self.assertEqual(analytics.get_section("totals")["totals"]["collection_requests"], 2)
+        with self.assertNumQueries(0):
+            analytics.get_section("totals", zone_only)
+
+    def test_lost_version_key_does_not_serve_stale_data(self):
+        analytics.get_section("totals")
+        cache.delete(analytics._version_key("totals"))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.request()
+        cache.delete(analytics._version_key("totals"))
+        self.assertEqual(analytics.get_section("totals")["totals"]["collection_requests"], 1)
+
+
+class AnalyticsFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.companies = [
+            WasteCompany.objects.create(
+                name=f"Company {n}",
+                license_number=f"L-{n}",
+                contact_email="a@example.com",
+                contact_phone="1",
+                address="-",
+            )
+            for n in (1, 2)
+        ]
+        cls.zones = [Zone.objects.create(name=name, code=name[:2].upper()) for name in ("Bole", "Yeka")]
+        resident = User.objects.create_user("resident", password="x", user_type="resident")
+        rows = [
+            # (company, zone, waste type, days ago)
+            (0, 0, "general", 0),
+            (0, 0, "organic", 0),
+            (1, 1, "general", 0),
+            (0, 1, "general", 40),
+        ]
+        for company, zone, waste_type, days_ago in rows:
+            request = CollectionRequest.objects.create(
+                resident=resident,
+                waste_type=waste_type,
+                preferred_date=date.today(),
+                preferred_time="morning",
+                address="-",
+                assigned_company=cls.companies[company],
+                zone=cls.zones[zone],
+            )
+            CollectionRequest.objects.filter(pk=request.pk).update(
+                created_at=request.created_at - timedelta(days=days_ago)
+            )
+        start, end = source_day_range()
+        refresh_collection_facts(start, end)
+        role = Role.objects.create(name="Analytics", slug="analytics", level="Strategic", authority_type="Central")
+        cls.user = User.objects.create_user("analyst", password="x", user_type="central_authority", role=role)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def totals(self, **params):
+        response = self.client.get("/api/central/role/analytics/company-performance/", params)
+        self.assertEqual(response.status_code, 200)
+        return {row["company_name"]: row["total_requests"] for row in response.data}
+
+    def test_filters(self):
+        today = timezone.localdate()
+        self.assertEqual(self.totals(), {"Company 1": 3, "Company 2": 1})
+        self.assertEqual(self.totals(**{"from": today - timedelta(days=7)}), {"Company 1": 2, "Company 2": 1})
+        # `to` is inclusive.
+        self.assertEqual(self.totals(to=today - timedelta(days=40)), {"Company 1": 1})
+        self.assertEqual(self.totals(zone=self.zones[1].pk), {"Company 1": 1, "Company 2": 1})
+        self.assertEqual(self.totals(company=self.companies[1].pk), {"Company 2": 1})
+        self.assertEqual(self.totals(waste_type="organic"), {"Company 1": 1})
+
+    def test_invalid_filters(self):
+        response = self.client.get(
+            "/api/central/role/analytics/overview/",
+            {"from": "2026-02-01", "to": "2026-01-01", "zone": "bole", "waste_type": "glass"},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {"to", "zone", "waste_type"})
+        self.assertEqual(self.client.get("/api/central/role/analytics/overview/", {"from": "May"}).status_code, 400)
+
+    def test_to_is_inclusive(self):
+        filters = analytics.AnalyticsFilters.from_query_params({"from": "2026-01-01", "to": "2026-01-31"})
+        self.assertEqual((filters.start, filters.end), (date(2026, 1, 1), date(2026, 2, 1)))
+        self.assertEqual(filters.cache_key(), "start=2026-01-01&end=2026-02-01")
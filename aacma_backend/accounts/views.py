@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from rest_framework import generics, permissions, status, viewsets
 from rest_framework.decorators import action, api_view, permission_classes
@@ -9,7 +10,9 @@ from waste_collections.serializers import CollectionRequestSerializer
 from complaints.models import WasteReport
 from companies.models import WasteCompany
 from fleet.models import Vehicle
+from fleet.positions import get_position_store
 from audit.models import AuditLog
+from audit.writer import get_audit_writer
 from .serializers import (
     RegisterSerializer,
     MeSerializer,
@@ -220,7 +223,9 @@ def system_metrics(request):
     return Response(
         {
             "db": "ok",
-            "cache": "n/a",
+            "cache": settings.CACHES["default"]["BACKEND"].rsplit(".", 1)[-1],
+            "audit_writer": get_audit_writer().stats(),
+            "fleet_positions": get_position_store().stats(),
         }
     )
 
@@ -231,12 +236,14 @@ def system_backup(request):
     """
     Placeholder for triggering system backup.
     """
-    AuditLog.objects.create(
-        user=request.user if request.user.is_authenticated else None,
-        action="backup",
-        model_name="system",
-        object_id="backup",
-        changes={},
+    get_audit_writer().enqueue(
+        AuditLog(
+            user=request.user if request.user.is_authenticated else None,
+            action="backup",
+            model_name="system",
+            object_id="backup",
+            changes={},
+        )
     )
     return Response({"detail": "Backup triggered"}, status=status.HTTP_202_ACCEPTED)
 
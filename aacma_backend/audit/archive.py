@@ -0,0 +1,322 @@
+"""
+Retention and archival for the audit trail.
+
+Closed day or month partitions of ``AuditLog`` are exported to gzip-compressed
+JSONL segment files and then deleted from the hot table. ``manifest.json`` in
+the archive root indexes every segment by time range and id range so archived
+ranges can still be read back on demand.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ROOT": None,
+    "GRANULARITY": "day",
+    "RETENTION_DAYS": 30,
+    "AUTO_ARCHIVE": False,
+    "AUTO_ARCHIVE_INTERVAL_SECONDS": 3600,
+}
+
+MANIFEST_NAME = "manifest.json"
+LOCK_NAME = ".archive.lock"
+LOCK_STALE_SECONDS = 6 * 3600
+GRANULARITIES = ("day", "month")
+
+EXPORT_FIELDS = [
+    "id",
+    "user_id",
+    "action",
+    "model_name",
+    "object_id",
+    "changes",
+    "ip_address",
+    "user_agent",
+    "timestamp",
+]
+
+
+def get_config() -> dict:
+    config = {**DEFAULTS, **getattr(settings, "AUDIT_LOG_ARCHIVE", {})}
+    if not config["ROOT"]:
+        config["ROOT"] = os.path.join(settings.BASE_DIR, "audit_archive")
+    return config
+
+
+def partition_start(value: datetime, granularity: str) -> datetime:
+    local = timezone.localtime(value)
+    start = local.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "month":
+        start = start.replace(day=1)
+    return timezone.make_aware(start.replace(tzinfo=None))
+
+
+def partition_end(start: datetime, granularity: str) -> datetime:
+    local = timezone.localtime(start).replace(tzinfo=None)
+    if granularity == "month":
+        year, month = (local.year + 1, 1) if local.month == 12 else (local.year, local.month + 1)
+        end = local.replace(year=year, month=month, day=1)
+    else:
+        end = local + timedelta(days=1)
+    return timezone.make_aware(end)
+
+
+def partition_label(start: datetime, granularity: str) -> str:
+    local = timezone.localtime(start)
+    return local.strftime("%Y-%m") if granularity == "month" else local.strftime("%Y-%m-%d")
+
+
+def load_manifest(root: str | None = None) -> dict:
+    root = root or get_config()["ROOT"]
+    path = os.path.join(root, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {"version": 1, "segments": []}
+    with open(path, "r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def _save_manifest(root: str, manifest: dict) -> None:
+    manifest["segments"].sort(key=lambda seg: (seg["start"], seg["max_id"]))
+    path = os.path.join(root, MANIFEST_NAME)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _serialize(row: dict) -> str:
+    row["timestamp"] = row["timestamp"].isoformat()
+    return json.dumps(row, default=str, separators=(",", ":"))
+
+
+def archive_partition(start: datetime, granularity: str, root: str, dry_run: bool = False) -> dict | None:
+    """
+    Export one closed partition to a segment file and delete it from the hot table.
+
+    Rows already covered by an earlier segment of the same partition (matched
+    on ``max_id``) are deleted without being exported again, which keeps a
+    rerun after an interrupted delete idempotent.
+    """
+    end = partition_end(start, granularity)
+    label = partition_label(start, granularity)
+    manifest = load_manifest(root)
+    previous = [seg for seg in manifest["segments"] if seg["partition"] == label]
+    archived_max_id = max((seg["max_id"] for seg in previous), default=0)
+
+    in_range = AuditLog.objects.filter(timestamp__gte=start, timestamp__lt=end)
+    if archived_max_id and not dry_run:
+        in_range.filter(id__lte=archived_max_id).delete()
+    pending = in_range.filter(id__gt=archived_max_id).order_by("timestamp", "id")
+
+    if dry_run:
+        count = pending.count()
+        return {"partition": label, "rows": count} if count else None
+
+    local = timezone.localtime(start)
+    suffix = f"-{len(previous) + 1}" if previous else ""
+    relative_path = os.path.join(
+        local.strftime("%Y"), local.strftime("%m"), f"audit-{label}{suffix}.jsonl.gz"
+    )
+    path = os.path.join(root, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    rows = 0
+    min_id = max_id = None
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as fh:
+        for row in pending.values(*EXPORT_FIELDS).iterator(chunk_size=2000):
+            fh.write(_serialize(row))
+            fh.write("\n")
+            rows += 1
+            min_id = row["id"] if min_id is None else min(min_id, row["id"])
+            max_id = row["id"] if max_id is None else max(max_id, row["id"])
+    if not rows:
+        os.remove(tmp_path)
+        return None
+    os.replace(tmp_path, path)
+
+    segment = {
+        "partition": label,
+        "granularity": granularity,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "path": relative_path.replace(os.sep, "/"),
+        "rows": rows,
+        "min_id": min_id,
+        "max_id": max_id,
+        "bytes": os.path.getsize(path),
+        "created_at": timezone.now().isoformat(),
+    }
+    manifest["segments"].append(segment)
+    _save_manifest(root, manifest)
+
+    in_range.filter(id__gte=min_id, id__lte=max_id).delete()
+    return segment
+
+
+def archive_closed_partitions(
+    retention_days: int | None = None,
+    granularity: str | None = None,
+    root: str | None = None,
+    dry_run: bool = False,
+) -> list[dict]:
+    """
+    Archive every partition that ended before the retention cutoff.
+
+    The cutoff is aligned to a partition boundary so a partition is only ever
+    archived once it is fully closed.
+    """
+    config = get_config()
+    retention_days = config["RETENTION_DAYS"] if retention_days is None else retention_days
+    granularity = granularity or config["GRANULARITY"]
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    root = root or config["ROOT"]
+    os.makedirs(root, exist_ok=True)
+
+    cutoff = partition_start(timezone.now() - timedelta(days=retention_days), granularity)
+    segments = []
+    next_ts = (
+        AuditLog.objects.filter(timestamp__lt=cutoff)
+        .order_by("timestamp")
+        .values_list("timestamp", flat=True)
+        .first()
+    )
+    while next_ts is not None:
+        start = partition_start(next_ts, granularity)
+        segment = archive_partition(start, granularity, root, dry_run=dry_run)
+        if segment:
+            segments.append(segment)
+        end = partition_end(start, granularity)
+        next_ts = (
+            AuditLog.objects.filter(timestamp__gte=end, timestamp__lt=cutoff)
+            .order_by("timestamp")
+            .values_list("timestamp", flat=True)
+            .first()
+        )
+    return segments
+
+
+def iter_archived_logs(
+    start: datetime | None = None,
+    end: datetime | None = None,
+    filters: dict | None = None,
+    root: str | None = None,
+):
+    """
+    Yield archived entries (as dicts) whose timestamp falls in ``[start, end)``.
+
+    Only segments overlapping the range are opened. ``filters`` may contain
+    ``user``, ``action`` and ``model_name`` equality filters.
+    """
+    root = root or get_config()["ROOT"]
+    filters = {key: value for key, value in (filters or {}).items() if value not in (None, "")}
+    if "user" in filters:
+        filters["user_id"] = int(filters.pop("user"))
+    for segment in load_manifest(root)["segments"]:
+        seg_start = parse_datetime(segment["start"])
+        seg_end = parse_datetime(segment["end"])
+        if (start and seg_end <= start) or (end and seg_start >= end):
+            continue
+        with gzip.open(os.path.join(root, segment["path"]), "rt", encoding="utf-8") as fh:
+            for line in fh:
+                row = json.loads(line)
+                timestamp = parse_datetime(row["timestamp"])
+                if (start and timestamp < start) or (end and timestamp >= end):
+                    continue
+                if any(row.get(key) != value for key, value in filters.items()):
+                    continue
+                yield row
+
+
+@contextmanager
+def archive_lock(root: str):
+    """
+    Exclusive lock file in the archive root, so several workers (or a cron
+    job and a worker) can share one archive directory. Yields False when
+    another process already holds the lock.
+    """
+    os.makedirs(root, exist_ok=True)
+    lock_path = os.path.join(root, LOCK_NAME)
+    try:
+        if time.time() - os.path.getmtime(lock_path) > LOCK_STALE_SECONDS:
+            os.remove(lock_path)
+    except OSError:
+        pass
+    try:
+        fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        yield False
+        return
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        yield True
+    finally:
+        os.close(fd)
+        os.remove(lock_path)
+
+
+def run_scheduled_archive() -> list[dict]:
+    """Scheduler hook: archive closed partitions unless another process already is."""
+    root = get_config()["ROOT"]
+    with archive_lock(root) as acquired:
+        if not acquired:
+            return []
+        segments = archive_closed_partitions(root=root)
+    if segments:
+        logger.info("Archived %d audit log partitions", len(segments))
+    return segments
+
+
+def _archive_periodically(interval: float) -> None:
+    while True:
+        time.sleep(interval)
+        try:
+            run_scheduled_archive()
+        except Exception:
+            logger.exception("Scheduled audit log archive failed")
+        finally:
+            close_old_connections()
+
+
+_scheduler_lock = threading.Lock()
+_scheduler_pid = None
+
+
+def ensure_scheduled_archive() -> None:
+    """
+    With ``AUTO_ARCHIVE``, start this process's archive thread (once per
+    process). Archiving runs on its own thread so a long export never holds
+    up the audit writer.
+    """
+    global _scheduler_pid
+    if _scheduler_pid == os.getpid():
+        return
+    with _scheduler_lock:
+        if _scheduler_pid == os.getpid():
+            return
+        config = get_config()
+        if config["AUTO_ARCHIVE"]:
+            threading.Thread(
+                target=_archive_periodically,
+                args=(config["AUTO_ARCHIVE_INTERVAL_SECONDS"],),
+                name="audit-archive",
+                daemon=True,
+            ).start()
+        _scheduler_pid = os.getpid()
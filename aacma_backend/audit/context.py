@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from contextvars import ContextVar
+
+_current_request: ContextVar = ContextVar("audit_current_request", default=None)
+
+
+def set_current_request(request):
+    return _current_request.set(request)
+
+
+def reset_current_request(token) -> None:
+    _current_request.reset(token)
+
+
+def get_client_ip(request) -> str | None:
+    xff = request.META.get("HTTP_X_FORWARDED_FOR")
+    if xff:
+        return xff.split(",")[0].strip()
+    return request.META.get("REMOTE_ADDR")
+
+
+def current_request_metadata() -> dict:
+    """
+    User, IP and user agent of the request being handled, for audit entries
+    written outside the middleware (e.g. model change capture).
+
+    ``request.user`` is read lazily, so DRF authentication that runs inside
+    the view is already reflected here.
+    """
+    request = _current_request.get()
+    if request is None:
+        return {"user_id": None, "ip_address": None, "user_agent": ""}
+    user = getattr(request, "user", None)
+    return {
+        "user_id": user.pk if user and user.is_authenticated else None,
+        "ip_address": get_client_ip(request),
+        "user_agent": request.META.get("HTTP_USER_AGENT", "")[:500],
+    }
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import AuditActionDailyCount, AuditLog
+
+
+def increment_daily_counts(entries) -> None:
+    """Add a batch of audit entries to the per-action daily counters."""
+    counts = Counter((entry.action, timezone.localdate(entry.timestamp)) for entry in entries)
+    for (action, day), amount in counts.items():
+        _increment(action, day, amount)
+
+
+def _increment(action: str, day, amount: int) -> None:
+    counters = AuditActionDailyCount.objects.filter(action=action, day=day)
+    if counters.update(count=F("count") + amount):
+        return
+    try:
+        with transaction.atomic():
+            AuditActionDailyCount.objects.create(action=action, day=day, count=amount)
+    except IntegrityError:
+        # Another writer created the row between our UPDATE and INSERT.
+        counters.update(count=F("count") + amount)
+
+
+def rebuild_daily_counts(log_model=AuditLog, counter_model=AuditActionDailyCount) -> int:
+    """
+    Recompute every counter from the hot table plus the archived segments.
+
+    Migrations pass their historical models. Returns the number of counter
+    rows written.
+    """
+    from .archive import iter_archived_logs
+
+    counts: Counter = Counter()
+    hot = (
+        log_model.objects.annotate(day=TruncDate("timestamp"))
+        .values("action", "day")
+        .annotate(total=Count("id"))
+        .order_by()
+    )
+    for row in hot:
+        counts[(row["action"], row["day"])] += row["total"]
+    for row in iter_archived_logs():
+        counts[(row["action"], timezone.localdate(parse_datetime(row["timestamp"])))] += 1
+
+    with transaction.atomic():
+        counter_model.objects.all().delete()
+        counter_model.objects.bulk_create(
+            [
+                counter_model(action=action, day=day, count=total)
+                for (action, day), total in counts.items()
+            ],
+            batch_size=1000,
+        )
+    return len(counts)
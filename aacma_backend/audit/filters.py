@@ -0,0 +1,24 @@
+import django_filters
+
+from .models import AuditLog
+
+
+class AuditLogFilter(django_filters.FilterSet):
+    """
+    Filters for audit log listings: `user`, `action`, `model_name` and a
+    `from`/`to` timestamp range (`to` is exclusive).
+    """
+
+    from_ = django_filters.DateTimeFilter(field_name="timestamp", lookup_expr="gte")
+    to = django_filters.DateTimeFilter(field_name="timestamp", lookup_expr="lt")
+
+    class Meta:
+        model = AuditLog
+        fields = ["user", "action", "model_name"]
+
+    @classmethod
+    def get_filters(cls):
+        # `from` is a keyword, so it is declared as `from_` and renamed here.
+        filters = super().get_filters()
+        filters["from"] = filters.pop("from_")
+        return filters
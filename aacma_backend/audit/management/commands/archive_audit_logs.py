@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from audit.archive import GRANULARITIES, archive_closed_partitions, archive_lock, get_config
+
+
+class Command(BaseCommand):
+    help = "Move closed audit log partitions into compressed archive segments."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retention-days",
+            type=int,
+            default=None,
+            help="Keep this many days of audit logs in the database (default: AUDIT_LOG_ARCHIVE['RETENTION_DAYS']).",
+        )
+        parser.add_argument(
+            "--granularity",
+            choices=GRANULARITIES,
+            default=None,
+            help="Partition size for archive segments.",
+        )
+        parser.add_argument("--root", default=None, help="Archive directory.")
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the partitions that would be archived without writing or deleting anything.",
+        )
+
+    def handle(self, *args, **options):
+        root = options["root"] or get_config()["ROOT"]
+        with archive_lock(root) as acquired:
+            if not acquired:
+                raise CommandError(f"Another archive run holds the lock in {root}.")
+            try:
+                segments = archive_closed_partitions(
+                    retention_days=options["retention_days"],
+                    granularity=options["granularity"],
+                    root=root,
+                    dry_run=options["dry_run"],
+                )
+            except ValueError as exc:
+                raise CommandError(str(exc)) from exc
+
+        verb = "Would archive" if options["dry_run"] else "Archived"
+        for segment in segments:
+            self.stdout.write(f"{verb} {segment['partition']}: {segment['rows']} rows")
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(segments)} partition(s)."))
@@ -0,0 +1,70 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from aacma.benchmarking import benchmark_database, best_of
+from audit.models import AuditLog
+
+ACTIONS = ["create", "update", "delete", "login", "logout"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare OFFSET/COUNT paging with (timestamp, id) keyset paging on a "
+        "synthetic audit table. Runs against a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument("--page-size", type=int, default=20)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        page_size = options["page_size"]
+        with benchmark_database():
+            self._seed(rows)
+            qs = AuditLog.objects.order_by("-timestamp", "-id")
+            self.stdout.write(f"{rows:,} rows, page size {page_size}")
+            self.stdout.write(f"{'depth':>8} {'offset+count ms':>16} {'keyset ms':>10}")
+            for depth in (0.0, 0.1, 0.5, 0.9, 0.999):
+                offset = int((rows - page_size) * depth)
+                anchor = qs.values_list("timestamp", "id")[offset] if offset else None
+
+                def offset_page():
+                    qs.count()
+                    list(qs[offset : offset + page_size])
+
+                def keyset_page():
+                    page = qs
+                    if anchor:
+                        page = qs.filter(timestamp__lte=anchor[0]).filter(
+                            Q(timestamp__lt=anchor[0]) | Q(id__lt=anchor[1])
+                        )
+                    list(page[:page_size])
+
+                self.stdout.write(
+                    f"{depth:>8.1%} "
+                    f"{best_of(offset_page, options['repeat']):>16.2f} "
+                    f"{best_of(keyset_page, options['repeat']):>10.2f}"
+                )
+
+    def _seed(self, rows, batch_size=10_000):
+        self.stdout.write(f"Seeding {rows:,} audit rows...")
+        start = timezone.now() - timedelta(days=365)
+        step = timedelta(days=365) / max(rows, 1)
+        for offset in range(0, rows, batch_size):
+            AuditLog.objects.bulk_create(
+                [
+                    AuditLog(
+                        action=ACTIONS[i % len(ACTIONS)],
+                        model_name="HTTP",
+                        object_id=f"/api/bench/{i % 97}/",
+                        timestamp=start + step * i,
+                    )
+                    for i in range(offset, min(offset + batch_size, rows))
+                ],
+                batch_size=batch_size,
+            )
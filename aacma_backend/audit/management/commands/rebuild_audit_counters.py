@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from audit.counters import rebuild_daily_counts
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-action daily audit counters from the audit table and archive."
+
+    def handle(self, *args, **options):
+        rows = rebuild_daily_counts()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} audit counter rows."))
@@ -1,41 +1,79 @@
 from __future__ import annotations
 
 from django.utils.deprecation import MiddlewareMixin
-from django.db import connection
 
+from .archive import ensure_scheduled_archive
+from .context import get_client_ip, reset_current_request, set_current_request
 from .models import AuditLog
+from .rules import AGGREGATE, SAMPLE, SKIP, get_aggregator, get_rule_set
+from .writer import get_audit_writer
+
+# Credentials some clients have to send in the URL (EventSource streams).
+REDACTED_QUERY_PARAMS = frozenset({"access_token"})
 
 
 class AuditLogMiddleware(MiddlewareMixin):
     """
     Simple audit logging middleware.
 
-    Logs each API request with minimal information. For write operations,
-    viewsets and signals can enrich the `changes` field explicitly.
+    Logs each API request with minimal information. Field-level diffs for
+    the tracked models are recorded separately by `audit.signals`, which
+    reads the user and client details from the request published here.
+
+    Entries are handed to the buffered audit writer rather than inserted
+    inline, so the response is not held up by the audit write.
+    `AUDIT_LOG_RULES` (see `audit.rules`) can sample, aggregate or skip
+    high-frequency reads.
     """
 
+    def process_request(self, request):
+        ensure_scheduled_archive()
+        request._audit_context_token = set_current_request(request)
+
     def process_response(self, request, response):
+        token = getattr(request, "_audit_context_token", None)
+        if token is not None:
+            try:
+                reset_current_request(token)
+            except ValueError:
+                # Token created in a different context (async handler); nothing to undo here.
+                pass
+
         # Only log API calls
         if request.path.startswith("/api/"):
             user = getattr(request, "user", None)
+            if user is not None and not user.is_authenticated:
+                user = None
+            decision, rule = get_rule_set().decide(request, response, user)
+            if decision == SKIP:
+                return response
             action = self._guess_action(request.method)
+            user_id = user.pk if user else None
+            if decision == AGGREGATE:
+                get_aggregator().add(rule, action, request, response, user_id)
+                return response
 
-            AuditLog.objects.create(
-                user=user if user and user.is_authenticated else None,
-                action=action,
-                model_name="HTTP",
-                object_id=request.path,
-                changes={
-                    "method": request.method,
-                    "status_code": response.status_code,
-                    "query_params": request.GET.dict(),
+            changes = {
+                "method": request.method,
+                "status_code": response.status_code,
+                "query_params": {
+                    key: "[redacted]" if key in REDACTED_QUERY_PARAMS else value
+                    for key, value in request.GET.items()
                 },
-                ip_address=self._get_ip(request),
-                user_agent=request.META.get("HTTP_USER_AGENT", "")[:500],
+            }
+            if decision == SAMPLE:
+                changes["sample_rate"] = rule.rate
+            get_audit_writer().enqueue(
+                AuditLog(
+                    user_id=user_id,
+                    action=action,
+                    model_name="HTTP",
+                    object_id=request.path,
+                    changes=changes,
+                    ip_address=self._get_ip(request),
+                    user_agent=request.META.get("HTTP_USER_AGENT", "")[:500],
+                )
             )
-
-        # Ensure DB connection isn't left open by logging
-        connection.close()
         return response
 
     @staticmethod
@@ -48,8 +86,5 @@ class AuditLogMiddleware(MiddlewareMixin):
 
     @staticmethod
     def _get_ip(request) -> str | None:
-        xff = request.META.get("HTTP_X_FORWARDED_FOR")
-        if xff:
-            return xff.split(",")[0].strip()
-        return request.META.get("REMOTE_ADDR")
+        return get_client_ip(request)
 
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("audit", "0002_audit_timestamp_default"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="auditlog",
+            options={"ordering": ["-timestamp", "-id"]},
+        ),
+        migrations.AddIndex(
+            model_name="auditlog",
+            index=models.Index(fields=["timestamp", "id"], name="audit_ts_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="auditlog",
+            index=models.Index(
+                fields=["user", "timestamp", "id"], name="audit_user_ts_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="auditlog",
+            index=models.Index(
+                fields=["action", "timestamp", "id"], name="audit_action_ts_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="auditlog",
+            index=models.Index(
+                fields=["model_name", "timestamp", "id"], name="audit_model_ts_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:14
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def backfill_counts(apps, schema_editor):
+    """Seed the counters from rows already in the audit table."""
+    AuditLog = apps.get_model("audit", "AuditLog")
+    AuditActionDailyCount = apps.get_model("audit", "AuditActionDailyCount")
+    rows = (
+        AuditLog.objects.annotate(day=TruncDate("timestamp"))
+        .values("action", "day")
+        .annotate(total=Count("id"))
+        .order_by()
+    )
+    AuditActionDailyCount.objects.bulk_create(
+        [
+            AuditActionDailyCount(action=row["action"], day=row["day"], count=row["total"])
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("audit", "0003_audit_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AuditActionDailyCount",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                ("action", models.CharField(max_length=20)),
+                ("day", models.DateField()),
+                ("count", models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                "ordering": ["-day", "action"],
+                "unique_together": {("action", "day")},
+            },
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+def rebuild_counts(apps, schema_editor):
+    """
+    Recount with the archived segments as well: 0004 only counted the rows
+    still in the audit table.
+    """
+    from audit.counters import rebuild_daily_counts
+
+    rebuild_daily_counts(
+        apps.get_model("audit", "AuditLog"),
+        apps.get_model("audit", "AuditActionDailyCount"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("audit", "0004_audit_action_daily_count"),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_counts, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 
 class AuditLog(models.Model):
@@ -29,11 +30,41 @@ class AuditLog(models.Model):
     changes = models.JSONField(default=dict, blank=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the entry is built, not when the buffered writer flushes it.
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
-        ordering = ["-timestamp"]
+        ordering = ["-timestamp", "-id"]
+        # Keyset pagination walks (timestamp, id); each listing filter gets a
+        # matching composite index so filtered pages are range scans too.
+        indexes = [
+            models.Index(fields=["timestamp", "id"], name="audit_ts_id_idx"),
+            models.Index(fields=["user", "timestamp", "id"], name="audit_user_ts_id_idx"),
+            models.Index(fields=["action", "timestamp", "id"], name="audit_action_ts_id_idx"),
+            models.Index(fields=["model_name", "timestamp", "id"], name="audit_model_ts_id_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.timestamp} {self.user} {self.action} {self.model_name}({self.object_id})"
 
+
+class AuditActionDailyCount(models.Model):
+    """
+    Number of audit log entries per action per (local) day.
+
+    Maintained by the audit writer in the same transaction as each batch
+    insert, and kept when partitions are archived, so dashboards can report
+    all-time totals without scanning the audit table.
+    """
+
+    id = models.AutoField(primary_key=True)
+    action = models.CharField(max_length=20)
+    day = models.DateField()
+    count = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ["action", "day"]
+        ordering = ["-day", "action"]
+
+    def __str__(self) -> str:
+        return f"{self.day} {self.action}: {self.count}"
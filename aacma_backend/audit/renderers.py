@@ -0,0 +1,27 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Newline-delimited JSON; used for streamed exports and error bodies."""
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return (json.dumps(data, default=str) + "\n").encode(self.charset)
+
+
+class CSVRenderer(BaseRenderer):
+    """CSV export format. Streamed exports write rows directly; this only renders error bodies."""
+
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            return "".join(f"{key},{value}\n" for key, value in data.items()).encode(self.charset)
+        return str(data).encode(self.charset)
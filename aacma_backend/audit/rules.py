@@ -0,0 +1,257 @@
+"""
+Sampling and exclusion rules for request-level audit logging.
+
+``AUDIT_LOG_RULES`` in settings is an ordered list of rules; the first rule
+matching a request decides whether it is logged (``always``), logged with a
+probability (``sample``), folded into per-minute counters (``aggregate``) or
+not logged at all (``skip``). Unmatched requests are always logged.
+
+A rule matches on ``path`` (exact paths) and/or ``path_prefix``. Write
+requests (POST/PUT/PATCH/DELETE) are always logged unless the matching rule
+sets ``include_writes``, and requests under ``/api/auth/`` are always logged,
+whatever the rules say. Decisions are made from the request, the
+response and the already-authenticated user, without a database query.
+"""
+from __future__ import annotations
+
+import atexit
+import random
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+
+from .models import AuditLog
+
+ALWAYS = "always"
+SAMPLE = "sample"
+AGGREGATE = "aggregate"
+SKIP = "skip"
+DECISIONS = (ALWAYS, SAMPLE, AGGREGATE, SKIP)
+
+WRITE_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+AUTH_PATH_PREFIXES = ("/api/auth/",)
+AGGREGATE_FLUSH_INTERVAL_SECONDS = 15
+
+
+def _as_tuple(value):
+    if value is None:
+        return ()
+    if isinstance(value, str):
+        return (value,)
+    return tuple(value)
+
+
+class AuditRule:
+    def __init__(
+        self,
+        name: str,
+        decision: str,
+        path=None,
+        path_prefix=None,
+        methods=None,
+        status=None,
+        user_types=None,
+        roles=None,
+        rate: float = 100,
+        include_writes: bool = False,
+    ):
+        if decision not in DECISIONS:
+            raise ImproperlyConfigured(
+                f"AUDIT_LOG_RULES[{name!r}]: decision must be one of {', '.join(DECISIONS)}."
+            )
+        if not 0 <= rate <= 100:
+            raise ImproperlyConfigured(
+                f"AUDIT_LOG_RULES[{name!r}]: rate must be between 0 and 100."
+            )
+        self.name = name
+        self.decision = decision
+        self.paths = frozenset(_as_tuple(path))
+        self.path_prefixes = _as_tuple(path_prefix)
+        self.methods = frozenset(method.upper() for method in _as_tuple(methods))
+        # Status classes such as "2xx" or "4xx".
+        self.status_classes = frozenset(str(code)[0] for code in _as_tuple(status))
+        self.user_types = frozenset(_as_tuple(user_types))
+        self.roles = frozenset(_as_tuple(roles))
+        self.rate = rate
+        self.include_writes = include_writes
+
+    def matches(self, request, response, user) -> bool:
+        if self.paths and request.path not in self.paths:
+            return False
+        if self.path_prefixes and not request.path.startswith(self.path_prefixes):
+            return False
+        if self.methods and request.method not in self.methods:
+            return False
+        if self.status_classes and str(response.status_code)[0] not in self.status_classes:
+            return False
+        if self.user_types and getattr(user, "user_type", None) not in self.user_types:
+            return False
+        if self.roles and _role_slug(user) not in self.roles:
+            return False
+        return True
+
+
+_role_slugs: dict | None = None
+_role_slugs_lock = threading.Lock()
+
+
+def _role_slug(user) -> str | None:
+    """
+    Role slug for an authenticated user without a per-request query.
+
+    Uses the cached ``user.role`` when it was loaded with the user, otherwise
+    an id -> slug map loaded once per process (roles are a fixed seed list).
+    """
+    global _role_slugs
+    if user is None or not getattr(user, "role_id", None):
+        return None
+    cached = user._state.fields_cache.get("role")
+    if cached is not None:
+        return cached.slug
+    if _role_slugs is None:
+        with _role_slugs_lock:
+            if _role_slugs is None:
+                from accounts.models import Role
+
+                _role_slugs = dict(Role.objects.values_list("id", "slug"))
+    return _role_slugs.get(user.role_id)
+
+
+def clear_role_cache(**kwargs) -> None:
+    global _role_slugs
+    _role_slugs = None
+
+
+class AuditRuleSet:
+    def __init__(self, rules: list[AuditRule]):
+        self.rules = rules
+
+    @classmethod
+    def from_settings(cls) -> "AuditRuleSet":
+        rules = []
+        for index, config in enumerate(getattr(settings, "AUDIT_LOG_RULES", [])):
+            config = dict(config)
+            config.setdefault("name", f"rule-{index}")
+            rules.append(AuditRule(**config))
+        return cls(rules)
+
+    def decide(self, request, response, user=None) -> tuple[str, AuditRule | None]:
+        """Return ``(decision, rule)``; ``sample`` has already been resolved to log or skip."""
+        if request.path.startswith(AUTH_PATH_PREFIXES):
+            return ALWAYS, None
+        is_write = request.method in WRITE_METHODS
+        for rule in self.rules:
+            if is_write and not rule.include_writes:
+                continue
+            if not rule.matches(request, response, user):
+                continue
+            if rule.decision == SAMPLE:
+                keep = random.random() * 100 < rule.rate
+                return (SAMPLE if keep else SKIP), rule
+            return rule.decision, rule
+        return ALWAYS, None
+
+
+class MinuteAggregator:
+    """
+    Per-minute request counters for ``aggregate`` rules.
+
+    Each closed minute becomes one ``HTTP_AGGREGATE`` audit entry per
+    (rule, action, method, status class, user) with the request count in
+    ``changes``.
+
+    With a background writer, closed minutes are flushed by a periodic task
+    on its thread. Without one (``flush_inline``), ``add`` flushes them
+    itself at most every ``AGGREGATE_FLUSH_INTERVAL_SECONDS``, and the open
+    minute is flushed at exit.
+    """
+
+    def __init__(self, flush_inline: bool = False):
+        self._counts: Counter = Counter()
+        self._lock = threading.Lock()
+        self.flush_inline = flush_inline
+        self._flush_due = time.monotonic() + AGGREGATE_FLUSH_INTERVAL_SECONDS
+
+    def add(self, rule: AuditRule, action: str, request, response, user_id) -> None:
+        minute = timezone.now().replace(second=0, microsecond=0)
+        status_class = f"{str(response.status_code)[0]}xx"
+        key = (minute, rule.name, action, request.method, status_class, user_id)
+        with self._lock:
+            self._counts[key] += 1
+            due = self.flush_inline and time.monotonic() >= self._flush_due
+            if due:
+                self._flush_due = time.monotonic() + AGGREGATE_FLUSH_INTERVAL_SECONDS
+        if due:
+            self.flush()
+
+    def flush(self, include_open: bool = False) -> None:
+        from .writer import get_audit_writer
+
+        current_minute = timezone.now().replace(second=0, microsecond=0)
+        with self._lock:
+            closed = {
+                key: count
+                for key, count in self._counts.items()
+                if include_open or key[0] < current_minute
+            }
+            for key in closed:
+                del self._counts[key]
+        writer = get_audit_writer()
+        for (minute, rule_name, action, method, status_class, user_id), count in closed.items():
+            writer.enqueue(
+                AuditLog(
+                    user_id=user_id,
+                    action=action,
+                    model_name="HTTP_AGGREGATE",
+                    object_id=rule_name[:50],
+                    changes={
+                        "rule": rule_name,
+                        "method": method,
+                        "status_class": status_class,
+                        "count": count,
+                        "window_start": minute.isoformat(),
+                        "window_end": (minute + timedelta(minutes=1)).isoformat(),
+                    },
+                    timestamp=minute,
+                )
+            )
+
+    def flush_all(self) -> None:
+        self.flush(include_open=True)
+
+
+_rule_set: AuditRuleSet | None = None
+_aggregator: MinuteAggregator | None = None
+_init_lock = threading.Lock()
+
+
+def get_rule_set() -> AuditRuleSet:
+    global _rule_set
+    if _rule_set is None:
+        with _init_lock:
+            if _rule_set is None:
+                _rule_set = AuditRuleSet.from_settings()
+    return _rule_set
+
+
+def get_aggregator() -> MinuteAggregator:
+    global _aggregator
+    if _aggregator is None:
+        with _init_lock:
+            if _aggregator is None:
+                from .writer import get_audit_writer
+
+                writer = get_audit_writer()
+                aggregator = MinuteAggregator(flush_inline=not writer.async_mode)
+                if writer.async_mode:
+                    writer.add_periodic_task(aggregator.flush, AGGREGATE_FLUSH_INTERVAL_SECONDS)
+                    writer.add_stop_task(aggregator.flush_all)
+                else:
+                    atexit.register(aggregator.flush_all)
+                _aggregator = aggregator
+    return _aggregator
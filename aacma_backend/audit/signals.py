@@ -0,0 +1,182 @@
+"""
+Model-level change capture for the audit trail.
+
+Tracked fields are snapshotted when an instance is loaded (``post_init``),
+so diffs are computed on save without an extra SELECT. Non-empty diffs are
+queued on the buffered audit writer once the surrounding transaction
+commits, so no save pays for a synchronous audit INSERT.
+"""
+from __future__ import annotations
+
+from django.apps import apps
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+
+from .context import current_request_metadata
+from .models import AuditLog
+from .rules import clear_role_cache
+from .writer import get_audit_writer
+
+TRACKED_MODELS = {
+    "collections.CollectionRequest": [
+        "status",
+        "waste_type",
+        "quantity_bags",
+        "estimated_weight_kg",
+        "preferred_date",
+        "preferred_time",
+        "address",
+        "latitude",
+        "longitude",
+        "assigned_company",
+        "assigned_vehicle",
+        "assigned_driver",
+        "estimated_arrival",
+        "collected_at",
+    ],
+    "routes.Route": [
+        "name",
+        "status",
+        "zone",
+        "assigned_vehicle",
+        "assigned_driver",
+        "scheduled_date",
+        "scheduled_start_time",
+        "actual_start_time",
+        "actual_end_time",
+        "total_stops",
+        "completed_stops",
+        "total_distance_km",
+    ],
+    "routes.RouteStop": [
+        "route",
+        "sequence_number",
+        "address",
+        "latitude",
+        "longitude",
+        "collection_request",
+        "status",
+        "arrival_time",
+        "departure_time",
+    ],
+    "complaints.WasteReport": [
+        "report_type",
+        "status",
+        "priority",
+        "assigned_company",
+        "assigned_to",
+        "response",
+        "resolved_at",
+    ],
+    "companies.WasteCompany": [
+        "name",
+        "license_number",
+        "contact_email",
+        "contact_phone",
+        "address",
+        "status",
+        "fleet_size",
+        "employee_count",
+        "approved_by",
+        "approved_at",
+    ],
+    "governance.ApprovalRequest": [
+        "request_type",
+        "item_name",
+        "status",
+        "requested_by",
+        "approver",
+        "decision_notes",
+        "decided_at",
+        "policy",
+    ],
+}
+
+# model class -> {field name: attname}
+_tracked_fields: dict = {}
+_MISSING = object()
+_encoder = DjangoJSONEncoder()
+
+
+def _json_value(value):
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return _encoder.default(value)
+
+
+def _snapshot(instance, fields: dict) -> dict:
+    # Deferred fields are absent from __dict__ and simply not tracked for
+    # this instance, so snapshotting never triggers a query.
+    values = instance.__dict__
+    return {name: values.get(attname, _MISSING) for name, attname in fields.items()}
+
+
+def _enqueue(instance, action: str, changes: dict) -> None:
+    entry = AuditLog(
+        action=action,
+        model_name=instance._meta.object_name,
+        object_id=str(instance.pk),
+        changes=changes,
+        **current_request_metadata(),
+    )
+    transaction.on_commit(lambda: get_audit_writer().enqueue(entry))
+
+
+def capture_snapshot(sender, instance, **kwargs):
+    instance._audit_snapshot = _snapshot(instance, _tracked_fields[sender])
+
+
+def capture_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    fields = _tracked_fields[sender]
+    if update_fields is not None:
+        fields = {
+            name: attname
+            for name, attname in fields.items()
+            if name in update_fields or attname in update_fields
+        }
+    before = getattr(instance, "_audit_snapshot", {})
+    after = _snapshot(instance, fields)
+
+    changes = {}
+    for name, new in after.items():
+        old = None if created else before.get(name, _MISSING)
+        if new is _MISSING or old is _MISSING or old == new:
+            continue
+        changes[name] = [_json_value(old), _json_value(new)]
+
+    before.update(after)
+    instance._audit_snapshot = before
+    if changes:
+        _enqueue(instance, "create" if created else "update", changes)
+
+
+def capture_delete(sender, instance, **kwargs):
+    snapshot = getattr(instance, "_audit_snapshot", {})
+    changes = {
+        name: [_json_value(value), None]
+        for name, value in snapshot.items()
+        if value is not _MISSING and value is not None
+    }
+    _enqueue(instance, "delete", changes)
+
+
+def connect_tracked_models() -> None:
+    for label, field_names in TRACKED_MODELS.items():
+        model = apps.get_model(label)
+        _tracked_fields[model] = {
+            name: model._meta.get_field(name).attname for name in field_names
+        }
+        uid = f"audit-capture-{label}"
+        post_init.connect(capture_snapshot, sender=model, dispatch_uid=uid)
+        post_save.connect(capture_save, sender=model, dispatch_uid=uid)
+        post_delete.connect(capture_delete, sender=model, dispatch_uid=uid)
+
+
+connect_tracked_models()
+
+# Keep the role-slug lookup used by the audit sampling rules in step with Role edits.
+post_save.connect(clear_role_cache, sender="accounts.Role", dispatch_uid="audit-role-cache")
+post_delete.connect(clear_role_cache, sender="accounts.Role", dispatch_uid="audit-role-cache")
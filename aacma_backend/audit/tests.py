@@ -0,0 +1,358 @@
+import csv
+import json
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import transaction
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.test import APIClient
+
+from companies.models import WasteCompany
+
+from .archive import archive_closed_partitions, iter_archived_logs, load_manifest
+from .counters import increment_daily_counts
+from .models import AuditActionDailyCount, AuditLog
+from .rules import AGGREGATE, ALWAYS, SAMPLE, SKIP, AuditRule, AuditRuleSet
+from .writer import AuditLogWriter
+
+User = get_user_model()
+
+
+def entry(action="create", **kwargs):
+    return AuditLog(action=action, model_name="HTTP", object_id="/api/test/", **kwargs)
+
+
+class AuditLogWriterTests(TransactionTestCase):
+    # The writer thread uses its own connection, so rows must be committed.
+    # The test database is a shared-cache in-memory SQLite database, which
+    # fails reads made while the writer holds a table lock instead of waiting,
+    # so the tests poll the writer's counters and only then read the table.
+
+    def writer(self, **kwargs):
+        options = {"batch_size": 100, "flush_interval": 60.0, "max_queue_size": 1000, "enqueue_timeout": 0.01}
+        writer = AuditLogWriter(**{**options, **kwargs})
+        self.addCleanup(writer.stop)
+        return writer
+
+    def wait_for_flush(self, writer, count, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while writer.stats()["flushed"] < count and time.monotonic() < deadline:
+            time.sleep(0.02)
+        return AuditLog.objects.count()
+
+    def test_full_batch_is_written(self):
+        writer = self.writer(batch_size=5)
+        for _ in range(5):
+            self.assertTrue(writer.enqueue(entry()))
+        self.assertEqual(self.wait_for_flush(writer, 5), 5)
+
+    def test_partial_batch_is_written_after_flush_interval(self):
+        writer = self.writer(flush_interval=0.1)
+        writer.enqueue(entry())
+        writer.enqueue(entry("update"))
+        self.assertEqual(self.wait_for_flush(writer, 2), 2)
+
+    def test_stop_drains_the_queue(self):
+        writer = self.writer()
+        # Queued by a shutdown hook (as the sampling aggregator does) before the drain.
+        writer.add_stop_task(lambda: writer.enqueue(entry("login")))
+        for _ in range(7):
+            writer.enqueue(entry())
+        self.assertEqual(AuditLog.objects.count(), 0)
+        writer.stop()
+        self.assertEqual(AuditLog.objects.count(), 8)
+        self.assertEqual(writer.stats(), {**writer.stats(), "flushed": 8, "pending": 0, "failed": 0})
+        counts = dict(AuditActionDailyCount.objects.values_list("action", "count"))
+        self.assertEqual(counts, {"create": 7, "login": 1})
+
+
+class InlineAuditLogWriterTests(TestCase):
+    def test_writes_immediately_without_a_thread(self):
+        writer = AuditLogWriter(
+            batch_size=100, flush_interval=60.0, max_queue_size=1000, enqueue_timeout=0.01, async_mode=False
+        )
+        writer.enqueue(entry())
+        self.assertEqual(AuditLog.objects.count(), 1)
+        self.assertIsNone(writer._thread)
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        settings_override = override_settings(AUDIT_LOG_ARCHIVE={"ROOT": self.root, "GRANULARITY": "day"})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.old_day = timezone.make_aware(datetime(2025, 1, 10, 9))
+        AuditLog.objects.bulk_create(
+            [entry(timestamp=self.old_day + timedelta(minutes=i)) for i in range(3)]
+            + [entry("login", timestamp=self.old_day + timedelta(days=1))]
+        )
+        self.recent = AuditLog.objects.create(action="update", model_name="HTTP", object_id="/api/test/")
+
+    def test_round_trip(self):
+        segments = archive_closed_partitions(retention_days=30)
+
+        self.assertEqual([(s["partition"], s["rows"]) for s in segments], [("2025-01-10", 3), ("2025-01-11", 1)])
+        self.assertEqual(load_manifest()["segments"], segments)
+        self.assertEqual(list(AuditLog.objects.values_list("id", flat=True)), [self.recent.id])
+        rows = list(iter_archived_logs())
+        self.assertEqual([row["action"] for row in rows], ["create", "create", "create", "login"])
+        self.assertEqual(parse_datetime(rows[0]["timestamp"]), self.old_day)
+
+        # Rerunning finds nothing left to archive.
+        self.assertEqual(archive_closed_partitions(retention_days=30), [])
+
+    def test_read_back_filters_and_skips_other_segments(self):
+        archive_closed_partitions(retention_days=30)
+        day = timezone.make_aware(datetime(2025, 1, 11))
+
+        self.assertEqual([row["action"] for row in iter_archived_logs(start=day)], ["login"])
+        self.assertEqual(len(list(iter_archived_logs(filters={"action": "create"}))), 3)
+        # Only the segment overlapping the range is opened.
+        second = load_manifest()["segments"][1]
+        shutil.move(f"{self.root}/{second['path']}", f"{self.root}/moved.gz")
+        self.assertEqual(len(list(iter_archived_logs(end=day))), 3)
+
+    def test_archived_logs_view(self):
+        archive_closed_partitions(retention_days=30)
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("director", password="x", user_type="central_authority"))
+
+        response = client.get("/api/audit/archive/logs/", {"limit": 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertEqual(response.data["next_offset"], 2)
+        response = client.get("/api/audit/archive/logs/", {"offset": 2, "action": "login"})
+        self.assertEqual(response.data, {"results": [], "has_more": False, "next_offset": None})
+        response = client.get("/api/audit/archive/", {"from": "2025-01-11"})
+        self.assertEqual([s["partition"] for s in response.data], ["2025-01-11"])
+
+
+class AuditLogListTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("auditor", password="x"))
+        self.at = timezone.make_aware(datetime(2025, 3, 1, 12))
+
+    def list(self, **params):
+        # Requests to the list are audited too; only look at the seeded rows.
+        return self.client.get("/api/audit/logs/", {"model_name": "Route", **params})
+
+    def test_cursor_steps_across_equal_timestamps(self):
+        # Five rows share one timestamp, so a page boundary falls inside the tie.
+        logs = AuditLog.objects.bulk_create(
+            [AuditLog(action="update", model_name="Route", timestamp=self.at) for _ in range(5)]
+            + [AuditLog(action="update", model_name="Route", timestamp=self.at - timedelta(hours=1))]
+        )
+        seen, url = [], None
+        while True:
+            response = self.client.get(url) if url else self.list(page_size=2)
+            self.assertEqual(response.status_code, 200)
+            seen += [row["id"] for row in response.data["results"]]
+            url = response.data["next"]
+            if not url:
+                break
+        expected = sorted((log.id for log in logs[:5]), reverse=True) + [logs[5].id]
+        self.assertEqual(seen, expected)
+
+    def test_from_and_to_filters(self):
+        AuditLog.objects.bulk_create(
+            [
+                AuditLog(action="create", model_name="Route", timestamp=self.at - timedelta(days=1)),
+                AuditLog(action="update", model_name="Route", timestamp=self.at),
+                AuditLog(action="delete", model_name="Route", timestamp=self.at + timedelta(days=1)),
+            ]
+        )
+        response = self.list(**{"from": self.at.isoformat()})
+        self.assertEqual([row["action"] for row in response.data["results"]], ["delete", "update"])
+        response = self.list(**{"from": self.at.isoformat(), "to": (self.at + timedelta(days=1)).isoformat()})
+        self.assertEqual([row["action"] for row in response.data["results"]], ["update"])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.list(cursor="not-a-cursor").status_code, 404)
+
+
+class DailyCountTests(TestCase):
+    def counts(self):
+        return {(row.action, row.day.isoformat()): row.count for row in AuditActionDailyCount.objects.all()}
+
+    def test_increments_by_local_day(self):
+        # 22:30 UTC is already the next day in Addis Ababa.
+        late = datetime(2025, 1, 10, 22, 30, tzinfo=dt_timezone.utc)
+        increment_daily_counts([entry(timestamp=late), entry(timestamp=late), entry("login", timestamp=late)])
+        increment_daily_counts([entry(timestamp=late)])
+        self.assertEqual(self.counts(), {("create", "2025-01-11"): 3, ("login", "2025-01-11"): 1})
+
+    def test_rebuild_includes_archived_entries(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        old = timezone.make_aware(datetime(2025, 1, 10, 9))
+        with override_settings(AUDIT_LOG_ARCHIVE={"ROOT": root}):
+            AuditLog.objects.bulk_create([entry(timestamp=old), entry("login", timestamp=old)])
+            archive_closed_partitions(retention_days=30, granularity="day")
+            AuditLog.objects.create(action="create", model_name="HTTP", timestamp=old + timedelta(hours=1))
+            AuditActionDailyCount.objects.create(action="delete", day=old.date(), count=7)
+
+            call_command("rebuild_audit_counters", stdout=StringIO())
+
+        self.assertEqual(self.counts(), {("create", "2025-01-10"): 2, ("login", "2025-01-10"): 1})
+
+
+class ChangeCaptureTests(TestCase):
+    def logged(self):
+        return list(AuditLog.objects.filter(model_name="WasteCompany").order_by("id").values("action", "changes"))
+
+    def create_company(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return WasteCompany.objects.create(
+                name="Clean City",
+                license_number="LIC-1",
+                contact_email="ops@cleancity.et",
+                contact_phone="0911000000",
+                address="Bole",
+            )
+
+    def test_create_update_delete(self):
+        company = self.create_company()
+        self.assertEqual(self.logged()[0]["changes"]["name"], [None, "Clean City"])
+
+        company = WasteCompany.objects.get(pk=company.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            company.status = "approved"
+            company.fleet_size = 4
+            company.save()
+            # Saving again without changes is not logged.
+            company.save()
+        changes = {"status": ["pending", "approved"], "fleet_size": [0, 4]}
+        self.assertEqual(self.logged()[1:], [{"action": "update", "changes": changes}])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            company.delete()
+        deleted = self.logged()[2]
+        self.assertEqual(deleted["action"], "delete")
+        self.assertEqual(deleted["changes"]["status"], ["approved", None])
+        self.assertNotIn("approved_by", deleted["changes"])
+
+    def test_update_fields_limits_the_diff(self):
+        company = self.create_company()
+        with self.captureOnCommitCallbacks(execute=True):
+            company.name = "Renamed"
+            company.status = "approved"
+            company.save(update_fields=["status"])
+        self.assertEqual(self.logged()[-1]["changes"], {"status": ["pending", "approved"]})
+
+    def test_nothing_is_logged_when_the_transaction_rolls_back(self):
+        company = self.create_company()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    company.status = "suspended"
+                    company.save()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertEqual(len(self.logged()), 1)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        director = User.objects.create_user("director", password="x", user_type="central_authority")
+        self.client.force_authenticate(director)
+        # Recent enough to stay out of the archive.
+        self.at = timezone.now() - timedelta(days=1)
+        AuditLog.objects.bulk_create(
+            [
+                AuditLog(action="update", model_name="Route", timestamp=self.at, changes={"status": ["a", "b"]}),
+                AuditLog(action="create", model_name="Route", timestamp=self.at - timedelta(hours=1)),
+            ]
+        )
+
+    def export(self, **params):
+        response = self.client.get("/api/audit/logs/export/", {"model_name": "Route", **params})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_ndjson_oldest_first(self):
+        rows = [json.loads(line) for line in self.export().splitlines()]
+        self.assertEqual([row["action"] for row in rows], ["create", "update"])
+        self.assertEqual(rows[1]["changes"], {"status": ["a", "b"]})
+
+    def test_csv(self):
+        rows = list(csv.DictReader(self.export(format="csv").splitlines()))
+        self.assertEqual([row["action"] for row in rows], ["create", "update"])
+        self.assertEqual(json.loads(rows[1]["changes"]), {"status": ["a", "b"]})
+
+    def test_include_archived(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        with override_settings(AUDIT_LOG_ARCHIVE={"ROOT": root}):
+            AuditLog.objects.create(action="delete", model_name="Route", timestamp=self.at - timedelta(days=90))
+            archive_closed_partitions(retention_days=30, granularity="day")
+            self.assertEqual(len(self.export().splitlines()), 2)
+            lines = self.export(include_archived="true").splitlines()
+        self.assertEqual([json.loads(line)["action"] for line in lines], ["delete", "create", "update"])
+
+    def test_central_authority_only(self):
+        self.client.force_authenticate(User.objects.create_user("resident", password="x", user_type="resident"))
+        self.assertEqual(self.client.get("/api/audit/logs/export/").status_code, 403)
+
+
+class AuditRuleSetTests(SimpleTestCase):
+    factory = RequestFactory()
+
+    def decide(self, rule_set, method, path, status=200, user=None):
+        request = self.factory.generic(method, path)
+        return rule_set.decide(request, SimpleNamespace(status_code=status), user)
+
+    def test_sampling_follows_the_rate(self):
+        rule_set = AuditRuleSet([AuditRule("polling", SAMPLE, path_prefix="/api/notifications/", rate=5)])
+        with mock.patch("audit.rules.random.random", return_value=0.049):
+            self.assertEqual(self.decide(rule_set, "GET", "/api/notifications/")[0], SAMPLE)
+        with mock.patch("audit.rules.random.random", return_value=0.05):
+            self.assertEqual(self.decide(rule_set, "GET", "/api/notifications/")[0], SKIP)
+
+    def test_first_matching_rule_wins(self):
+        rule_set = AuditRuleSet(
+            [
+                AuditRule("errors", ALWAYS, path_prefix="/api/notifications/", status=["4xx", "5xx"]),
+                AuditRule("polling", SKIP, path_prefix="/api/notifications/"),
+            ]
+        )
+        self.assertEqual(self.decide(rule_set, "GET", "/api/notifications/", status=404)[1].name, "errors")
+        self.assertEqual(self.decide(rule_set, "GET", "/api/notifications/")[1].name, "polling")
+        self.assertEqual(self.decide(rule_set, "GET", "/api/zones/"), (ALWAYS, None))
+
+    def test_writes_and_auth_are_logged_unless_opted_in(self):
+        rule_set = AuditRuleSet(
+            [
+                AuditRule("everything", SKIP, path_prefix="/api/"),
+                AuditRule("pings", AGGREGATE, path="/api/driver/location/", include_writes=True),
+            ]
+        )
+        self.assertEqual(self.decide(rule_set, "POST", "/api/zones/"), (ALWAYS, None))
+        self.assertEqual(self.decide(rule_set, "POST", "/api/driver/location/")[0], AGGREGATE)
+        self.assertEqual(self.decide(rule_set, "GET", "/api/auth/me/"), (ALWAYS, None))
+
+    def test_user_type_filter(self):
+        rule_set = AuditRuleSet([AuditRule("residents", SKIP, user_types=["resident"])])
+        resident = SimpleNamespace(user_type="resident", role_id=None)
+        self.assertEqual(self.decide(rule_set, "GET", "/api/zones/", user=resident)[0], SKIP)
+        self.assertEqual(self.decide(rule_set, "GET", "/api/zones/")[0], ALWAYS)
+
+    def test_location_pings_are_aggregated_by_default(self):
+        decision, rule = self.decide(AuditRuleSet.from_settings(), "POST", "/api/driver/location/")
+        self.assertEqual((decision, rule.name), (AGGREGATE, "driver-location-pings"))
+        self.assertEqual(self.decide(AuditRuleSet.from_settings(), "POST", "/api/driver/location/batch/")[0], ALWAYS)
@@ -1,9 +1,17 @@
 from django.urls import path
 
-from .views import AuditLogListView, AuditLogDetailView
+from .views import (
+    AuditLogListView,
+    AuditLogDetailView,
+    AuditArchiveSegmentListView,
+    AuditArchiveLogListView,
+    AuditLogExportView,
+)
 
 urlpatterns = [
     path("logs/", AuditLogListView.as_view(), name="audit-log-list"),
+    path("logs/export/", AuditLogExportView.as_view(), name="audit-log-export"),
     path("logs/<int:pk>/", AuditLogDetailView.as_view(), name="audit-log-detail"),
+    path("archive/", AuditArchiveSegmentListView.as_view(), name="audit-archive-segments"),
+    path("archive/logs/", AuditArchiveLogListView.as_view(), name="audit-archive-logs"),
 ]
-
@@ -1,13 +1,57 @@
+import csv
+import json
+from datetime import datetime, time
+from itertools import chain, islice
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework import generics, permissions
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from django_filters.rest_framework import DjangoFilterBackend
 
+from accounts.permissions import IsCentralAuthority
+from .archive import EXPORT_FIELDS, iter_archived_logs, load_manifest
+from .filters import AuditLogFilter
 from .models import AuditLog
+from .pagination import AuditLogKeysetPagination
+from .renderers import CSVRenderer, NDJSONRenderer
 from .serializers import AuditLogSerializer
 
 
+def _parse_bound(params, name):
+    """Parse an ISO date or datetime query parameter into an aware datetime."""
+    value = params.get(name)
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValidationError({name: "Expected an ISO 8601 date or datetime."})
+        parsed = datetime.combine(day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
 class AuditLogListView(generics.ListAPIView):
-    queryset = AuditLog.objects.all()
+    """
+    Audit log entries, newest first, paged by `(timestamp, id)` cursor.
+
+    Ordering is fixed so the keyset cursor stays valid; search and ordering
+    filters are therefore not offered here.
+    """
+
+    queryset = AuditLog.objects.select_related("user")
     serializer_class = AuditLogSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = AuditLogKeysetPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = AuditLogFilter
 
 
 class AuditLogDetailView(generics.RetrieveAPIView):
@@ -15,3 +59,127 @@ class AuditLogDetailView(generics.RetrieveAPIView):
     serializer_class = AuditLogSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+
+class AuditArchiveSegmentListView(APIView):
+    """
+    Manifest of archived audit log segments, optionally limited to a `from`/`to` range.
+    """
+
+    permission_classes = [permissions.IsAuthenticated, IsCentralAuthority]
+
+    def get(self, request):
+        start = _parse_bound(request.query_params, "from")
+        end = _parse_bound(request.query_params, "to")
+        segments = [
+            segment
+            for segment in load_manifest()["segments"]
+            if not (start and parse_datetime(segment["end"]) <= start)
+            and not (end and parse_datetime(segment["start"]) >= end)
+        ]
+        return Response(segments)
+
+
+class AuditArchiveLogListView(APIView):
+    """
+    Archived audit log entries in `[from, to)`, oldest first.
+
+    Supports `user`, `action` and `model_name` filters and `limit`/`offset`
+    paging; only segments overlapping the range are decompressed.
+    """
+
+    permission_classes = [permissions.IsAuthenticated, IsCentralAuthority]
+    max_limit = 1000
+
+    def get(self, request):
+        params = request.query_params
+        start = _parse_bound(params, "from")
+        end = _parse_bound(params, "to")
+        try:
+            limit = min(max(int(params.get("limit", 100)), 1), self.max_limit)
+            offset = max(int(params.get("offset", 0)), 0)
+            user = int(params["user"]) if params.get("user") else None
+        except ValueError:
+            raise ValidationError({"detail": "limit, offset and user must be integers."})
+        filters = {
+            "user": user,
+            "action": params.get("action"),
+            "model_name": params.get("model_name"),
+        }
+        rows = list(islice(iter_archived_logs(start, end, filters), offset, offset + limit + 1))
+        has_more = len(rows) > limit
+        return Response(
+            {
+                "results": rows[:limit],
+                "has_more": has_more,
+                "next_offset": offset + limit if has_more else None,
+            }
+        )
+
+
+class _Echo:
+    """File-like object whose write() returns the line, for streaming csv.writer output."""
+
+    def write(self, value):
+        return value
+
+
+def _export_row(row: dict) -> dict:
+    timestamp = row["timestamp"]
+    if isinstance(timestamp, datetime):
+        row["timestamp"] = timestamp.isoformat()
+    return row
+
+
+class AuditLogExportView(APIView):
+    """
+    Stream audit log entries as NDJSON (default) or CSV, oldest first.
+
+    Accepts the same filters as the list endpoint (`user`, `action`,
+    `model_name`, `from`, `to`) plus `include_archived=true` to prepend
+    matching entries from archive segments. Rows are read with a chunked
+    server-side iterator, so memory use does not grow with the export size.
+    """
+
+    permission_classes = [permissions.IsAuthenticated, IsCentralAuthority]
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+    chunk_size = 2000
+
+    def get(self, request):
+        params = request.query_params
+        filterset = AuditLogFilter(params, queryset=AuditLog.objects.all())
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        hot_rows = (
+            filterset.qs.order_by("timestamp", "id")
+            .values(*EXPORT_FIELDS)
+            .iterator(chunk_size=self.chunk_size)
+        )
+        rows = hot_rows
+        if params.get("include_archived") in ("1", "true", "True"):
+            archived = iter_archived_logs(
+                _parse_bound(params, "from"),
+                _parse_bound(params, "to"),
+                {key: params.get(key) for key in ("user", "action", "model_name")},
+            )
+            rows = chain(archived, hot_rows)
+
+        if request.accepted_renderer.format == "csv":
+            content = self._csv_lines(rows)
+            content_type = "text/csv"
+            filename = "audit-logs.csv"
+        else:
+            content = (json.dumps(_export_row(row), default=str) + "\n" for row in rows)
+            content_type = "application/x-ndjson"
+            filename = "audit-logs.ndjson"
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+    @staticmethod
+    def _csv_lines(rows):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(EXPORT_FIELDS)
+        for row in rows:
+            row = _export_row(row)
+            row["changes"] = json.dumps(row["changes"], default=str)
+            yield writer.writerow([row[field] for field in EXPORT_FIELDS])
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ASYNC": True,
+    "BATCH_SIZE": 200,
+    "FLUSH_INTERVAL_SECONDS": 1.0,
+    "QUEUE_MAX_SIZE": 10000,
+    "ENQUEUE_TIMEOUT_SECONDS": 0.01,
+}
+
+_STOP = object()
+
+
+class AuditLogWriter:
+    """
+    Buffered audit log persistence.
+
+    Callers enqueue unsaved ``AuditLog`` instances. A daemon thread writes them
+    with ``bulk_create`` whenever a batch fills up or the flush interval
+    elapses, so request latency no longer includes an audit INSERT.
+
+    When the queue is full, ``enqueue`` blocks for at most
+    ``ENQUEUE_TIMEOUT_SECONDS`` and then drops the entry (counted in
+    ``dropped``). The queue is drained on interpreter exit.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        flush_interval: float,
+        max_queue_size: int,
+        enqueue_timeout: float,
+        async_mode: bool = True,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        self.enqueue_timeout = enqueue_timeout
+        self.async_mode = async_mode
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+        self._counters = {"enqueued": 0, "flushed": 0, "dropped": 0, "failed": 0}
+        self._periodic_tasks: list[list] = []
+        self._stop_tasks: list = []
+
+    @classmethod
+    def from_settings(cls) -> "AuditLogWriter":
+        config = {**DEFAULTS, **getattr(settings, "AUDIT_LOG_WRITER", {})}
+        return cls(
+            batch_size=config["BATCH_SIZE"],
+            flush_interval=config["FLUSH_INTERVAL_SECONDS"],
+            max_queue_size=config["QUEUE_MAX_SIZE"],
+            enqueue_timeout=config["ENQUEUE_TIMEOUT_SECONDS"],
+            async_mode=config["ASYNC"],
+        )
+
+    def enqueue(self, entry) -> bool:
+        """Queue an unsaved AuditLog; returns False if it had to be dropped."""
+        if not self.async_mode:
+            self._write([entry])
+            return True
+        self._ensure_started()
+        try:
+            self._queue.put(entry, timeout=self.enqueue_timeout)
+        except queue.Full:
+            self._incr("dropped")
+            return False
+        self._incr("enqueued")
+        return True
+
+    def add_periodic_task(self, func, interval: float) -> None:
+        """Run ``func()`` on the writer thread roughly every ``interval`` seconds."""
+        self._periodic_tasks.append([func, interval, time.monotonic() + interval])
+
+    def add_stop_task(self, func) -> None:
+        """Run ``func()`` on the writer thread during shutdown, before the final drain."""
+        self._stop_tasks.append(func)
+
+    def stop(self, timeout: float | None = 10.0) -> None:
+        """Flush everything still queued and stop the background thread."""
+        thread = self._thread
+        if not thread or not thread.is_alive() or self._pid != os.getpid():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = dict(self._counters)
+        data["pending"] = self._queue.qsize()
+        data["async"] = self.async_mode
+        return data
+
+    def _incr(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+
+    def _ensure_started(self) -> None:
+        if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid is not None and self._pid != os.getpid():
+                # Forked child: the parent's thread and queued entries are not ours.
+                self._queue = queue.Queue(maxsize=self.max_queue_size)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name="audit-log-writer", daemon=True
+            )
+            self._thread.start()
+        atexit.register(self.stop)
+
+    def _run(self) -> None:
+        batch: list = []
+        deadline = time.monotonic() + self.flush_interval
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    item = None
+                if item is _STOP:
+                    self._run_stop_tasks()
+                    batch.extend(self._drain())
+                    break
+                if item is not None:
+                    batch.append(item)
+                if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                    if batch:
+                        self._write(batch)
+                        batch = []
+                    self._run_periodic_tasks()
+                    deadline = time.monotonic() + self.flush_interval
+            for start in range(0, len(batch), self.batch_size):
+                self._write(batch[start : start + self.batch_size])
+        finally:
+            connection.close()
+
+    def _run_periodic_tasks(self) -> None:
+        now = time.monotonic()
+        for task in self._periodic_tasks:
+            func, interval, due = task
+            if now < due:
+                continue
+            task[2] = now + interval
+            try:
+                func()
+            except Exception:
+                logger.exception("Audit writer periodic task %r failed", func)
+
+    def _run_stop_tasks(self) -> None:
+        for func in self._stop_tasks:
+            try:
+                func()
+            except Exception:
+                logger.exception("Audit writer stop task %r failed", func)
+
+    def _drain(self) -> list:
+        items = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return items
+            if item is not _STOP:
+                items.append(item)
+
+    def _write(self, batch: list) -> None:
+        from .counters import increment_daily_counts
+        from .models import AuditLog
+
+        if self.async_mode:
+            close_old_connections()
+        try:
+            with transaction.atomic():
+                AuditLog.objects.bulk_create(batch, batch_size=self.batch_size)
+                increment_daily_counts(batch)
+        except Exception:
+            logger.exception("Failed to persist %d audit log entries", len(batch))
+            self._incr("failed", len(batch))
+        else:
+            self._incr("flushed", len(batch))
+
+
+_writer: AuditLogWriter | None = None
+_writer_lock = threading.Lock()
+
+
+def get_audit_writer() -> AuditLogWriter:
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = AuditLogWriter.from_settings()
+    return _writer
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("companies", "0001_initial"),
+        ("complaints", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="wastereport",
+            index=models.Index(
+                fields=["reported_at"], name="wastereport_reported_at_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="wastereport",
+            index=models.Index(
+                fields=["resolved_at"], name="wastereport_resolved_at_idx"
+            ),
+        ),
+    ]
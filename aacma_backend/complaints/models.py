@@ -43,6 +43,14 @@ class WasteReport(models.Model):
     location_address = models.TextField()
     latitude = models.FloatField(null=True, blank=True)
     longitude = models.FloatField(null=True, blank=True)
+    # Zone containing the coordinates, set from zones.geofence when they change.
+    zone = models.ForeignKey(
+        "zones.Zone",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="waste_reports",
+    )
     photo_evidence = models.ImageField(
         upload_to="report_evidence/", null=True, blank=True
     )
@@ -70,6 +78,12 @@ class WasteReport(models.Model):
     reported_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["reported_at"], name="wastereport_reported_at_idx"),
+            models.Index(fields=["resolved_at"], name="wastereport_resolved_at_idx"),
+        ]
+
     def __str__(self) -> str:
         return f"Report {self.id}"
 
@@ -21,6 +21,7 @@ class WasteReportSerializer(serializers.ModelSerializer):
         read_only_fields = [
             "id",
             "resident",
+            "zone",
             "assigned_company",
             "assigned_to",
             "resolved_at",
@@ -1,3 +1,4 @@
+from django.db import transaction
 from django.utils import timezone
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
@@ -8,6 +9,8 @@ from notifications.models import Notification
 from accounts.models import User
 from .serializers import WasteReportSerializer, ReportCommentSerializer
 from accounts.permissions import IsResident, IsCentralAuthority
+from reports import latency
+from zones import geofence
 
 
 class ResidentWasteReportViewSet(viewsets.ModelViewSet):
@@ -22,7 +25,10 @@ class ResidentWasteReportViewSet(viewsets.ModelViewSet):
         return WasteReport.objects.filter(resident=self.request.user)
 
     def perform_create(self, serializer):
-        report = serializer.save(resident=self.request.user)
+        report = serializer.save(
+            resident=self.request.user,
+            zone_id=geofence.locate_for(serializer.validated_data),
+        )
         supervisors = User.objects.filter(role__slug="supervisor")
         for supervisor in supervisors:
             Notification.objects.create(
@@ -38,6 +44,9 @@ class ResidentWasteReportViewSet(viewsets.ModelViewSet):
                 },
             )
 
+    def perform_update(self, serializer):
+        serializer.save(zone_id=geofence.locate_for(serializer.validated_data, serializer.instance))
+
 
 class CentralWasteReportViewSet(viewsets.ModelViewSet):
     """
@@ -54,8 +63,11 @@ class CentralWasteReportViewSet(viewsets.ModelViewSet):
         response_text = request.data.get("response", "")
         report.response = response_text
         report.status = "resolved"
+        first_resolution = report.resolved_at is None
         report.resolved_at = timezone.now()
         report.save()
+        if first_resolution:
+            transaction.on_commit(lambda: latency.record_resolution(report))
         return Response(self.get_serializer(report).data)
 
     @action(detail=True, methods=["post"])
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class FleetConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "fleet"
+
+    def ready(self):
+        from .tokens import install_log_filter
+
+        install_log_filter()
@@ -0,0 +1,82 @@
+"""
+Nearest-vehicle search for dispatching collection requests.
+
+``nearest_vehicles`` loads the company's active vehicles with their remaining
+capacity in one query, then asks the live fleet index (``fleet.live``) for
+the closest of those that can still take the load.
+
+A vehicle's load is the weight of the requests assigned to it and not yet
+collected; a request without ``estimated_weight_kg`` counts ``KG_PER_BAG``
+per bag.
+"""
+from __future__ import annotations
+
+from django.db.models import F, FloatField, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .live import get_live_index
+from .models import Vehicle
+
+KG_PER_BAG = 10.0
+OPEN_STATUSES = ("assigned", "in_progress")
+DEFAULT_K = 5
+MAX_K = 50
+
+
+def request_weight_kg(request) -> float:
+    if request.estimated_weight_kg is not None:
+        return request.estimated_weight_kg
+    return request.quantity_bags * KG_PER_BAG
+
+
+def remaining_capacity(company_id: int, exclude_request_id: int | None = None) -> dict[int, float]:
+    """``{vehicle_id: kg}`` for the company's active vehicles."""
+    open_load = Q(collectionrequest__status__in=OPEN_STATUSES)
+    if exclude_request_id is not None:
+        open_load &= ~Q(collectionrequest__pk=exclude_request_id)
+    vehicles = (
+        Vehicle.objects.filter(company_id=company_id, current_status="active")
+        .annotate(
+            load=Coalesce(
+                Sum(
+                    Coalesce(
+                        "collectionrequest__estimated_weight_kg",
+                        F("collectionrequest__quantity_bags") * KG_PER_BAG,
+                        output_field=FloatField(),
+                    ),
+                    filter=open_load,
+                ),
+                0.0,
+                output_field=FloatField(),
+            )
+        )
+        .values_list("id", "capacity_kg", "load")
+    )
+    return {vehicle_id: capacity - load for vehicle_id, capacity, load in vehicles}
+
+
+def nearest_vehicles(
+    lat: float,
+    lng: float,
+    company_id: int,
+    k: int = DEFAULT_K,
+    min_capacity_kg: float = 0.0,
+    exclude_request_id: int | None = None,
+) -> list[dict]:
+    """The ``k`` closest active vehicles of the company with ``min_capacity_kg`` to spare."""
+    remaining = remaining_capacity(company_id, exclude_request_id)
+    eligible = {vehicle_id for vehicle_id, kg in remaining.items() if kg >= min_capacity_kg}
+    now = timezone.now()
+    return [
+        {
+            "vehicle_id": vehicle_id,
+            "plate_number": entry[0],
+            "lat": entry[3],
+            "lng": entry[4],
+            "distance_km": round(distance, 3),
+            "remaining_capacity_kg": round(remaining[vehicle_id], 1),
+            "position_age_s": round((now - entry[5]).total_seconds()) if entry[5] else None,
+        }
+        for distance, vehicle_id, entry in get_live_index().nearest(lat, lng, k, eligible.__contains__)
+    ]
@@ -9,6 +9,7 @@ from .driver_views import (
     driver_stop_complete,
     driver_complete_route,
     driver_update_location,
+    driver_location_batch,
     driver_report_issue,
 )
 
@@ -21,6 +22,7 @@ urlpatterns = [
     path("route/stop/<int:pk>/complete/", driver_stop_complete, name="driver-route-stop-complete"),
     path("route/complete/", driver_complete_route, name="driver-route-complete"),
     path("location/", driver_update_location, name="driver-location"),
+    path("location/batch/", driver_location_batch, name="driver-location-batch"),
     path("report-issue/", driver_report_issue, name="driver-report-issue"),
 ]
 
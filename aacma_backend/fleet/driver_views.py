@@ -4,7 +4,10 @@ from rest_framework import permissions, status
 from rest_framework.response import Response
 
 from accounts.permissions import IsDriver
+from . import telemetry
 from .models import Driver, Vehicle
+from .serializers import LocationBatchSerializer, LocationFixSerializer
+from routes import distance
 from routes.models import Route, RouteStop
 from routes.serializers import RouteSerializer, RouteStopSerializer
 
@@ -62,6 +65,7 @@ def driver_start_route(request):
         )
     route.status = "in_progress"
     route.actual_start_time = timezone.now()
+    distance.measure_driven(route)
     route.save()
     return Response(RouteSerializer(route).data)
 
@@ -101,6 +105,7 @@ def driver_complete_route(request):
         )
     route.status = "completed"
     route.actual_end_time = timezone.now()
+    distance.measure_driven(route)
     route.save()
     return Response(RouteSerializer(route).data)
 
@@ -114,13 +119,33 @@ def driver_update_location(request):
         return Response(
             {"detail": "No assigned vehicle"}, status=status.HTTP_400_BAD_REQUEST
         )
-    vehicle.last_location_lat = request.data.get("lat")
-    vehicle.last_location_lng = request.data.get("lng")
-    vehicle.last_location_update = timezone.now()
-    vehicle.save()
+    serializer = LocationFixSerializer(
+        data={"lat": request.data.get("lat"), "lng": request.data.get("lng"), "recorded_at": timezone.now()}
+    )
+    serializer.is_valid(raise_exception=True)
+    telemetry.ingest(vehicle, [serializer.validated_data], driver=driver)
     return Response({"detail": "Location updated"})
 
 
+@api_view(["POST"])
+@permission_classes([permissions.IsAuthenticated, IsDriver])
+def driver_location_batch(request):
+    """
+    Batch of timestamped fixes for the driver's vehicle, e.g. a minute of
+    GPS readings sent in one request.
+    """
+    driver: Driver = request.user.driver_profile  # type: ignore[assignment]
+    vehicle = driver.assigned_vehicle
+    if not vehicle:
+        return Response(
+            {"detail": "No assigned vehicle"}, status=status.HTTP_400_BAD_REQUEST
+        )
+    serializer = LocationBatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    result = telemetry.ingest(vehicle, serializer.validated_data["fixes"], driver=driver)
+    return Response(result, status=status.HTTP_201_CREATED)
+
+
 @api_view(["POST"])
 @permission_classes([permissions.IsAuthenticated, IsDriver])
 def driver_report_issue(request):
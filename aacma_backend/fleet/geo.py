@@ -0,0 +1,39 @@
+"""Great-circle distances between (lat, lng) points in degrees."""
+from __future__ import annotations
+
+import math
+from array import array
+from itertools import repeat
+from operator import mul
+
+EARTH_RADIUS_KM = 6371.0088
+# Shortest distance one degree of latitude spans, for conservative search bounds.
+KM_PER_DEGREE = math.radians(1) * EARTH_RADIUS_KM
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (
+        math.sin((phi2 - phi1) / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def path_km(lats, lngs) -> float:
+    """
+    Length of the path through the points, in order, evaluated column-wise:
+    points become unit vectors and each leg is the arc of the chord between
+    consecutive vectors (``math.dist``), each step one ``map`` of a C function
+    over the whole path. Same result as summing ``haversine_km`` over the legs.
+    """
+    if len(lats) < 2:
+        return 0.0
+    phi = array("d", map(math.radians, lats))
+    lam = array("d", map(math.radians, lngs))
+    cos_phi = array("d", map(math.cos, phi))
+    vectors = list(
+        zip(map(mul, cos_phi, map(math.cos, lam)), map(mul, cos_phi, map(math.sin, lam)), map(math.sin, phi))
+    )
+    chords = map(math.dist, vectors[1:], vectors[:-1])
+    return 2 * EARTH_RADIUS_KM * math.fsum(map(math.asin, map(min, map(mul, chords, repeat(0.5)), repeat(1.0))))
@@ -0,0 +1,241 @@
+"""
+Grid index over the latest vehicle positions, for viewport queries.
+
+Each vehicle with a known position sits in one ``CELL_DEGREES`` square cell.
+A bounding-box query visits only the cells overlapping the box, so its cost
+follows the number of vehicles in view rather than the fleet size.
+
+``nearest`` walks rings of cells outwards from a point and stops once no
+unvisited cell can hold a closer vehicle.
+
+Positions recorded in this process arrive from the position store as they
+happen. Changes written by other processes are picked up from the
+``Vehicle`` rows, by ``updated_at``, at most every ``REFRESH_SECONDS``; the
+whole index is reloaded every ``RELOAD_SECONDS`` to drop deleted vehicles.
+Listeners (``fleet.stream``) are told about every move either way.
+"""
+from __future__ import annotations
+
+import heapq
+import itertools
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .geo import KM_PER_DEGREE, haversine_km
+from .positions import get_position_store
+
+CELL_DEGREES = 0.01  # about 1.1 km at Addis Ababa's latitude
+REFRESH_SECONDS = 2.0
+RELOAD_SECONDS = 300.0
+
+FIELDS = ["id", "plate", "lat", "lng", "status", "age_s"]
+
+
+def _cell(lat: float, lng: float) -> tuple[int, int]:
+    return math.floor(lat / CELL_DEGREES), math.floor(lng / CELL_DEGREES)
+
+
+class LiveFleetIndex:
+    def __init__(self):
+        self._cells: dict[tuple[int, int], set[int]] = {}
+        # vehicle id -> [plate, status, company id, lat, lng, at, cell]
+        self._vehicles: dict[int, list] = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        # Monotonic clock readings; -inf so the first refresh is never skipped.
+        self._loaded_at = -math.inf
+        self._refreshed_at = -math.inf
+        # Start of the last refresh (wall clock); None until the first full load.
+        self._watermark = None
+        self._listeners: list = []
+
+    def add_listener(self, func) -> None:
+        """Call ``func(vehicle_id, company_id, entry)`` whenever a vehicle's position changes."""
+        self._listeners.append(func)
+
+    def move(self, vehicle_id: int, lat: float, lng: float, at) -> None:
+        """Place a vehicle already in the index at a newer position."""
+        with self._lock:
+            entry = self._vehicles.get(vehicle_id)
+            if entry is not None and (entry[5] is None or entry[5] < at):
+                self._place(vehicle_id, entry, lat, lng, at)
+
+    def query(self, south: float, west: float, north: float, east: float, company_id=None) -> list[list]:
+        """``FIELDS`` rows for the vehicles inside the box, optionally of one company."""
+        self.refresh()
+        now = timezone.now()
+        low_row, low_col = _cell(south, west)
+        high_row, high_col = _cell(north, east)
+        rows = []
+        with self._lock:
+            if (high_row - low_row + 1) * (high_col - low_col + 1) > len(self._cells):
+                # Box wider than the populated area: scan the occupied cells instead.
+                cells = [
+                    members
+                    for (row, col), members in self._cells.items()
+                    if low_row <= row <= high_row and low_col <= col <= high_col
+                ]
+            else:
+                cells = [
+                    self._cells[(row, col)]
+                    for row in range(low_row, high_row + 1)
+                    for col in range(low_col, high_col + 1)
+                    if (row, col) in self._cells
+                ]
+            for members in cells:
+                for vehicle_id in members:
+                    plate, status, company, lat, lng, at, _ = self._vehicles[vehicle_id]
+                    if company_id is not None and company != company_id:
+                        continue
+                    if south <= lat <= north and west <= lng <= east:
+                        age = round((now - at).total_seconds()) if at else None
+                        rows.append([vehicle_id, plate, lat, lng, status, age])
+        rows.sort()
+        return rows
+
+    def entries(self, company_id=None) -> list[tuple[int, list]]:
+        """Copies of the index entries with a known position, optionally of one company."""
+        self.refresh()
+        with self._lock:
+            return [
+                (vehicle_id, list(entry))
+                for vehicle_id, entry in sorted(self._vehicles.items())
+                if entry[3] is not None and (company_id is None or entry[2] == company_id)
+            ]
+
+    def nearest(self, lat: float, lng: float, k: int, accept=None) -> list[tuple[float, int, list]]:
+        """
+        Up to ``k`` (distance km, vehicle id, entry copy) for the vehicles
+        closest to the point, nearest first, skipping those ``accept(vehicle_id)``
+        rejects.
+        """
+        if k <= 0:
+            return []
+        self.refresh()
+        row0, col0 = _cell(lat, lng)
+        best: list[tuple[float, int]] = []  # max-heap of (-distance, -vehicle id)
+
+        def consider(members):
+            for vehicle_id in members:
+                if accept is not None and not accept(vehicle_id):
+                    continue
+                entry = self._vehicles[vehicle_id]
+                item = (-haversine_km(lat, lng, entry[3], entry[4]), -vehicle_id)
+                if len(best) < k:
+                    heapq.heappush(best, item)
+                elif item > best[0]:
+                    heapq.heapreplace(best, item)
+
+        with self._lock:
+            for radius in itertools.count():
+                if (2 * radius + 1) ** 2 > 4 * len(self._cells):
+                    # The rings now cover more cells than are occupied: scan the rest.
+                    for (row, col), members in self._cells.items():
+                        if max(abs(row - row0), abs(col - col0)) >= radius:
+                            consider(members)
+                    break
+                for row in range(row0 - radius, row0 + radius + 1):
+                    step = 1 if abs(row - row0) == radius else 2 * radius or 1
+                    for col in range(col0 - radius, col0 + radius + 1, step):
+                        members = self._cells.get((row, col))
+                        if members:
+                            consider(members)
+                if len(best) == k:
+                    # Cells of the next ring are at least `radius` cells away in latitude or
+                    # longitude; the longitude bound shrinks with latitude.
+                    reach = radius * CELL_DEGREES
+                    bound = reach * KM_PER_DEGREE * math.cos(math.radians(min(89.0, abs(lat) + reach + CELL_DEGREES)))
+                    if -best[0][0] <= bound:
+                        break
+            found = sorted((-distance, -negative_id) for distance, negative_id in best)
+            return [(distance, vehicle_id, list(self._vehicles[vehicle_id])) for distance, vehicle_id in found]
+
+    def _place(self, vehicle_id: int, entry: list, lat, lng, at) -> None:
+        old_cell = entry[6]
+        new_cell = _cell(lat, lng) if lat is not None and lng is not None else None
+        if old_cell != new_cell:
+            if old_cell is not None:
+                members = self._cells[old_cell]
+                members.discard(vehicle_id)
+                if not members:
+                    del self._cells[old_cell]
+            if new_cell is not None:
+                self._cells.setdefault(new_cell, set()).add(vehicle_id)
+        moved = entry[3:6] != [lat, lng, at]
+        entry[3:7] = [lat, lng, at, new_cell]
+        if moved and lat is not None:
+            for listener in self._listeners:
+                listener(vehicle_id, entry[2], entry)
+
+    def refresh(self) -> None:
+        """Pick up rows changed by other processes, at most every ``REFRESH_SECONDS``."""
+        now = time.monotonic()
+        if now - self._refreshed_at < REFRESH_SECONDS:
+            return
+        # One refresh at a time; others keep serving the current positions,
+        # except before the first load, when there are none to serve.
+        if not self._refresh_lock.acquire(blocking=self._watermark is None):
+            return
+        try:
+            self._refresh(now)
+        finally:
+            self._refresh_lock.release()
+
+    def _refresh(self, now: float) -> None:
+        from .models import Vehicle
+
+        if now - self._refreshed_at < REFRESH_SECONDS:
+            return
+        reload = self._watermark is None or now - self._loaded_at >= RELOAD_SECONDS
+        started = timezone.now()
+        vehicles = Vehicle.objects.only(
+            "id",
+            "plate_number",
+            "current_status",
+            "company_id",
+            "last_location_lat",
+            "last_location_lng",
+            "last_location_update",
+        )
+        if not reload:
+            # Small overlap so a row saved while the previous refresh ran is not missed.
+            vehicles = vehicles.filter(updated_at__gte=self._watermark - timedelta(seconds=1))
+        vehicles = list(vehicles)
+        # Fixes held by this process's store may be newer than the rows.
+        positions = get_position_store().get_many(vehicles)
+        with self._lock:
+            if reload:
+                for vehicle_id in self._vehicles.keys() - {vehicle.pk for vehicle in vehicles}:
+                    self._place(vehicle_id, self._vehicles.pop(vehicle_id), None, None, None)
+            for vehicle in vehicles:
+                entry = self._vehicles.get(vehicle.pk)
+                if entry is None:
+                    entry = self._vehicles[vehicle.pk] = [None, None, None, None, None, None, None]
+                entry[0:3] = [vehicle.plate_number, vehicle.current_status, vehicle.company_id]
+                position = positions.get(vehicle.pk)
+                if position is None:
+                    self._place(vehicle.pk, entry, None, None, None)
+                elif entry[5] is None or entry[5] <= position["at"]:
+                    self._place(vehicle.pk, entry, position["lat"], position["lng"], position["at"])
+            self._watermark = started
+            self._refreshed_at = now
+            if reload:
+                self._loaded_at = now
+
+
+_index: LiveFleetIndex | None = None
+_index_lock = threading.Lock()
+
+
+def get_live_index() -> LiveFleetIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = LiveFleetIndex()
+                get_position_store().add_listener(_index.move)
+    return _index
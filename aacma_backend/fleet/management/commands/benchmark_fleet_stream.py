@@ -0,0 +1,140 @@
+import random
+import statistics
+import threading
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from aacma.benchmarking import benchmark_database
+from companies.models import WasteCompany
+from fleet.models import Vehicle
+from fleet.stream import ALL_COMPANIES, FleetBroadcaster
+
+
+class Listener(threading.Thread):
+    """Consumes one stream in-process and records when each tick's event arrives."""
+
+    def __init__(self, broadcaster, company_id, ready):
+        super().__init__(daemon=True)
+        self.broadcaster = broadcaster
+        self.company_id = company_id
+        self.ready = ready
+        self.received: dict[int, float] = {}
+        self.bytes = 0
+
+    def run(self):
+        # Daemon thread: left blocked on the next tick when the command exits.
+        for chunk in self.broadcaster.open(self.company_id, max_seconds=3600):
+            self.bytes += len(chunk)
+            if chunk.startswith(b"event: snapshot"):
+                self.ready.release()
+            elif chunk.startswith(b"event: positions"):
+                seq = int(chunk.split(b"\n", 2)[1][4:])
+                self.received[seq] = time.perf_counter()
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the fan-out cost of the live fleet SSE stream: in-process "
+        "listeners (one thread each, as under gunicorn gthread) follow a random "
+        "company or the whole fleet while vehicles move. Runs against a "
+        "throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--listeners", type=int, default=2000)
+        parser.add_argument("--vehicles", type=int, default=2000)
+        parser.add_argument("--companies", type=int, default=20)
+        parser.add_argument("--moves-per-tick", type=int, default=500)
+        parser.add_argument("--ticks", type=int, default=20)
+        parser.add_argument("--tick-seconds", type=float, default=0.5)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            companies = self._seed(options["vehicles"], options["companies"])
+            broadcaster = FleetBroadcaster(tick_seconds=None)  # ticks are driven below
+            rng = random.Random(0)
+
+            self.stdout.write(f"Connecting {options['listeners']:,} listeners...")
+            ready = threading.Semaphore(0)
+            listeners = [
+                Listener(broadcaster, rng.choice(companies + [ALL_COMPANIES]), ready)
+                for _ in range(options["listeners"])
+            ]
+            for listener in listeners:
+                listener.start()
+            for _ in listeners:
+                ready.acquire()
+
+            vehicles = list(Vehicle.objects.values_list("id", "plate_number", "company_id"))
+            latencies, cpu = [], []
+            for _ in range(options["ticks"]):
+                now = timezone.now()
+                for vehicle_id, plate, company_id in rng.sample(vehicles, min(options["moves_per_tick"], len(vehicles))):
+                    entry = [plate, "active", company_id, rng.uniform(8.8, 9.1), rng.uniform(38.6, 39.0), now, None]
+                    broadcaster.publish(vehicle_id, company_id, entry)
+                cpu_start = time.process_time()
+                started = time.perf_counter()
+                broadcaster.tick()
+                seq = broadcaster.stats()["seq"]
+                time.sleep(options["tick_seconds"])
+                cpu.append((time.process_time() - cpu_start) * 1000)
+                arrivals = [listener.received[seq] for listener in listeners if seq in listener.received]
+                if arrivals:
+                    latencies.append((max(arrivals) - started) * 1000)
+
+            stats = broadcaster.stats()
+            delivered = sum(listener.bytes for listener in listeners)
+
+        self.stdout.write(f"listeners              {options['listeners']:>10,}")
+        self.stdout.write(f"vehicles moved / tick  {options['moves_per_tick']:>10,}")
+        self.stdout.write(f"ticks                  {stats['ticks']:>10,}")
+        self.stdout.write(f"events encoded         {stats['events_encoded']:>10,}")
+        self.stdout.write(f"bytes encoded          {stats['bytes_encoded']:>10,}")
+        self.stdout.write(f"bytes delivered        {delivered:>10,}")
+        if latencies:
+            self.stdout.write(
+                f"fan-out ms (last listener) median {statistics.median(latencies):.1f}, max {max(latencies):.1f}"
+            )
+        self.stdout.write(f"CPU ms per tick        median {statistics.median(cpu):.1f}")
+
+    def _seed(self, count, company_count):
+        call_command("seed_data", stdout=StringIO())
+        call_command("seed_waste_company_sample", stdout=StringIO())
+        template = WasteCompany.objects.first()
+        companies = [template] + WasteCompany.objects.bulk_create(
+            [
+                WasteCompany(
+                    name=f"Bench Company {index}",
+                    license_number=f"BENCH-{index}",
+                    contact_email=template.contact_email,
+                    contact_phone=template.contact_phone,
+                    address=template.address,
+                    status="approved",
+                )
+                for index in range(company_count - 1)
+            ]
+        )
+        self.stdout.write(f"Seeding {count:,} vehicles...")
+        rng = random.Random(1)
+        now = timezone.now()
+        Vehicle.objects.bulk_create(
+            [
+                Vehicle(
+                    plate_number=f"BENCH-{index}",
+                    vehicle_type="compactor",
+                    capacity_kg=10_000,
+                    company=rng.choice(companies),
+                    current_status="active",
+                    last_location_lat=rng.uniform(8.8, 9.1),
+                    last_location_lng=rng.uniform(38.6, 39.0),
+                    last_location_update=now,
+                )
+                for index in range(count)
+            ],
+            batch_size=1000,
+        )
+        return [company.id for company in companies]
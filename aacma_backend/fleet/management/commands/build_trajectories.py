@@ -0,0 +1,25 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from fleet.trajectory import build_closed_days, build_day
+
+
+class Command(BaseCommand):
+    help = (
+        "Store simplified daily traces for closed days that do not have one yet. "
+        "Run daily after midnight; --date rebuilds a single day."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="First day to consider (YYYY-MM-DD). Defaults to the earliest fix.")
+        parser.add_argument("--date", help="Rebuild every vehicle's trace for this day (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        try:
+            since = date.fromisoformat(options["since"]) if options["since"] else None
+            day = date.fromisoformat(options["date"]) if options["date"] else None
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        built = build_day(day) if day else build_closed_days(since)
+        self.stdout.write(self.style.SUCCESS(f"Stored {built} vehicle traces."))
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fleet", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VehicleLocationPing",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("recorded_at", models.DateTimeField()),
+                ("latitude", models.FloatField()),
+                ("longitude", models.FloatField()),
+                ("speed_kmh", models.FloatField(blank=True, null=True)),
+                ("heading", models.FloatField(blank=True, null=True)),
+                ("accuracy_m", models.FloatField(blank=True, null=True)),
+                ("received_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "driver",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="location_pings",
+                        to="fleet.driver",
+                    ),
+                ),
+                (
+                    "vehicle",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="location_pings",
+                        to="fleet.vehicle",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["vehicle", "recorded_at"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("vehicle", "recorded_at"),
+                        name="fleet_ping_vehicle_time_unique",
+                    )
+                ],
+            },
+        ),
+    ]
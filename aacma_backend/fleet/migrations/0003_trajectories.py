@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fleet", "0002_location_pings"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VehicleTrajectory",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                ("day", models.DateField()),
+                ("tolerance_m", models.FloatField()),
+                ("raw_points", models.PositiveIntegerField()),
+                ("points", models.PositiveIntegerField()),
+                ("started_at", models.DateTimeField(null=True)),
+                ("ended_at", models.DateTimeField(null=True)),
+                ("polyline", models.TextField()),
+                ("offsets_s", models.JSONField(default=list)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "ordering": ["vehicle", "-day"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="vehiclelocationping",
+            index=models.Index(
+                fields=["recorded_at"], name="fleet_ping_recorded_at_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="vehicletrajectory",
+            name="vehicle",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="trajectories",
+                to="fleet.vehicle",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="vehicletrajectory",
+            constraint=models.UniqueConstraint(
+                fields=("vehicle", "day"), name="fleet_trajectory_vehicle_day_unique"
+            ),
+        ),
+    ]
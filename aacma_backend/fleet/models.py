@@ -87,3 +87,66 @@ class Driver(models.Model):
     def __str__(self) -> str:
         return f"{self.user.get_full_name()} ({self.license_number})"
 
+
+class VehicleLocationPing(models.Model):
+    """
+    Append-only history of GPS fixes reported for a vehicle.
+
+    Written in batches by ``fleet.telemetry.ingest``; ``recorded_at`` is the
+    device time of the fix, so a resent batch is ignored rather than stored
+    twice.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE, related_name="location_pings")
+    driver = models.ForeignKey(
+        Driver, on_delete=models.SET_NULL, null=True, blank=True, related_name="location_pings"
+    )
+    recorded_at = models.DateTimeField()
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    zone = models.ForeignKey(
+        "zones.Zone", on_delete=models.SET_NULL, null=True, blank=True, related_name="location_pings"
+    )
+    speed_kmh = models.FloatField(null=True, blank=True)
+    heading = models.FloatField(null=True, blank=True)
+    accuracy_m = models.FloatField(null=True, blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["vehicle", "recorded_at"]
+        constraints = [
+            models.UniqueConstraint(fields=["vehicle", "recorded_at"], name="fleet_ping_vehicle_time_unique"),
+        ]
+        indexes = [models.Index(fields=["recorded_at"], name="fleet_ping_recorded_at_idx")]
+
+    def __str__(self) -> str:
+        return f"{self.vehicle_id} @ {self.recorded_at}"
+
+
+class VehicleTrajectory(models.Model):
+    """
+    Douglas-Peucker simplified trace of one vehicle's fixes for a closed
+    local day, stored as an encoded polyline. Built by ``fleet.trajectory``.
+    """
+
+    id = models.AutoField(primary_key=True)
+    vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE, related_name="trajectories")
+    day = models.DateField()
+    tolerance_m = models.FloatField()
+    raw_points = models.PositiveIntegerField()
+    points = models.PositiveIntegerField()
+    started_at = models.DateTimeField(null=True)
+    ended_at = models.DateTimeField(null=True)
+    polyline = models.TextField()
+    offsets_s = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["vehicle", "-day"]
+        constraints = [
+            models.UniqueConstraint(fields=["vehicle", "day"], name="fleet_trajectory_vehicle_day_unique"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.vehicle_id} {self.day}"
@@ -0,0 +1,221 @@
+"""
+Latest vehicle positions, kept in memory and written to ``Vehicle`` lazily.
+
+``PositionStore.update`` records a fix in an in-process dict and in the
+default cache (shared between processes when ``DJANGO_REDIS_URL`` is set),
+and marks the vehicle dirty. Dirty vehicles are written to
+``Vehicle.last_location_*`` with one conditional bulk UPDATE, at most once
+every ``FLUSH_INTERVAL_SECONDS`` per vehicle, by a daemon thread (or inline
+on the next update when ``ASYNC`` is off). Reads go to the store first and
+fall back to the row.
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection
+from django.db.models import Case, F, Q, When
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ASYNC": True,
+    "FLUSH_INTERVAL_SECONDS": 10.0,
+    "CACHE_TTL_SECONDS": 3600,
+}
+
+FIELDS = {
+    "last_location_lat": "lat",
+    "last_location_lng": "lng",
+    "last_location_update": "at",
+}
+
+
+def _cache_key(vehicle_id) -> str:
+    return f"fleet:position:{vehicle_id}"
+
+
+class PositionStore:
+    def __init__(self, flush_interval: float, cache_ttl: int, async_mode: bool = True):
+        self.flush_interval = flush_interval
+        self.cache_ttl = cache_ttl
+        self.async_mode = async_mode
+        self._latest: dict[int, dict] = {}
+        self._dirty: set[int] = set()
+        self._flushed_at: dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+        self._counters = {"updates": 0, "stale": 0, "flushes": 0, "rows_written": 0, "failed": 0}
+        self._listeners: list = []
+
+    @classmethod
+    def from_settings(cls) -> "PositionStore":
+        config = {**DEFAULTS, **getattr(settings, "FLEET_POSITIONS", {})}
+        return cls(
+            flush_interval=config["FLUSH_INTERVAL_SECONDS"],
+            cache_ttl=config["CACHE_TTL_SECONDS"],
+            async_mode=config["ASYNC"],
+        )
+
+    def update(self, vehicle, lat: float, lng: float, at) -> bool:
+        """
+        Record ``vehicle``'s position at ``at``. Returns False if the store or
+        the vehicle row already holds a newer fix.
+        """
+        position = {"lat": lat, "lng": lng, "at": at}
+        with self._lock:
+            current = self._latest.get(vehicle.pk)
+            newest = current["at"] if current else vehicle.last_location_update
+            if newest and newest >= at:
+                self._counters["stale"] += 1
+                return False
+            self._latest[vehicle.pk] = position
+            self._dirty.add(vehicle.pk)
+            self._counters["updates"] += 1
+        cache.set(_cache_key(vehicle.pk), position, self.cache_ttl)
+        for listener in self._listeners:
+            listener(vehicle.pk, lat, lng, at)
+        if self.async_mode:
+            self._ensure_started()
+        else:
+            self.flush()
+        return True
+
+    def add_listener(self, func) -> None:
+        """Call ``func(vehicle_id, lat, lng, at)`` for every accepted update."""
+        self._listeners.append(func)
+
+    def get(self, vehicle) -> dict | None:
+        """Latest known ``{"lat", "lng", "at"}`` for ``vehicle``."""
+        return self.get_many([vehicle]).get(vehicle.pk)
+
+    def get_many(self, vehicles) -> dict:
+        """``{vehicle_id: {"lat", "lng", "at"}}`` from the store, the cache or the rows."""
+        positions = {}
+        for vehicle in vehicles:
+            if vehicle.last_location_update is not None:
+                positions[vehicle.pk] = {
+                    "lat": vehicle.last_location_lat,
+                    "lng": vehicle.last_location_lng,
+                    "at": vehicle.last_location_update,
+                }
+        cached = cache.get_many([_cache_key(vehicle.pk) for vehicle in vehicles])
+        with self._lock:
+            local = {vehicle.pk: self._latest.get(vehicle.pk) for vehicle in vehicles}
+        for vehicle in vehicles:
+            for candidate in (cached.get(_cache_key(vehicle.pk)), local[vehicle.pk]):
+                known = positions.get(vehicle.pk)
+                if candidate and (known is None or candidate["at"] > known["at"]):
+                    positions[vehicle.pk] = candidate
+        return positions
+
+    def flush(self, force: bool = False) -> int:
+        """
+        Write dirty positions not written in the last ``flush_interval``
+        seconds (all of them with ``force``). Returns the rows updated.
+        """
+        with self._flush_lock:
+            now = time.monotonic()
+            with self._lock:
+                due = {
+                    pk: self._latest[pk]
+                    for pk in self._dirty
+                    if force or now - self._flushed_at.get(pk, 0.0) >= self.flush_interval
+                }
+                self._dirty -= due.keys()
+            if not due:
+                return 0
+            try:
+                rows = self._write(due)
+            except Exception:
+                logger.exception("Failed to write %d vehicle positions", len(due))
+                with self._lock:
+                    self._counters["failed"] += 1
+                    self._dirty |= due.keys()
+                return 0
+            with self._lock:
+                for pk in due:
+                    self._flushed_at[pk] = now
+                self._counters["flushes"] += 1
+                self._counters["rows_written"] += rows
+            return rows
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = dict(self._counters)
+            data["pending"] = len(self._dirty)
+        data["async"] = self.async_mode
+        return data
+
+    def stop(self) -> None:
+        """Stop the flush thread and write everything still pending."""
+        thread = self._thread
+        if thread and thread.is_alive() and self._pid == os.getpid():
+            self._stop.set()
+            thread.join(10.0)
+        self.flush(force=True)
+
+    def _write(self, due: dict) -> int:
+        from .models import Vehicle
+
+        # Only move a row forward; another process may have written a newer fix.
+        newer = {
+            pk: Q(pk=pk) & (Q(last_location_update__isnull=True) | Q(last_location_update__lt=position["at"]))
+            for pk, position in due.items()
+        }
+        updates = {
+            field: Case(
+                *[When(newer[pk], then=position[key]) for pk, position in due.items()],
+                default=F(field),
+            )
+            for field, key in FIELDS.items()
+        }
+        return Vehicle.objects.filter(pk__in=list(due)).update(**updates, updated_at=timezone.now())
+
+    def _ensure_started(self) -> None:
+        if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid is not None and self._pid != os.getpid():
+                # Forked child: the parent's pending positions are not ours to write.
+                self._dirty = set()
+                self._flushed_at = {}
+            self._pid = os.getpid()
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, name="fleet-position-writer", daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+
+    def _run(self) -> None:
+        tick = min(1.0, self.flush_interval)
+        try:
+            while not self._stop.wait(tick):
+                close_old_connections()
+                self.flush()
+        finally:
+            connection.close()
+
+
+_store: PositionStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_position_store() -> PositionStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PositionStore.from_settings()
+    return _store
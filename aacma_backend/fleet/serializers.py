@@ -1,6 +1,22 @@
+from datetime import timedelta
+
+from django.db import models
+from django.utils import timezone
 from rest_framework import serializers
 
 from .models import Vehicle, Driver
+from .positions import get_position_store
+
+# Fixes stamped further ahead of the server clock than this are rejected.
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+
+class VehicleListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        # One position store lookup for the whole page, shared through the context.
+        vehicles = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        self.context["positions"] = get_position_store().get_many(vehicles)
+        return super().to_representation(vehicles)
 
 
 class VehicleSerializer(serializers.ModelSerializer):
@@ -8,6 +24,21 @@ class VehicleSerializer(serializers.ModelSerializer):
         model = Vehicle
         fields = "__all__"
         read_only_fields = ["id", "created_at", "updated_at", "last_location_update"]
+        list_serializer_class = VehicleListSerializer
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # The row may lag the position store by up to one flush interval.
+        positions = self.context.get("positions")
+        if positions is None:
+            position = get_position_store().get(instance)
+        else:
+            position = positions.get(instance.pk)
+        if position:
+            data["last_location_lat"] = position["lat"]
+            data["last_location_lng"] = position["lng"]
+            data["last_location_update"] = serializers.DateTimeField().to_representation(position["at"])
+        return data
 
 
 class DriverSerializer(serializers.ModelSerializer):
@@ -18,3 +49,20 @@ class DriverSerializer(serializers.ModelSerializer):
         fields = "__all__"
         read_only_fields = ["id", "created_at", "updated_at", "total_collections", "rating"]
 
+
+class LocationFixSerializer(serializers.Serializer):
+    recorded_at = serializers.DateTimeField()
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lng = serializers.FloatField(min_value=-180, max_value=180)
+    speed_kmh = serializers.FloatField(min_value=0, required=False, allow_null=True)
+    heading = serializers.FloatField(min_value=0, max_value=360, required=False, allow_null=True)
+    accuracy_m = serializers.FloatField(min_value=0, required=False, allow_null=True)
+
+    def validate_recorded_at(self, value):
+        if value > timezone.now() + MAX_CLOCK_SKEW:
+            raise serializers.ValidationError("Fix is timestamped in the future.")
+        return value
+
+
+class LocationBatchSerializer(serializers.Serializer):
+    fixes = LocationFixSerializer(many=True, allow_empty=False, max_length=600)
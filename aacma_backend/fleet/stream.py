@@ -0,0 +1,261 @@
+"""
+Server-Sent Events fan-out of live vehicle positions.
+
+``FleetBroadcaster`` listens to the live index (``fleet.live``) and collects
+moved vehicles, keeping only the latest position of each. Every
+``TICK_SECONDS`` a daemon thread refreshes the index (picking up other
+processes' writes), closes the tick and wakes the listeners. Each company's
+delta for a tick is encoded once and shared by all of its listeners, so the
+per-listener cost of a tick is a wake-up and a socket write.
+
+``events`` is the generator behind ``/api/fleet/stream/``: a snapshot of the
+company's vehicles, then one ``positions`` event per tick with the vehicles
+that moved. A listener that falls more than ``HISTORY_TICKS`` behind gets a
+fresh snapshot. Streams end after ``MAX_STREAM_SECONDS``, which lets worker
+threads be recycled; clients reconnect with a fresh stream token
+(``fleet.tokens``).
+
+Every listener holds a server thread while connected, so ``open`` hands out
+at most ``max_listeners`` streams per process (``FLEET_STREAM["MAX_LISTENERS"]``)
+and raises ``StreamFull`` beyond that, leaving the remaining threads to
+ordinary requests.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+from .live import get_live_index
+
+logger = logging.getLogger(__name__)
+
+TICK_SECONDS = 1.0
+HISTORY_TICKS = 30
+HEARTBEAT_SECONDS = 15.0
+MAX_STREAM_SECONDS = 300.0
+RETRY_MS = 3000
+DEFAULT_MAX_LISTENERS = 40
+
+FIELDS = ["id", "plate", "lat", "lng", "status", "at"]
+ALL_COMPANIES = None
+
+
+def _row(vehicle_id: int, entry: list) -> list:
+    plate, status, _, lat, lng, at, _ = entry
+    return [vehicle_id, plate, lat, lng, status, round(at.timestamp()) if at else None]
+
+
+def _event(name: str, data, event_id=None) -> bytes:
+    lines = [f"event: {name}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append("data: " + json.dumps(data, separators=(",", ":")))
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+class StreamFull(Exception):
+    """Every listener slot of this process is taken."""
+
+
+class _Tick:
+    __slots__ = ("seq", "rows", "encoded")
+
+    def __init__(self, seq: int, rows: dict):
+        self.seq = seq
+        # company id -> {vehicle id: row}
+        self.rows = rows
+        self.encoded: dict = {}
+
+    def rows_for(self, company_id) -> dict:
+        if company_id is ALL_COMPANIES:
+            merged = {}
+            for rows in self.rows.values():
+                merged.update(rows)
+            return merged
+        return self.rows.get(company_id, {})
+
+
+class _Listener:
+    """A listener's event iterator; holds its slot until closed or exhausted."""
+
+    def __init__(self, broadcaster: "FleetBroadcaster", events):
+        self._broadcaster = broadcaster
+        self._events = events
+        self._open = True
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> bytes:
+        try:
+            return next(self._events)
+        except StopIteration:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        # Called by the server when the response ends or the client goes away.
+        self._events.close()
+        if self._open:
+            self._open = False
+            self._broadcaster._release()
+
+
+class FleetBroadcaster:
+    def __init__(self, tick_seconds: float | None = TICK_SECONDS, max_listeners: int | None = None):
+        # tick_seconds=None: no ticker thread; the caller drives tick().
+        # max_listeners=None: no limit.
+        self.tick_seconds = tick_seconds
+        self.max_listeners = max_listeners
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._pending: dict[int, tuple] = {}
+        self._history: deque[_Tick] = deque(maxlen=HISTORY_TICKS)
+        self._listeners = 0
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+        self._counters = {"ticks": 0, "events_encoded": 0, "bytes_encoded": 0, "snapshots": 0, "refused": 0}
+
+    def publish(self, vehicle_id: int, company_id, entry: list) -> None:
+        """Index listener: remember the latest position of a moved vehicle until the next tick."""
+        row = _row(vehicle_id, entry)
+        with self._cond:
+            self._pending[vehicle_id] = (company_id, row)
+
+    def tick(self) -> int:
+        """Close the current tick and wake the listeners. Returns the vehicles in it."""
+        with self._cond:
+            pending, self._pending = self._pending, {}
+            rows: dict = {}
+            for vehicle_id, (company_id, row) in pending.items():
+                rows.setdefault(company_id, {})[vehicle_id] = row
+            self._seq += 1
+            self._history.append(_Tick(self._seq, rows))
+            self._counters["ticks"] += 1
+            self._cond.notify_all()
+        return len(pending)
+
+    def open(self, company_id=ALL_COMPANIES, max_seconds: float = MAX_STREAM_SECONDS) -> _Listener:
+        """
+        Take a listener slot and return the listener's SSE byte chunks;
+        ``company_id=None`` follows every company. Raises ``StreamFull`` when
+        every slot is taken.
+        """
+        with self._cond:
+            if self.max_listeners is not None and self._listeners >= self.max_listeners:
+                self._counters["refused"] += 1
+                raise StreamFull(f"All {self.max_listeners} live fleet streams of this server are in use.")
+            self._listeners += 1
+        self._ensure_started()
+        return _Listener(self, self._events(company_id, max_seconds))
+
+    def _release(self) -> None:
+        with self._cond:
+            self._listeners -= 1
+
+    def _events(self, company_id, max_seconds: float):
+        yield f"retry: {RETRY_MS}\n\n".encode()
+        seq = self._seq
+        yield self._snapshot(company_id, seq)
+        deadline = time.monotonic() + max_seconds
+        while time.monotonic() < deadline:
+            with self._cond:
+                self._cond.wait_for(lambda: self._seq > seq, timeout=HEARTBEAT_SECONDS)
+                ticks = [tick for tick in self._history if tick.seq > seq]
+                latest = self._seq
+                missed = latest > seq and (not ticks or ticks[0].seq > seq + 1)
+            if latest == seq:
+                yield b": keepalive\n\n"
+            elif missed:
+                yield self._snapshot(company_id, latest)
+            else:
+                yield from self._deltas(ticks, company_id)
+            seq = latest
+
+    def stats(self) -> dict:
+        with self._cond:
+            data = dict(self._counters)
+            data["listeners"] = self._listeners
+            data["seq"] = self._seq
+        return data
+
+    def _deltas(self, ticks: list, company_id):
+        if len(ticks) == 1:
+            chunk = self._encoded(ticks[0], company_id)
+            if chunk:
+                yield chunk
+            return
+        # Several ticks since the last wake-up: send one merged delta.
+        merged = {}
+        for tick in ticks:
+            merged.update(tick.rows_for(company_id))
+        if merged:
+            yield _event("positions", list(merged.values()), ticks[-1].seq)
+
+    def _encoded(self, tick: _Tick, company_id) -> bytes:
+        # Encoded once per (tick, company) and shared by every listener.
+        chunk = tick.encoded.get(company_id)
+        if chunk is None:
+            rows = tick.rows_for(company_id)
+            chunk = _event("positions", list(rows.values()), tick.seq) if rows else b""
+            with self._cond:
+                tick.encoded.setdefault(company_id, chunk)
+                self._counters["events_encoded"] += 1
+                self._counters["bytes_encoded"] += len(chunk)
+        return chunk
+
+    def _snapshot(self, company_id, seq: int) -> bytes:
+        rows = [_row(vehicle_id, entry) for vehicle_id, entry in get_live_index().entries(company_id)]
+        with self._cond:
+            self._counters["snapshots"] += 1
+        return _event("snapshot", {"fields": FIELDS, "vehicles": rows}, seq)
+
+    def _ensure_started(self) -> None:
+        if self.tick_seconds is None:
+            return
+        if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="fleet-stream-ticker", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        index = get_live_index()
+        try:
+            while True:
+                time.sleep(self.tick_seconds)
+                if not self._listeners:
+                    continue
+                close_old_connections()
+                try:
+                    index.refresh()
+                except Exception:
+                    logger.exception("Live fleet index refresh failed")
+                self.tick()
+        finally:
+            connection.close()
+
+
+_broadcaster: FleetBroadcaster | None = None
+_broadcaster_lock = threading.Lock()
+
+
+def get_broadcaster() -> FleetBroadcaster:
+    global _broadcaster
+    if _broadcaster is None:
+        with _broadcaster_lock:
+            if _broadcaster is None:
+                config = getattr(settings, "FLEET_STREAM", {})
+                _broadcaster = FleetBroadcaster(max_listeners=config.get("MAX_LISTENERS", DEFAULT_MAX_LISTENERS))
+                get_live_index().add_listener(_broadcaster.publish)
+    return _broadcaster
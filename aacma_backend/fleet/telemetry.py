@@ -0,0 +1,62 @@
+"""
+Batched GPS ingest.
+
+``ingest`` stores a batch of validated fixes for one vehicle in
+``VehicleLocationPing`` with a single ``bulk_create`` and hands the newest
+fix to the position store (``fleet.positions``), which writes the vehicle's
+``last_location_*`` columns in coalesced batches. Fixes already stored for
+the same ``recorded_at`` (a resent batch) are skipped. Each stored fix is
+tagged with its zone from the in-memory geofence (``zones.geofence``).
+``pings_stored`` is sent with the new fixes (``routes.distance`` listens).
+"""
+from __future__ import annotations
+
+from django.dispatch import Signal
+from django.utils import timezone
+
+from zones import geofence
+
+from .models import Driver, Vehicle, VehicleLocationPing
+from .positions import get_position_store
+
+pings_stored = Signal()
+
+
+def ingest(vehicle: Vehicle, fixes: list[dict], driver: Driver | None = None) -> dict:
+    """Store ``fixes`` (``LocationFixSerializer`` data) for ``vehicle``."""
+    by_time = {fix["recorded_at"]: fix for fix in fixes}
+    existing = set(
+        VehicleLocationPing.objects.filter(vehicle=vehicle, recorded_at__in=list(by_time)).values_list(
+            "recorded_at", flat=True
+        )
+    )
+    new = [(recorded_at, fix) for recorded_at, fix in sorted(by_time.items()) if recorded_at not in existing]
+    zone_ids = geofence.locate_many([(fix["lat"], fix["lng"]) for _, fix in new])
+    pings = [
+        VehicleLocationPing(
+            vehicle=vehicle,
+            driver=driver,
+            recorded_at=recorded_at,
+            latitude=fix["lat"],
+            longitude=fix["lng"],
+            zone_id=zone_id,
+            speed_kmh=fix.get("speed_kmh"),
+            heading=fix.get("heading"),
+            accuracy_m=fix.get("accuracy_m"),
+        )
+        for (recorded_at, fix), zone_id in zip(new, zone_ids)
+    ]
+    # ignore_conflicts covers the same batch arriving twice concurrently.
+    VehicleLocationPing.objects.bulk_create(pings, batch_size=500, ignore_conflicts=True)
+    if pings:
+        pings_stored.send(sender=Vehicle, vehicle=vehicle, pings=pings)
+    store = get_position_store()
+    if pings:
+        latest = pings[-1]
+        store.update(vehicle, latest.latitude, latest.longitude, latest.recorded_at)
+    position = store.get(vehicle)
+    return {
+        "accepted": len(pings),
+        "duplicates": len(fixes) - len(pings),
+        "last_location_update": timezone.localtime(position["at"]) if position else None,
+    }
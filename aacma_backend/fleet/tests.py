@@ -0,0 +1,464 @@
+import random
+from collections import Counter
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from companies.models import WasteCompany
+
+from .geo import haversine_km
+from .live import CELL_DEGREES, LiveFleetIndex
+from . import telemetry, trajectory
+from .models import Driver, Vehicle, VehicleLocationPing, VehicleTrajectory
+from .positions import PositionStore
+from .stream import FleetBroadcaster, StreamFull
+from .tokens import StreamToken
+from .trajectory import _distance_to_segment, _project, encode_polyline, simplify
+
+User = get_user_model()
+
+
+def create_company(number=1):
+    return WasteCompany.objects.create(
+        name=f"Test Haulage {number}",
+        license_number=f"T-{number}",
+        contact_email="t@example.com",
+        contact_phone="1",
+        address="-",
+    )
+
+
+def douglas_peucker(xy, first, last, tolerance):
+    """Textbook recursive Douglas-Peucker over projected points."""
+    distances = [(_distance_to_segment(xy[i], xy[first], xy[last]), i) for i in range(first + 1, last)]
+    if not distances or max(distances)[0] <= tolerance:
+        return [first, last]
+    # The first of equally distant points, as ``simplify`` picks.
+    farthest = max(distances, key=lambda pair: (pair[0], -pair[1]))[1]
+    return douglas_peucker(xy, first, farthest, tolerance)[:-1] + douglas_peucker(xy, farthest, last, tolerance)
+
+
+class SimplifyTests(SimpleTestCase):
+    def random_walk(self, count, seed):
+        rng = random.Random(seed)
+        lat, lng, points = 9.0, 38.75, []
+        for _ in range(count):
+            lat += rng.gauss(0, 0.0003)
+            lng += rng.gauss(0, 0.0003)
+            points.append((lat, lng))
+        return points
+
+    def test_matches_recursive_douglas_peucker(self):
+        for seed in range(5):
+            points = self.random_walk(400, seed)
+            xy = _project(points)
+            for tolerance in (0.0, 5.0, 25.0, 200.0):
+                self.assertEqual(simplify(points, tolerance), douglas_peucker(xy, 0, len(points) - 1, tolerance))
+
+    def test_dropped_points_are_within_tolerance(self):
+        points = self.random_walk(2000, 11)
+        xy = _project(points)
+        kept = simplify(points, 15.0)
+        self.assertEqual((kept[0], kept[-1]), (0, len(points) - 1))
+        for first, last in zip(kept, kept[1:]):
+            for index in range(first + 1, last):
+                self.assertLessEqual(_distance_to_segment(xy[index], xy[first], xy[last]), 15.0)
+
+    def test_straight_line_keeps_end_points(self):
+        points = [(9.0 + i * 1e-4, 38.7 + i * 2e-4) for i in range(50)]
+        self.assertEqual(simplify(points, 1.0), [0, 49])
+        self.assertEqual(simplify(points[:2]), [0, 1])
+        self.assertEqual(simplify([]), [])
+
+    def test_encode_polyline(self):
+        # The example from Google's polyline format documentation.
+        points = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+        self.assertEqual(encode_polyline(points), "_p~iF~ps|U_ulLnnqC_mqNvxq`@")
+
+
+class TrajectoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vehicle = Vehicle.objects.create(
+            plate_number="AA-1", vehicle_type="compactor", capacity_kg=5000, company=create_company()
+        )
+        cls.yesterday = timezone.localdate() - timedelta(days=1)
+        start, _ = trajectory._day_bounds(cls.yesterday)
+        # Out along a straight street and back along it, one fix a minute.
+        cls.points = [(9.0 + i * 1e-4, 38.75) for i in range(30)] + [(9.0029, 38.75 + i * 1e-4) for i in range(1, 30)]
+        VehicleLocationPing.objects.bulk_create(
+            VehicleLocationPing(
+                vehicle=cls.vehicle, recorded_at=start + timedelta(minutes=i), latitude=lat, longitude=lng
+            )
+            for i, (lat, lng) in enumerate(cls.points)
+        )
+
+    def test_trace(self):
+        data = trajectory.day_trace(self.vehicle.pk, self.yesterday)
+        corners = [self.points[0], self.points[29], self.points[-1]]
+        self.assertEqual((data["raw_points"], data["points"]), (59, 3))
+        self.assertEqual(data["polyline"], encode_polyline(corners))
+        self.assertEqual(data["offsets_s"], [0, 29 * 60, 58 * 60])
+
+    def test_closed_days_are_stored(self):
+        self.assertEqual(trajectory.build_closed_days(), 1)
+        self.assertEqual(trajectory.build_closed_days(), 0)
+        stored = VehicleTrajectory.objects.get()
+        self.assertEqual((stored.day, stored.points), (self.yesterday, 3))
+        VehicleTrajectory.objects.update(polyline="stored")
+        with self.assertNumQueries(1):
+            self.assertEqual(trajectory.day_trace(self.vehicle.pk, self.yesterday)["polyline"], "stored")
+        # Other tolerances are computed from the fixes.
+        self.assertNotEqual(trajectory.day_trace(self.vehicle.pk, self.yesterday, 5.0)["polyline"], "stored")
+
+    def test_tolerance_query_param(self):
+        self.assertEqual(trajectory.tolerance_from_query_params({}), trajectory.DEFAULT_TOLERANCE_M)
+        self.assertEqual(trajectory.tolerance_from_query_params({"tolerance": "25"}), 25.0)
+        for value in ("-1", "5000", "far"):
+            with self.subTest(value), self.assertRaises(ValidationError):
+                trajectory.tolerance_from_query_params({"tolerance": value})
+
+
+class LiveFleetIndexNearestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        company = create_company()
+        rng = random.Random(5)
+        now = timezone.now()
+        positions = (
+            # A tight cluster around the query point used for pruning...
+            [(9.0 + rng.uniform(-0.002, 0.002), 38.75 + rng.uniform(-0.002, 0.002)) for _ in range(20)]
+            # ...and a fleet spread over the city.
+            + [(rng.uniform(8.8, 9.2), rng.uniform(38.6, 38.95)) for _ in range(400)]
+        )
+        Vehicle.objects.bulk_create(
+            [
+                Vehicle(
+                    plate_number=f"AA-{index}",
+                    vehicle_type="compactor",
+                    capacity_kg=5000,
+                    company=company,
+                    current_status="active",
+                    last_location_lat=lat,
+                    last_location_lng=lng,
+                    last_location_update=now,
+                )
+                for index, (lat, lng) in enumerate(positions)
+            ]
+        )
+        cls.positions = dict(zip(Vehicle.objects.order_by("id").values_list("id", flat=True), positions))
+
+    def setUp(self):
+        self.index = LiveFleetIndex()
+
+    def brute_force(self, lat, lng, k, accept=None):
+        found = sorted(
+            (haversine_km(lat, lng, vlat, vlng), vehicle_id)
+            for vehicle_id, (vlat, vlng) in self.positions.items()
+            if accept is None or accept(vehicle_id)
+        )
+        return found[:k]
+
+    def test_matches_brute_force(self):
+        rng = random.Random(8)
+        even = lambda vehicle_id: vehicle_id % 2 == 0  # noqa: E731
+        for _ in range(100):
+            lat, lng = rng.uniform(8.75, 9.25), rng.uniform(38.55, 39.0)
+            for k, accept in ((1, None), (5, None), (7, even)):
+                found = [(distance, vehicle_id) for distance, vehicle_id, _ in self.index.nearest(lat, lng, k, accept)]
+                self.assertEqual(found, self.brute_force(lat, lng, k, accept))
+
+    def test_rings_stop_once_no_closer_vehicle_can_remain(self):
+        considered = []
+
+        def accept(vehicle_id):
+            considered.append(vehicle_id)
+            return True
+
+        found = self.index.nearest(9.0, 38.75, 3, accept)
+        self.assertEqual([(d, v) for d, v, _ in found], self.brute_force(9.0, 38.75, 3))
+        # The cluster fills the first rings; the rest of the fleet is never looked at.
+        self.assertLess(len(considered), 40)
+        rings = max(
+            max(abs(lat - 9.0), abs(lng - 38.75)) for lat, lng in map(self.positions.get, considered)
+        )
+        self.assertLess(rings, 3 * CELL_DEGREES)
+
+    def test_more_than_the_fleet_and_empty(self):
+        self.assertEqual(len(self.index.nearest(9.0, 38.75, 10_000)), len(self.positions))
+        self.assertEqual(self.index.nearest(9.0, 38.75, 0), [])
+        self.assertEqual(self.index.nearest(9.0, 38.75, 3, accept=lambda vehicle_id: False), [])
+
+
+class LiveFleetViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company, other = create_company(1), create_company(2)
+        now = timezone.now()
+        for number, company in enumerate((cls.company, other, cls.company)):
+            Vehicle.objects.create(
+                plate_number=f"AA-{number}",
+                vehicle_type="compactor",
+                capacity_kg=5000,
+                company=company,
+                last_location_lat=9.0 + number / 100,
+                last_location_lng=38.75,
+                last_location_update=now,
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        patcher = mock.patch("fleet.views.get_live_index", return_value=LiveFleetIndex())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def plates(self, **params):
+        response = self.client.get("/api/fleet/live/", params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(row[1] for row in response.data["vehicles"])
+
+    def test_company_users_see_their_own_fleet(self):
+        self.client.force_authenticate(
+            User.objects.create_user("manager", password="x", user_type="waste_company", company=self.company)
+        )
+        self.assertEqual(self.plates(), ["AA-0", "AA-2"])
+        # `company` is only honoured for the Central Authority.
+        self.assertEqual(self.plates(company=self.company.pk + 1), ["AA-0", "AA-2"])
+        self.assertEqual(self.plates(bbox="38.7,8.99,38.8,9.015"), ["AA-0"])
+
+    def test_unlinked_company_user_is_refused(self):
+        manager = User.objects.create_user("manager", password="x", user_type="waste_company")
+        self.client.force_authenticate(manager)
+        self.assertEqual(self.client.get("/api/fleet/live/").status_code, 403)
+
+    def test_central_authority_sees_every_company(self):
+        director = User.objects.create_user("director", password="x", user_type="central_authority")
+        self.client.force_authenticate(director)
+        self.assertEqual(self.plates(), ["AA-0", "AA-1", "AA-2"])
+        self.assertEqual(self.plates(company=self.company.pk), ["AA-0", "AA-2"])
+
+
+class FleetStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company, cls.other = create_company(1), create_company(2)
+        cls.manager = User.objects.create_user("manager", password="x", user_type="waste_company", company=cls.company)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.broadcaster = FleetBroadcaster(tick_seconds=None, max_listeners=1)
+        patcher = mock.patch("fleet.views.get_broadcaster", return_value=self.broadcaster)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def stream(self, token):
+        response = self.client.get("/api/fleet/stream/", {"access_token": token})
+        self.addCleanup(response.close)
+        return response
+
+    def test_token_is_bound_to_the_company(self):
+        self.client.force_authenticate(self.manager)
+        response = self.client.post("/api/fleet/stream/token/")
+        self.assertEqual(response.status_code, 200)
+        token = response.data["token"]
+        self.assertEqual(StreamToken(token)["company_id"], self.company.pk)
+        self.client.force_authenticate(None)
+
+        response = self.stream(token)
+        self.assertEqual(response.status_code, 200)
+        response.close()
+        self.assertEqual(self.broadcaster.stats()["listeners"], 0)
+        User.objects.filter(pk=self.manager.pk).update(company=self.other)
+        self.assertEqual(self.stream(token).status_code, 403)
+
+    def test_unlinked_company_user_gets_no_token(self):
+        self.client.force_authenticate(User.objects.create_user("driver", password="x", user_type="waste_company"))
+        self.assertEqual(self.client.post("/api/fleet/stream/token/").status_code, 403)
+
+    def test_full_server_answers_503(self):
+        self.assertEqual(self.stream(str(StreamToken.for_user(self.manager))).status_code, 200)
+        response = self.stream(str(StreamToken.for_user(self.manager)))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "30")
+
+    def test_closing_a_stream_frees_its_slot(self):
+        listener = self.broadcaster.open(self.company.pk)
+        with self.assertRaises(StreamFull):
+            self.broadcaster.open(self.company.pk)
+        self.assertTrue(next(listener).startswith(b"retry:"))
+        listener.close()
+        listener.close()
+        self.assertEqual(self.broadcaster.stats()["listeners"], 0)
+        self.broadcaster.open(self.company.pk).close()
+        self.assertEqual(self.broadcaster.stats()["refused"], 1)
+
+
+class PingIngestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = create_company()
+        cls.vehicle = Vehicle.objects.create(
+            plate_number="AA-1", vehicle_type="compactor", capacity_kg=5000, company=cls.company
+        )
+        user = User.objects.create_user("driver", password="x", user_type="driver", company=cls.company)
+        cls.driver = Driver.objects.create(
+            user=user,
+            license_number="D-1",
+            license_expiry="2030-01-01",
+            company=cls.company,
+            assigned_vehicle=cls.vehicle,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.store = PositionStore(flush_interval=10.0, cache_ttl=60, async_mode=False)
+        patcher = mock.patch("fleet.telemetry.get_position_store", return_value=self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+        self.client.force_authenticate(self.driver.user)
+
+    def fixes(self, count, start=None):
+        start = start or timezone.now() - timedelta(minutes=10)
+        return [
+            {"recorded_at": (start + timedelta(seconds=i)).isoformat(), "lat": 9.0 + i * 1e-5, "lng": 38.75}
+            for i in range(count)
+        ]
+
+    def post(self, fixes):
+        return self.client.post("/api/driver/location/batch/", {"fixes": fixes}, format="json")
+
+    def test_batch_is_stored_once(self):
+        fixes = self.fixes(60)
+        response = self.post(fixes)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data["accepted"], response.data["duplicates"]), (60, 0))
+        # A resent batch, with one new fix.
+        response = self.post(fixes[30:] + self.fixes(1, start=timezone.now() - timedelta(minutes=1)))
+        self.assertEqual((response.data["accepted"], response.data["duplicates"]), (1, 30))
+        self.assertEqual(VehicleLocationPing.objects.filter(vehicle=self.vehicle, driver=self.driver).count(), 61)
+        # The row got the first batch's newest fix; the later one waits for
+        # the flush interval in the store.
+        self.vehicle.refresh_from_db()
+        self.assertEqual(round(self.vehicle.last_location_lat, 5), 9.00059)
+        self.assertEqual(self.store.stats()["rows_written"], 1)
+        self.assertEqual(self.store.get(self.vehicle)["lat"], 9.0)
+
+    def test_one_lookup_and_one_update_per_batch(self):
+        start = timezone.now() - timedelta(minutes=30)
+        fixes = [
+            {"recorded_at": start + timedelta(seconds=i), "lat": 9.0 + i * 1e-5, "lng": 38.75} for i in range(500)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            telemetry.ingest(self.vehicle, fixes)
+        statements = Counter(query["sql"].split()[0] for query in queries.captured_queries)
+        self.assertEqual((statements["SELECT"], statements["UPDATE"]), (1, 1))
+        # bulk_create batches are capped by the backend's parameter limit.
+        self.assertLessEqual(statements["INSERT"], 10)
+        self.assertEqual(VehicleLocationPing.objects.count(), 500)
+
+    def test_invalid_batches(self):
+        future = self.fixes(1, start=timezone.now() + timedelta(hours=1))
+        for fixes in ([], self.fixes(601), future, [{**self.fixes(1)[0], "lat": 91}]):
+            with self.subTest(count=len(fixes)):
+                self.assertEqual(self.post(fixes).status_code, 400)
+        self.assertFalse(VehicleLocationPing.objects.exists())
+
+    def test_company_endpoint(self):
+        manager = User.objects.create_user("manager", password="x", user_type="waste_company", company=self.company)
+        self.client.force_authenticate(manager)
+        url = f"/api/fleet/vehicles/{self.vehicle.pk}/pings/"
+        self.assertEqual(self.client.post(url, {"fixes": self.fixes(3)}, format="json").status_code, 201)
+        other = User.objects.create_user("other", password="x", user_type="waste_company", company=create_company(2))
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.post(url, {"fixes": self.fixes(3)}, format="json").status_code, 404)
+        self.assertEqual(VehicleLocationPing.objects.filter(driver=None).count(), 3)
+
+
+class PositionStoreTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        company = create_company()
+        cls.vehicles = [
+            Vehicle.objects.create(plate_number=f"AA-{n}", vehicle_type="compactor", capacity_kg=5000, company=company)
+            for n in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.store = PositionStore(flush_interval=10.0, cache_ttl=60, async_mode=False)
+        self.start = timezone.now() - timedelta(minutes=5)
+
+    def update(self, vehicle, seconds, lat=9.0):
+        return self.store.update(vehicle, lat, 38.75, self.start + timedelta(seconds=seconds))
+
+    def stored(self, vehicle):
+        return Vehicle.objects.values_list("last_location_lat", "last_location_update").get(pk=vehicle.pk)
+
+    def test_updates_within_the_interval_are_coalesced(self):
+        vehicle = self.vehicles[0]
+        for second in range(30):
+            self.assertTrue(self.update(vehicle, second, lat=9.0 + second / 1000))
+        # The first fix was written at once; the rest wait for the interval.
+        self.assertEqual(self.stored(vehicle), (9.0, self.start))
+        self.assertEqual(self.store.stats()["pending"], 1)
+        self.assertEqual(self.store.get(vehicle)["lat"], 9.029)
+        self.assertEqual(self.store.flush(force=True), 1)
+        self.assertEqual(self.stored(vehicle), (9.029, self.start + timedelta(seconds=29)))
+        stats = self.store.stats()
+        self.assertEqual((stats["updates"], stats["flushes"], stats["rows_written"], stats["pending"]), (30, 2, 2, 0))
+
+    def test_one_update_for_many_vehicles(self):
+        self.store.flush_interval = 0
+        self.store.async_mode = True
+        with mock.patch.object(self.store, "_ensure_started"):
+            for number, vehicle in enumerate(self.vehicles):
+                self.update(vehicle, number)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.store.flush(), 3)
+
+    def test_older_fixes_are_ignored(self):
+        vehicle = self.vehicles[0]
+        self.update(vehicle, 10)
+        self.assertFalse(self.update(vehicle, 5, lat=8.9))
+        self.assertEqual(self.store.stats()["stale"], 1)
+        # A newer fix written to the row by another process is kept.
+        Vehicle.objects.filter(pk=vehicle.pk).update(
+            last_location_lat=8.95, last_location_update=self.start + timedelta(seconds=60)
+        )
+        self.update(vehicle, 20, lat=9.1)
+        self.store.flush(force=True)
+        self.assertEqual(self.stored(vehicle)[0], 8.95)
+
+    def test_reads_prefer_the_newest_source(self):
+        row, cached, local = self.vehicles
+        Vehicle.objects.filter(pk=row.pk).update(
+            last_location_lat=8.9, last_location_lng=38.7, last_location_update=self.start
+        )
+        self.update(cached, 10)
+        self.update(local, 10)
+        # Another process has a newer fix for `cached` in the shared cache.
+        cache.set(f"fleet:position:{cached.pk}", {"lat": 9.2, "lng": 38.8, "at": self.start + timedelta(seconds=20)})
+        positions = self.store.get_many(list(Vehicle.objects.order_by("pk")))
+        self.assertEqual(
+            {pk: position["lat"] for pk, position in positions.items()},
+            {row.pk: 8.9, cached.pk: 9.2, local.pk: 9.0},
+        )
+
+    def test_failed_flush_keeps_positions_pending(self):
+        vehicle = self.vehicles[0]
+        with mock.patch.object(self.store, "_write", side_effect=RuntimeError("locked")), self.assertLogs(
+            "fleet.positions", "ERROR"
+        ):
+            self.update(vehicle, 0)
+        self.assertEqual((self.store.stats()["failed"], self.store.stats()["pending"]), (1, 1))
+        self.assertEqual(self.store.flush(), 1)
+        self.assertEqual(self.stored(vehicle), (9.0, self.start))
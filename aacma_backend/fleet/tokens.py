@@ -0,0 +1,71 @@
+"""
+Short-lived tokens for the live fleet stream.
+
+EventSource clients cannot set an Authorization header, so the stream takes
+its token from ``?access_token=``, where proxies and access logs may record
+it. Rather than the user's access token, the client sends a ``StreamToken``
+from ``POST /api/fleet/stream/token/``: it expires after
+``STREAM_TOKEN_LIFETIME`` and its ``token_type`` is only accepted by the
+stream, so a leaked one is of little use. ``RedactQueryTokens`` masks the
+parameter in log lines that include the query string.
+"""
+from __future__ import annotations
+
+import logging
+import re
+from datetime import timedelta
+
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+
+STREAM_TOKEN_LIFETIME = timedelta(minutes=1)
+QUERY_PARAM = "access_token"
+# Loggers whose records may carry a full request line.
+REDACTED_LOGGERS = ("django.server", "gunicorn.access")
+
+_TOKEN_IN_QUERY = re.compile(rf"([?&]{QUERY_PARAM}=)[^&\s\"]*")
+
+
+class StreamToken(AccessToken):
+    token_type = "stream"
+    lifetime = STREAM_TOKEN_LIFETIME
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        # The company the stream is scoped to; the stream refuses a token
+        # whose company is no longer the user's.
+        token["company_id"] = user.company_id
+        return token
+
+
+class StreamTokenAuthentication(JWTAuthentication):
+    """``StreamToken`` from ``?access_token=``; other token types are refused."""
+
+    def authenticate(self, request):
+        raw_token = request.query_params.get(QUERY_PARAM)
+        if not raw_token:
+            return None
+        try:
+            validated_token = StreamToken(raw_token)
+        except TokenError as exc:
+            raise InvalidToken({"detail": str(exc)})
+        return self.get_user(validated_token), validated_token
+
+
+def redact(text: str) -> str:
+    return _TOKEN_IN_QUERY.sub(r"\1[redacted]", text)
+
+
+class RedactQueryTokens(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        message = record.getMessage()
+        if f"{QUERY_PARAM}=" in message:
+            record.msg, record.args = redact(message), None
+        return True
+
+
+def install_log_filter() -> None:
+    for name in REDACTED_LOGGERS:
+        logging.getLogger(name).addFilter(RedactQueryTokens())
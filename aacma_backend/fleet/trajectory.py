@@ -0,0 +1,198 @@
+"""
+Simplified vehicle traces from the location history.
+
+``simplify`` applies Douglas-Peucker to a list of (lat, lng) points with a
+tolerance in metres, and ``encode_polyline`` packs the result in Google's
+encoded polyline format (precision 5), which map libraries decode directly.
+``trace`` serves one vehicle for a time window; ``day_trace`` serves a local
+day and reads the stored ``VehicleTrajectory`` for closed days at the default
+tolerance, which ``build_closed_days`` precomputes.
+"""
+from __future__ import annotations
+
+import math
+from datetime import date, datetime, time, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import Vehicle, VehicleLocationPing, VehicleTrajectory
+
+DEFAULT_TOLERANCE_M = 10.0
+MAX_TOLERANCE_M = 1000.0
+EARTH_RADIUS_M = 6_371_000.0
+
+
+def tolerance_from_query_params(params) -> float:
+    value = params.get("tolerance")
+    if not value:
+        return DEFAULT_TOLERANCE_M
+    try:
+        tolerance = float(value)
+    except ValueError:
+        tolerance = None
+    if tolerance is None or not 0 <= tolerance <= MAX_TOLERANCE_M:
+        raise ValidationError({"tolerance": f"Expected metres between 0 and {MAX_TOLERANCE_M:g}."})
+    return tolerance
+
+
+def _project(points):
+    """Equirectangular projection to metres around the trace's first point."""
+    lat0 = math.radians(points[0][0])
+    scale = math.cos(lat0)
+    return [
+        (math.radians(lng) * scale * EARTH_RADIUS_M, math.radians(lat) * EARTH_RADIUS_M) for lat, lng in points
+    ]
+
+
+def _distance_to_segment(point, start, end) -> float:
+    px, py = point
+    ax, ay = start
+    bx, by = end
+    dx, dy = bx - ax, by - ay
+    length_sq = dx * dx + dy * dy
+    if length_sq == 0:
+        return math.hypot(px - ax, py - ay)
+    t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length_sq))
+    return math.hypot(px - (ax + t * dx), py - (ay + t * dy))
+
+
+def simplify(points: list[tuple[float, float]], tolerance_m: float = DEFAULT_TOLERANCE_M) -> list[int]:
+    """
+    Indexes of the (lat, lng) ``points`` kept by Douglas-Peucker at
+    ``tolerance_m``. The first and last points are always kept.
+    """
+    if len(points) < 3:
+        return list(range(len(points)))
+    xy = _project(points)
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    # Iterative, so long traces cannot hit the recursion limit.
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        farthest, distance = None, tolerance_m
+        for index in range(first + 1, last):
+            d = _distance_to_segment(xy[index], xy[first], xy[last])
+            if d > distance:
+                farthest, distance = index, d
+        if farthest is not None:
+            keep[farthest] = True
+            stack.append((first, farthest))
+            stack.append((farthest, last))
+    return [index for index, kept in enumerate(keep) if kept]
+
+
+def _encode_value(value: int) -> str:
+    value = ~(value << 1) if value < 0 else value << 1
+    chunks = []
+    while value >= 0x20:
+        chunks.append(chr((0x20 | (value & 0x1F)) + 63))
+        value >>= 5
+    chunks.append(chr(value + 63))
+    return "".join(chunks)
+
+
+def encode_polyline(points: list[tuple[float, float]]) -> str:
+    encoded = []
+    previous_lat = previous_lng = 0
+    for lat, lng in points:
+        lat_e5, lng_e5 = round(lat * 1e5), round(lng * 1e5)
+        encoded.append(_encode_value(lat_e5 - previous_lat))
+        encoded.append(_encode_value(lng_e5 - previous_lng))
+        previous_lat, previous_lng = lat_e5, lng_e5
+    return "".join(encoded)
+
+
+def trace(vehicle_id: int, start: datetime, end: datetime, tolerance_m: float = DEFAULT_TOLERANCE_M) -> dict:
+    """Simplified trace of the fixes recorded in ``[start, end)``."""
+    fixes = list(
+        VehicleLocationPing.objects.filter(vehicle_id=vehicle_id, recorded_at__gte=start, recorded_at__lt=end)
+        .order_by("recorded_at")
+        .values_list("latitude", "longitude", "recorded_at")
+    )
+    points = [(lat, lng) for lat, lng, _ in fixes]
+    kept = simplify(points, tolerance_m)
+    return {
+        "tolerance_m": tolerance_m,
+        "raw_points": len(points),
+        "points": len(kept),
+        "started_at": fixes[0][2] if fixes else None,
+        "ended_at": fixes[-1][2] if fixes else None,
+        "polyline": encode_polyline([points[index] for index in kept]),
+        # Seconds since started_at for each kept point, for replay.
+        "offsets_s": [round((fixes[index][2] - fixes[0][2]).total_seconds()) for index in kept],
+    }
+
+
+def _day_bounds(day: date) -> tuple[datetime, datetime]:
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+def _as_trace(stored: VehicleTrajectory) -> dict:
+    return {
+        "tolerance_m": stored.tolerance_m,
+        "raw_points": stored.raw_points,
+        "points": stored.points,
+        "started_at": stored.started_at,
+        "ended_at": stored.ended_at,
+        "polyline": stored.polyline,
+        "offsets_s": stored.offsets_s,
+    }
+
+
+def day_trace(vehicle_id: int, day: date, tolerance_m: float = DEFAULT_TOLERANCE_M) -> dict:
+    """Trace for a local day; closed days at the default tolerance come from storage."""
+    if tolerance_m == DEFAULT_TOLERANCE_M and day < timezone.localdate():
+        stored = VehicleTrajectory.objects.filter(vehicle_id=vehicle_id, day=day).first()
+        if stored:
+            return _as_trace(stored)
+    return trace(vehicle_id, *_day_bounds(day), tolerance_m)
+
+
+def build_day(day: date, vehicle_ids=None) -> int:
+    """Store the default-tolerance trace of ``day`` for each vehicle with fixes that day."""
+    start, end = _day_bounds(day)
+    if vehicle_ids is None:
+        vehicle_ids = (
+            VehicleLocationPing.objects.filter(recorded_at__gte=start, recorded_at__lt=end)
+            .order_by("vehicle_id")
+            .values_list("vehicle_id", flat=True)
+            .distinct()
+        )
+    rows = []
+    for vehicle_id in vehicle_ids:
+        data = trace(vehicle_id, start, end)
+        if data["raw_points"]:
+            rows.append(VehicleTrajectory(vehicle_id=vehicle_id, day=day, **data))
+    with transaction.atomic():
+        VehicleTrajectory.objects.filter(day=day, vehicle_id__in=[row.vehicle_id for row in rows]).delete()
+        VehicleTrajectory.objects.bulk_create(rows)
+    return len(rows)
+
+
+def build_closed_days(since: date | None = None) -> int:
+    """Precompute traces for closed days from ``since`` (default: the earliest fix) that have none yet."""
+    today = timezone.localdate()
+    if since is None:
+        first = VehicleLocationPing.objects.order_by("recorded_at").values_list("recorded_at", flat=True).first()
+        if first is None:
+            return 0
+        since = timezone.localdate(first)
+    built = 0
+    day = since
+    while day < today:
+        start, end = _day_bounds(day)
+        missing = (
+            Vehicle.objects.filter(location_pings__recorded_at__gte=start, location_pings__recorded_at__lt=end)
+            .exclude(trajectories__day=day)
+            .values_list("id", flat=True)
+            .distinct()
+        )
+        missing = list(missing)
+        if missing:
+            built += build_day(day, missing)
+        day += timedelta(days=1)
+    return built
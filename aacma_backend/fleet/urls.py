@@ -1,10 +1,15 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
 
-from .views import CompanyVehicleViewSet, CompanyDriverViewSet
+from .views import CompanyVehicleViewSet, CompanyDriverViewSet, live_fleet, fleet_stream, fleet_stream_token
 
 router = DefaultRouter()
 router.register(r"vehicles", CompanyVehicleViewSet, basename="company-vehicles")
 router.register(r"drivers", CompanyDriverViewSet, basename="company-drivers")
 
-urlpatterns = router.urls
+urlpatterns = [
+    path("live/", live_fleet, name="fleet-live"),
+    path("stream/", fleet_stream, name="fleet-stream"),
+    path("stream/token/", fleet_stream_token, name="fleet-stream-token"),
+] + router.urls
 
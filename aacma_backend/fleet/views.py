@@ -1,11 +1,47 @@
+from datetime import date
+
+import json
+
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from rest_framework import viewsets, permissions, status
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, authentication_classes, permission_classes, renderer_classes
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from . import telemetry, trajectory
+from .stream import StreamFull, get_broadcaster
+from .tokens import StreamToken, StreamTokenAuthentication
+from .live import FIELDS as LIVE_FIELDS, get_live_index
 from .models import Vehicle, Driver
-from .serializers import VehicleSerializer, DriverSerializer
-from accounts.permissions import IsWasteCompany
+from .serializers import VehicleSerializer, DriverSerializer, LocationBatchSerializer, LocationFixSerializer
+from accounts.permissions import IsCentralAuthority, IsWasteCompany
+
+
+def _company_for(user):
+    CompanyModel = Vehicle._meta.get_field("company").remote_field.model
+    company = getattr(user, "company", None)
+    if not company:
+        company = CompanyModel.objects.first()
+    if not company:
+        company = CompanyModel.objects.create(
+            name="Green Clean Services",
+            license_number="LIC-DEFAULT",
+            contact_email="contact@example.com",
+            contact_phone="000",
+            address="Addis Ababa",
+            status="approved",
+        )
+    return company
+
+
+def _own_company_id(user) -> int:
+    """Id of a company user's own company; 403 if the account is not linked to one."""
+    if user.company_id is None:
+        raise PermissionDenied("Your account is not linked to a waste company.")
+    return user.company_id
 
 
 class CompanyVehicleViewSet(viewsets.ModelViewSet):
@@ -17,20 +53,7 @@ class CompanyVehicleViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated, IsWasteCompany]
 
     def _get_company(self):
-        CompanyModel = Vehicle._meta.get_field("company").remote_field.model
-        company = getattr(self.request.user, "company", None)
-        if not company:
-            company = CompanyModel.objects.first()
-        if not company:
-            company = CompanyModel.objects.create(
-                name="Green Clean Services",
-                license_number="LIC-DEFAULT",
-                contact_email="contact@example.com",
-                contact_phone="000",
-                address="Addis Ababa",
-                status="approved",
-            )
-        return company
+        return _company_for(self.request.user)
 
     def get_queryset(self):
         company = self._get_company()
@@ -54,12 +77,35 @@ class CompanyVehicleViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=["put"])
     def location(self, request, pk=None):
         vehicle = self.get_object()
-        vehicle.last_location_lat = request.data.get("last_location_lat")
-        vehicle.last_location_lng = request.data.get("last_location_lng")
-        vehicle.last_location_update = timezone.now()
-        vehicle.save()
+        fix = LocationFixSerializer(
+            data={
+                "lat": request.data.get("last_location_lat"),
+                "lng": request.data.get("last_location_lng"),
+                "recorded_at": timezone.now(),
+            }
+        )
+        fix.is_valid(raise_exception=True)
+        telemetry.ingest(vehicle, [fix.validated_data])
         return Response(self.get_serializer(vehicle).data)
 
+    @action(detail=True, methods=["post"])
+    def pings(self, request, pk=None):
+        vehicle = self.get_object()
+        batch = LocationBatchSerializer(data=request.data)
+        batch.is_valid(raise_exception=True)
+        result = telemetry.ingest(vehicle, batch.validated_data["fixes"])
+        return Response(result, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=["get"])
+    def trajectory(self, request, pk=None):
+        vehicle = self.get_object()
+        try:
+            day = date.fromisoformat(request.query_params["date"]) if request.query_params.get("date") else timezone.localdate()
+        except ValueError:
+            raise ValidationError({"date": "Expected YYYY-MM-DD."})
+        tolerance = trajectory.tolerance_from_query_params(request.query_params)
+        return Response({"vehicle_id": vehicle.id, "date": day, **trajectory.day_trace(vehicle.id, day, tolerance)})
+
     @action(detail=True, methods=["put"])
     def status(self, request, pk=None):
         vehicle = self.get_object()
@@ -163,3 +209,90 @@ class CompanyDriverViewSet(viewsets.ModelViewSet):
         driver.save()
         return Response(self.get_serializer(driver).data)
 
+
+def _parse_bbox(value: str):
+    """``west,south,east,north`` in degrees -> (south, west, north, east)."""
+    try:
+        west, south, east, north = (float(part) for part in value.split(","))
+    except ValueError:
+        raise ValidationError({"bbox": "Expected west,south,east,north in degrees."})
+    if south > north or west > east:
+        raise ValidationError({"bbox": "South must not exceed north, nor west exceed east."})
+    return south, west, north, east
+
+
+@api_view(["GET"])
+@permission_classes([permissions.IsAuthenticated, IsWasteCompany | IsCentralAuthority])
+def live_fleet(request):
+    """
+    Vehicles inside a map viewport as compact rows. Central Authority users
+    see every company (or ``?company=``); company users see their own fleet.
+    """
+    bbox = request.query_params.get("bbox")
+    south, west, north, east = _parse_bbox(bbox) if bbox else (-90.0, -180.0, 90.0, 180.0)
+    if request.user.user_type == "waste_company":
+        company_id = _own_company_id(request.user)
+    else:
+        try:
+            company_id = int(request.query_params["company"]) if request.query_params.get("company") else None
+        except ValueError:
+            raise ValidationError({"company": "Expected a company id."})
+    return Response(
+        {
+            "fields": LIVE_FIELDS,
+            "vehicles": get_live_index().query(south, west, north, east, company_id=company_id),
+        }
+    )
+
+
+@api_view(["POST"])
+@permission_classes([permissions.IsAuthenticated, IsWasteCompany | IsCentralAuthority])
+def fleet_stream_token(request):
+    """
+    A token for ``/api/fleet/stream/?access_token=``, valid for a minute and
+    for nothing else. Fetch a new one before each (re)connect.
+    """
+    if request.user.user_type == "waste_company":
+        _own_company_id(request.user)
+    token = StreamToken.for_user(request.user)
+    return Response({"token": str(token), "expires_in": int(StreamToken.lifetime.total_seconds())})
+
+
+class EventStreamRenderer(BaseRenderer):
+    media_type = "text/event-stream"
+    format = "sse"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only errors are rendered; the stream itself bypasses the renderer.
+        return f"event: error\ndata: {json.dumps(data)}\n\n".encode()
+
+
+@api_view(["GET"])
+@authentication_classes([JWTAuthentication, StreamTokenAuthentication])
+@permission_classes([permissions.IsAuthenticated, IsWasteCompany | IsCentralAuthority])
+@renderer_classes([EventStreamRenderer, JSONRenderer])
+def fleet_stream(request):
+    """
+    Server-Sent Events: a ``snapshot`` of the company's vehicles, then a
+    ``positions`` event each second with the vehicles that moved, as
+    ``[id, plate, lat, lng, status, at]`` rows (``at`` in Unix seconds).
+    ``503`` when this process already serves its maximum of listeners.
+    """
+    if request.user.user_type == "waste_company":
+        company_id = _own_company_id(request.user)
+        if isinstance(request.auth, StreamToken) and request.auth.get("company_id") != company_id:
+            raise PermissionDenied("This stream token was issued for another company.")
+    else:
+        try:
+            company_id = int(request.query_params["company"]) if request.query_params.get("company") else None
+        except ValueError:
+            raise ValidationError({"company": "Expected a company id."})
+    try:
+        events = get_broadcaster().open(company_id)
+    except StreamFull as exc:
+        return Response({"detail": str(exc)}, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": "30"})
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Stop nginx-style proxies from buffering the stream.
+    response["X-Accel-Buffering"] = "no"
+    return response
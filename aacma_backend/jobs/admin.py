@@ -0,0 +1,10 @@
+from django.contrib import admin
+from .models import Job
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "status", "attempts", "created_by", "created_at", "finished_at")
+    list_filter = ("status", "name")
+
+
+admin.site.register(Job, JobAdmin)
@@ -0,0 +1,63 @@
+import multiprocessing
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.queue import work
+from jobs.worker import process_main
+
+
+class Command(BaseCommand):
+    help = (
+        "Run background job workers. With --workers N > 1 each worker is a separate "
+        "process; crashed workers are restarted until the command is stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=1)
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit once the queue is empty instead of polling for new jobs.",
+        )
+
+    def handle(self, *args, **options):
+        workers = max(options["workers"], 1)
+        burst = options["burst"]
+        if workers == 1:
+            stop = threading.Event()
+            self._handle_signals(stop)
+            self.stdout.write("Job worker started.")
+            work(stop, burst=burst)
+            return
+
+        context = multiprocessing.get_context("spawn")
+        stop = context.Event()
+        self._handle_signals(stop)
+        # Children open their own connections; do not share the parent's.
+        connections.close_all()
+
+        def start(index):
+            process = context.Process(target=process_main, args=(stop, burst), name=f"job-worker-{index}")
+            process.start()
+            return process
+
+        processes = [start(index) for index in range(workers)]
+        self.stdout.write(f"Started {workers} job worker processes.")
+        while any(process.is_alive() for process in processes):
+            for index, process in enumerate(processes):
+                process.join(timeout=1)
+                if process.is_alive() or stop.is_set() or burst or process.exitcode == 0:
+                    continue
+                self.stderr.write(f"{process.name} exited with code {process.exitcode}; restarting.")
+                processes[index] = start(index)
+        self.stdout.write("Job workers stopped.")
+
+    def _handle_signals(self, stop):
+        def request_stop(signum, frame):
+            stop.set()
+
+        signal.signal(signal.SIGINT, request_stop)
+        signal.signal(signal.SIGTERM, request_stop)
@@ -0,0 +1,199 @@
+"""
+Database-backed job queue.
+
+``enqueue(name, payload)`` stores a ``Job``; workers started by
+``run_workers`` (or the optional embedded worker thread) claim queued jobs
+with a conditional UPDATE, so each job runs once even with many workers and
+no row locks. The handler registered for ``name`` in
+``JOB_QUEUE["HANDLERS"]`` is called with the job and its return value is
+stored as the job result. Failed jobs are retried with a delay until
+``max_attempts``. While a job runs, a heartbeat thread refreshes its
+``locked_at`` every ``HEARTBEAT_SECONDS``; jobs whose worker died (no
+heartbeat for ``TIMEOUT_SECONDS``) are re-queued.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "HANDLERS": {},
+    "POLL_INTERVAL_SECONDS": 1.0,
+    "TIMEOUT_SECONDS": 900,
+    "HEARTBEAT_SECONDS": 30,
+    "MAX_ATTEMPTS": 3,
+    "RETRY_DELAY_SECONDS": 30,
+    "EMBEDDED_WORKER": False,
+}
+CLAIM_CANDIDATES = 10
+
+
+def get_config() -> dict:
+    return {**DEFAULTS, **getattr(settings, "JOB_QUEUE", {})}
+
+
+_handlers: dict = {}
+
+
+def get_handler(name: str):
+    if name not in _handlers:
+        path = get_config()["HANDLERS"].get(name)
+        if path is None:
+            raise ImproperlyConfigured(f"No job handler registered for {name!r} in JOB_QUEUE['HANDLERS'].")
+        _handlers[name] = import_string(path)
+    return _handlers[name]
+
+
+def enqueue(name: str, payload: dict | None = None, user=None, max_attempts: int | None = None) -> Job:
+    get_handler(name)
+    job = Job.objects.create(
+        name=name,
+        payload=payload or {},
+        created_by=user if getattr(user, "is_authenticated", False) else None,
+        max_attempts=max_attempts or get_config()["MAX_ATTEMPTS"],
+    )
+    if get_config()["EMBEDDED_WORKER"]:
+        transaction.on_commit(ensure_embedded_worker)
+    return job
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"[:100]
+
+
+def claim(worker: str) -> Job | None:
+    """Claim the oldest runnable job for ``worker``, or return None."""
+    now = timezone.now()
+    candidates = list(
+        Job.objects.filter(status=Job.QUEUED, run_after__lte=now)
+        .order_by("id")
+        .values_list("id", flat=True)[:CLAIM_CANDIDATES]
+    )
+    for pk in candidates:
+        claimed = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING,
+            locked_by=worker,
+            locked_at=now,
+            started_at=now,
+            attempts=F("attempts") + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def requeue_stale() -> int:
+    """Re-queue (or fail) running jobs whose worker stopped reporting."""
+    cutoff = timezone.now() - timedelta(seconds=get_config()["TIMEOUT_SECONDS"])
+    stale = Job.objects.filter(status=Job.RUNNING, locked_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=F("max_attempts")).update(
+        status=Job.FAILED,
+        error="Worker timed out.",
+        finished_at=timezone.now(),
+        locked_by="",
+        locked_at=None,
+    )
+    requeued = stale.update(status=Job.QUEUED, locked_by="", locked_at=None)
+    return failed + requeued
+
+
+def _heartbeat(job: Job, done, interval: float) -> None:
+    """Refresh ``job.locked_at`` every ``interval`` seconds until ``done`` is set."""
+    mine = Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by)
+    try:
+        while not done.wait(interval):
+            if not mine.update(locked_at=timezone.now()):
+                # Re-queued (or finished) meanwhile; nothing left to keep alive.
+                return
+    except Exception:
+        logger.exception("Heartbeat for job %s failed", job.pk)
+    finally:
+        connection.close()
+
+
+def run(job: Job) -> None:
+    # Updates are conditioned on our lock so a job re-queued after a timeout
+    # and claimed elsewhere is not overwritten by this (late) run.
+    mine = Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by)
+    done = threading.Event()
+    heartbeat = threading.Thread(
+        target=_heartbeat,
+        args=(job, done, get_config()["HEARTBEAT_SECONDS"]),
+        name=f"job-heartbeat-{job.pk}",
+        daemon=True,
+    )
+    heartbeat.start()
+    try:
+        result = get_handler(job.name)(job)
+    except Exception:
+        logger.exception("Job %s (%s) failed on attempt %s", job.pk, job.name, job.attempts)
+        error = traceback.format_exc()
+        now = timezone.now()
+        if job.attempts < job.max_attempts:
+            delay = timedelta(seconds=get_config()["RETRY_DELAY_SECONDS"] * job.attempts)
+            mine.update(status=Job.QUEUED, error=error, run_after=now + delay, locked_by="", locked_at=None)
+        else:
+            mine.update(status=Job.FAILED, error=error, finished_at=now, locked_by="", locked_at=None)
+        return
+    finally:
+        done.set()
+        heartbeat.join()
+    mine.update(status=Job.SUCCEEDED, result=result, error="", finished_at=timezone.now())
+
+
+def work(stop_event, burst: bool = False) -> None:
+    """Claim and run jobs until ``stop_event`` is set (or the queue is empty, with ``burst``)."""
+    config = get_config()
+    worker = worker_id()
+    reap_every = max(config["TIMEOUT_SECONDS"] / 10, config["POLL_INTERVAL_SECONDS"])
+    last_reap = None
+    while not stop_event.is_set():
+        close_old_connections()
+        now = timezone.now()
+        if last_reap is None or (now - last_reap).total_seconds() >= reap_every:
+            requeue_stale()
+            last_reap = now
+        job = claim(worker)
+        if job is None:
+            if burst:
+                break
+            stop_event.wait(config["POLL_INTERVAL_SECONDS"])
+            continue
+        run(job)
+    close_old_connections()
+
+
+_embedded_lock = threading.Lock()
+_embedded_pid = None
+
+
+def ensure_embedded_worker() -> None:
+    """
+    Start a worker thread in this process, once per process.
+
+    For single-process deployments that cannot run ``run_workers`` next to
+    the web server (e.g. a SQLite database on the web host).
+    """
+    global _embedded_pid
+    if _embedded_pid == os.getpid():
+        return
+    with _embedded_lock:
+        if _embedded_pid == os.getpid():
+            return
+        threading.Thread(target=work, args=(threading.Event(),), name="job-worker", daemon=True).start()
+        _embedded_pid = os.getpid()
@@ -0,0 +1,115 @@
+import time
+from datetime import timedelta
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from reports.models import CityWideReport
+
+from . import queue
+from .models import Job
+
+
+def succeed(job):
+    return {"echo": job.payload}
+
+
+def fail(job):
+    raise RuntimeError("boom")
+
+
+def outlive_timeout(job):
+    """Run past TIMEOUT_SECONDS, then report what a stale-job sweep finds."""
+    time.sleep(1.5)
+    return queue.requeue_stale()
+
+
+JOB_QUEUE = {
+    "HANDLERS": {
+        "tests.succeed": "jobs.tests.succeed",
+        "tests.fail": "jobs.tests.fail",
+        "tests.outlive_timeout": "jobs.tests.outlive_timeout",
+    },
+    "TIMEOUT_SECONDS": 60,
+    "RETRY_DELAY_SECONDS": 30,
+}
+
+
+@override_settings(JOB_QUEUE=JOB_QUEUE)
+class ClaimTests(TestCase):
+    def test_each_job_is_claimed_once_oldest_first(self):
+        first, second = queue.enqueue("tests.succeed"), queue.enqueue("tests.succeed")
+        claimed = queue.claim("worker-a")
+        self.assertEqual(claimed.pk, first.pk)
+        self.assertEqual((claimed.status, claimed.locked_by, claimed.attempts), (Job.RUNNING, "worker-a", 1))
+        self.assertEqual(queue.claim("worker-b").pk, second.pk)
+        self.assertIsNone(queue.claim("worker-c"))
+
+    def test_delayed_jobs_wait(self):
+        queue.enqueue("tests.succeed")
+        Job.objects.update(run_after=timezone.now() + timedelta(minutes=1))
+        self.assertIsNone(queue.claim("worker-a"))
+
+    def test_requeue_stale(self):
+        stale, retried_out, fresh = (queue.enqueue("tests.succeed", max_attempts=2) for _ in range(3))
+        for job in (stale, retried_out, fresh):
+            queue.claim("dead-worker")
+        long_ago = timezone.now() - timedelta(seconds=61)
+        Job.objects.filter(pk__in=[stale.pk, retried_out.pk]).update(locked_at=long_ago)
+        Job.objects.filter(pk=retried_out.pk).update(attempts=2)
+        self.assertEqual(queue.requeue_stale(), 2)
+        stale.refresh_from_db()
+        retried_out.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual((stale.status, stale.locked_by, stale.locked_at), (Job.QUEUED, "", None))
+        self.assertEqual((retried_out.status, retried_out.error), (Job.FAILED, "Worker timed out."))
+        self.assertEqual(fresh.status, Job.RUNNING)
+        self.assertEqual(queue.claim("worker-b").pk, stale.pk)
+
+    def test_run_stores_result_or_retries(self):
+        queue.enqueue("tests.succeed", {"n": 1})
+        queue.enqueue("tests.fail", max_attempts=2)
+        with self.assertLogs("jobs.queue", "ERROR"):
+            for _ in range(2):
+                queue.run(queue.claim("worker-a"))
+        succeeded, failed = Job.objects.order_by("id")
+        self.assertEqual((succeeded.status, succeeded.result), (Job.SUCCEEDED, {"echo": {"n": 1}}))
+        self.assertEqual((failed.status, failed.attempts), (Job.QUEUED, 1))
+        self.assertIn("RuntimeError: boom", failed.error)
+        self.assertGreater(failed.run_after, timezone.now() + timedelta(seconds=20))
+        Job.objects.filter(pk=failed.pk).update(run_after=timezone.now())
+        with self.assertLogs("jobs.queue", "ERROR"):
+            queue.run(queue.claim("worker-a"))
+        failed.refresh_from_db()
+        self.assertEqual((failed.status, failed.attempts), (Job.FAILED, 2))
+
+
+class CitywideReportJobTests(TestCase):
+    def test_job_creates_report(self):
+        job = queue.enqueue(
+            "reports.citywide", {"title": "Q1", "period_start": "2026-01-01", "period_end": "2026-03-31"}
+        )
+        queue.run(queue.claim("worker-a"))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        report = CityWideReport.objects.get(pk=job.result["report_id"])
+        self.assertEqual((report.title, str(report.period_end)), ("Q1", "2026-03-31"))
+
+
+class HeartbeatTests(TransactionTestCase):
+    # The heartbeat thread uses its own connection, so rows must be committed.
+
+    @override_settings(JOB_QUEUE={**JOB_QUEUE, "TIMEOUT_SECONDS": 1, "HEARTBEAT_SECONDS": 0.2})
+    def test_running_job_outlives_timeout(self):
+        queue.enqueue("tests.outlive_timeout")
+        queue.run(queue.claim("worker-a"))
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.result, job.attempts), (Job.SUCCEEDED, 0, 1))
+
+    @override_settings(JOB_QUEUE={**JOB_QUEUE, "TIMEOUT_SECONDS": 1, "HEARTBEAT_SECONDS": 60})
+    def test_job_without_heartbeat_is_requeued(self):
+        queue.enqueue("tests.outlive_timeout")
+        queue.run(queue.claim("worker-a"))
+        # The late run does not overwrite the re-queued job.
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.result, job.locked_by), (Job.QUEUED, None, ""))
@@ -0,0 +1,23 @@
+from rest_framework import viewsets, permissions
+
+from .models import Job
+from .serializers import JobSerializer
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Status and result of background jobs. Central authority users see every
+    job; other users see the jobs they started.
+    """
+
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = Job.objects.all()
+        if getattr(self.request.user, "user_type", None) != "central_authority":
+            queryset = queryset.filter(created_by=self.request.user)
+        status = self.request.query_params.get("status")
+        if status:
+            queryset = queryset.filter(status=status)
+        return queryset
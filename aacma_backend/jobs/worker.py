@@ -0,0 +1,20 @@
+"""
+Entry point for ``run_workers`` child processes.
+
+Kept free of model imports: with the ``spawn`` start method this module is
+imported by a fresh interpreter before Django is set up.
+"""
+import signal
+
+
+def process_main(stop_event, burst):
+    import django
+
+    django.setup()
+    # The parent turns SIGINT/SIGTERM into stop_event; finish the current job.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+    from .queue import work
+
+    work(stop_event, burst=burst)
@@ -0,0 +1,345 @@
+"""
+Daily fact rollups for collections and complaints.
+
+Signals in ``reports.signals`` keep the fact tables current with deltas:
+each source row's contribution (``collection_request_rows`` and friends,
+``{(day, *dimensions): {measure: amount}}``) is remembered when it is
+loaded, and on save or delete the difference from its new contribution is
+added to the stored rows with ``F()`` updates by ``apply_changes``. A write
+therefore costs a few single-row updates however busy its days are. Rows
+whose measures drop to zero are kept until the next rebuild.
+
+``refresh_collection_facts`` / ``refresh_complaint_facts`` recompute every
+fact row for a range of local days from the raw tables with a few grouped
+queries, then replace the stored rows for that range; ``rebuild_daily_facts``
+uses them after upgrades or bulk edits that bypass the signals.
+
+Both hold a row lock per (fact table, day) in ``DailyFactLock`` while they
+write, so a delta is never applied in the middle of a refresh of its day.
+A refresh that reads the raw tables before a concurrent write commits can
+still miss that write's delta, so rebuild while writes are quiet. The
+unique constraints on each fact table's dimensions (with conditional ones
+for null zones and companies) back this up.
+"""
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.dispatch import Signal
+from django.utils import timezone
+
+from complaints.models import WasteReport
+from waste_collections.models import CollectionRecord, CollectionRequest
+
+from .models import DailyCollectionFact, DailyComplaintFact, DailyFactLock
+
+# Sent with ``sender=<fact model>`` after a range of fact rows is replaced.
+facts_refreshed = Signal()
+
+
+def local_day(value: datetime | None) -> date | None:
+    return timezone.localdate(value) if value else None
+
+
+def day_start(day: date) -> datetime:
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _seconds(delta) -> float:
+    return delta.total_seconds() if delta else 0.0
+
+
+def _duration(end: str, start: str):
+    return ExpressionWrapper(F(end) - F(start), output_field=DurationField())
+
+
+def _grouped(queryset, date_field: str, start: date, end: date, dimensions: dict, **measures):
+    """
+    Group ``queryset`` rows whose ``date_field`` falls in ``[start, end)``
+    by local day and ``dimensions`` (output name -> lookup).
+    """
+    lookups = list(dimensions.values())
+    rows = (
+        queryset.filter(**{f"{date_field}__gte": day_start(start), f"{date_field}__lt": day_start(end)})
+        .annotate(fact_day=TruncDate(date_field))
+        .values("fact_day", *lookups)
+        .annotate(**measures)
+        .order_by()
+    )
+    for row in rows:
+        key = (row["fact_day"],) + tuple(row[lookup] for lookup in lookups)
+        yield key, row
+
+
+def _day_range(start: date, end: date) -> list[date]:
+    return [start + timedelta(days=offset) for offset in range((end - start).days)]
+
+
+@contextmanager
+def _locked_days(model, days: list[date]):
+    """Transaction holding the refresh lock of ``model`` for each of ``days``."""
+    table = model._meta.label_lower
+    days = sorted(days)
+    with transaction.atomic():
+        DailyFactLock.objects.bulk_create(
+            [DailyFactLock(table=table, day=day) for day in days], batch_size=1000, ignore_conflicts=True
+        )
+        # Always in day order, so overlapping sets of days cannot deadlock.
+        for offset in range(0, len(days), 500):
+            locks = DailyFactLock.objects.select_for_update().filter(table=table, day__in=days[offset : offset + 500])
+            list(locks.order_by("day").values_list("pk", flat=True))
+        yield
+
+
+def _refresh(model, start: date, end: date, collect, dimensions) -> int:
+    with _locked_days(model, _day_range(start, end)):
+        facts = collect(start, end)
+        objs = [model(**dict(zip(("day",) + tuple(dimensions), key)), **values) for key, values in facts.items()]
+        model.objects.filter(day__gte=start, day__lt=end).delete()
+        model.objects.bulk_create(objs, batch_size=1000)
+    facts_refreshed.send(sender=model, start=start, end=end)
+    return len(objs)
+
+
+COLLECTION_DIMENSIONS = ("zone_id", "company_id", "waste_type", "status")
+
+
+def refresh_collection_facts(start: date, end: date) -> int:
+    """Recompute ``DailyCollectionFact`` rows for local days in ``[start, end)``."""
+    return _refresh(DailyCollectionFact, start, end, _collection_facts, COLLECTION_DIMENSIONS)
+
+
+def _collection_facts(start: date, end: date) -> dict:
+    facts = defaultdict(
+        lambda: {
+            "requests_created": 0,
+            "requests_completed": 0,
+            "collected_weight_kg": 0.0,
+            "completion_seconds_sum": 0.0,
+        }
+    )
+    request_dims = {
+        "zone_id": "zone",
+        "company_id": "assigned_company",
+        "waste_type": "waste_type",
+        "status": "status",
+    }
+    for key, row in _grouped(
+        CollectionRequest.objects, "created_at", start, end, request_dims, n=Count("id")
+    ):
+        facts[key]["requests_created"] += row["n"]
+    for key, row in _grouped(
+        CollectionRequest.objects,
+        "collected_at",
+        start,
+        end,
+        request_dims,
+        n=Count("id"),
+        seconds=Sum(_duration("collected_at", "created_at")),
+    ):
+        facts[key]["requests_completed"] += row["n"]
+        facts[key]["completion_seconds_sum"] += _seconds(row["seconds"])
+    record_dims = {name: f"collection_request__{lookup}" for name, lookup in request_dims.items()}
+    for key, row in _grouped(
+        CollectionRecord.objects, "collected_at", start, end, record_dims, weight=Sum("actual_weight_kg")
+    ):
+        facts[key]["collected_weight_kg"] += float(row["weight"] or 0)
+    return facts
+
+
+COMPLAINT_DIMENSIONS = ("zone_id", "company_id", "report_type", "status")
+
+
+def refresh_complaint_facts(start: date, end: date) -> int:
+    """Recompute ``DailyComplaintFact`` rows for local days in ``[start, end)``."""
+    return _refresh(DailyComplaintFact, start, end, _complaint_facts, COMPLAINT_DIMENSIONS)
+
+
+def _complaint_facts(start: date, end: date) -> dict:
+    facts = defaultdict(
+        lambda: {"reports_count": 0, "resolved_count": 0, "resolution_seconds_sum": 0.0}
+    )
+    report_dims = {
+        "zone_id": "zone",
+        "company_id": "assigned_company",
+        "report_type": "report_type",
+        "status": "status",
+    }
+    for key, row in _grouped(WasteReport.objects, "reported_at", start, end, report_dims, n=Count("id")):
+        facts[key]["reports_count"] += row["n"]
+    for key, row in _grouped(
+        WasteReport.objects,
+        "resolved_at",
+        start,
+        end,
+        report_dims,
+        n=Count("id"),
+        seconds=Sum(_duration("resolved_at", "reported_at")),
+    ):
+        facts[key]["resolved_count"] += row["n"]
+        facts[key]["resolution_seconds_sum"] += _seconds(row["seconds"])
+    return facts
+
+
+# Source fields the contribution functions below read.
+COLLECTION_REQUEST_FIELDS = (
+    "id",
+    "created_at",
+    "collected_at",
+    "zone_id",
+    "assigned_company_id",
+    "waste_type",
+    "status",
+)
+COLLECTION_RECORD_FIELDS = ("collection_request_id", "collected_at", "actual_weight_kg")
+COMPLAINT_FIELDS = ("reported_at", "resolved_at", "zone_id", "assigned_company_id", "report_type", "status")
+
+
+def _request_dimensions(values: dict) -> tuple:
+    return values["zone_id"], values["assigned_company_id"], values["waste_type"], values["status"]
+
+
+def collection_request_rows(values: dict) -> dict:
+    """
+    The ``DailyCollectionFact`` amounts a request with field ``values``
+    (``COLLECTION_REQUEST_FIELDS``; empty if unsaved) contributes, as
+    ``{(day, *COLLECTION_DIMENSIONS): Counter(measure=amount)}``.
+    """
+    rows = defaultdict(Counter)
+    if not values:
+        return rows
+    dimensions = _request_dimensions(values)
+    created, collected = values["created_at"], values["collected_at"]
+    if created:
+        rows[(local_day(created),) + dimensions]["requests_created"] += 1
+    if collected:
+        key = (local_day(collected),) + dimensions
+        rows[key]["requests_completed"] += 1
+        rows[key]["completion_seconds_sum"] += _seconds(collected - created) if created else 0.0
+    return rows
+
+
+def collection_record_rows(values: dict, dimensions: tuple | None) -> dict:
+    """
+    The ``collected_weight_kg`` a collection record with field ``values``
+    (``COLLECTION_RECORD_FIELDS``) contributes under its request's
+    ``dimensions``.
+    """
+    rows = defaultdict(Counter)
+    if values and values["collected_at"] and dimensions:
+        key = (local_day(values["collected_at"]),) + dimensions
+        rows[key]["collected_weight_kg"] += float(values["actual_weight_kg"] or 0)
+    return rows
+
+
+def complaint_rows(values: dict) -> dict:
+    """The ``DailyComplaintFact`` amounts a waste report with field ``values`` (``COMPLAINT_FIELDS``) contributes."""
+    rows = defaultdict(Counter)
+    if not values:
+        return rows
+    dimensions = values["zone_id"], values["assigned_company_id"], values["report_type"], values["status"]
+    reported, resolved = values["reported_at"], values["resolved_at"]
+    if reported:
+        rows[(local_day(reported),) + dimensions]["reports_count"] += 1
+    if resolved:
+        key = (local_day(resolved),) + dimensions
+        rows[key]["resolved_count"] += 1
+        rows[key]["resolution_seconds_sum"] += _seconds(resolved - reported) if reported else 0.0
+    return rows
+
+
+def difference(old: dict, new: dict) -> dict:
+    """``new`` minus ``old``, both in the shape the ``*_rows`` functions return."""
+    changes = defaultdict(Counter)
+    for key, amounts in new.items():
+        changes[key].update(amounts)
+    for key, amounts in old.items():
+        changes[key].subtract(amounts)
+    return changes
+
+
+def _dimensions_of_request(request_id) -> tuple | None:
+    return (
+        CollectionRequest.objects.filter(pk=request_id)
+        .values_list("zone_id", "assigned_company_id", "waste_type", "status")
+        .first()
+    )
+
+
+def collection_request_changes(old: dict, new: dict) -> dict:
+    """Fact changes for a request going from ``old`` to ``new`` field values."""
+    changes = difference(collection_request_rows(old), collection_request_rows(new))
+    if old and new and _request_dimensions(old) != _request_dimensions(new):
+        # The weight of the request's collection record moves with it.
+        record = (
+            CollectionRecord.objects.filter(collection_request_id=new["id"])
+            .values(*COLLECTION_RECORD_FIELDS)
+            .first()
+        )
+        moved = difference(
+            collection_record_rows(record, _request_dimensions(old)),
+            collection_record_rows(record, _request_dimensions(new)),
+        )
+        for key, amounts in moved.items():
+            changes[key].update(amounts)
+    return changes
+
+
+def collection_record_changes(old: dict, new: dict) -> dict:
+    """Fact changes for a collection record going from ``old`` to ``new`` field values."""
+    request_id = (new or old).get("collection_request_id")
+    dimensions = _dimensions_of_request(request_id) if request_id else None
+    return difference(collection_record_rows(old, dimensions), collection_record_rows(new, dimensions))
+
+
+def complaint_changes(old: dict, new: dict) -> dict:
+    """Fact changes for a waste report going from ``old`` to ``new`` field values."""
+    return difference(complaint_rows(old), complaint_rows(new))
+
+
+DIMENSIONS = {
+    DailyCollectionFact: COLLECTION_DIMENSIONS,
+    DailyComplaintFact: COMPLAINT_DIMENSIONS,
+}
+
+
+def apply_changes(model, changes: dict) -> None:
+    """
+    Add ``changes`` (``{(day, *dimensions): {measure: amount}}``) to the
+    stored ``model`` rows, holding the refresh lock of every day touched.
+    """
+    changes = {key: amounts for key, amounts in changes.items() if any(amounts.values())}
+    if not changes:
+        return
+    days = sorted({key[0] for key in changes})
+    names = ("day",) + DIMENSIONS[model]
+    with _locked_days(model, days):
+        for key, amounts in changes.items():
+            lookup = dict(zip(names, key))
+            if model.objects.filter(**lookup).update(
+                **{measure: F(measure) + amount for measure, amount in amounts.items()}
+            ):
+                continue
+            # Under the day's lock nobody else creates this row meanwhile.
+            # Only rows out of step with the sources (before a rebuild) see
+            # a first change below zero.
+            model.objects.create(**lookup, **{measure: max(amount, 0) for measure, amount in amounts.items()})
+    facts_refreshed.send(sender=model, start=days[0], end=days[-1] + timedelta(days=1))
+
+
+def source_day_range() -> tuple[date, date] | None:
+    """Smallest ``[start, end)`` local-day range covering every source timestamp."""
+    bounds = [
+        CollectionRequest.objects.aggregate(a=Min("created_at"), b=Max("created_at"), c=Max("collected_at")),
+        CollectionRecord.objects.aggregate(a=Min("collected_at"), b=Max("collected_at")),
+        WasteReport.objects.aggregate(a=Min("reported_at"), b=Max("reported_at"), c=Max("resolved_at")),
+    ]
+    values = [value for bound in bounds for value in bound.values() if value]
+    if not values:
+        return None
+    return local_day(min(values)), local_day(max(values)) + timedelta(days=1)
@@ -0,0 +1,208 @@
+"""
+Report generation from the daily fact tables and source rows.
+
+``citywide_metrics`` computes every derived ``CityWideReport`` field for a
+period with a handful of grouped queries; the report itself is written by
+the ``reports.citywide`` background job (``reports.jobs``).
+
+``generate_performance_reports`` builds the ``PerformanceReport`` of every
+company for one period. Each metric comes from one query grouped by company,
+so the query count does not grow with the number of companies.
+"""
+from __future__ import annotations
+
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import Avg, Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from accounts.analytics import AnalyticsFilters, compute_area_insights, compute_company_performance
+from companies.models import WasteCompany
+from waste_collections.models import CollectionRecord, CollectionRequest
+
+from .facts import day_start
+from .models import DailyCompanyReport, PerformanceReport
+
+PERIODS = [value for value, _ in PerformanceReport.REPORT_PERIODS]
+
+
+def _percentage(part, whole) -> float:
+    return round(part / whole * 100, 2) if whole else 0.0
+
+
+def citywide_metrics(period_start: date, period_end: date) -> dict:
+    """``CityWideReport`` field values for the inclusive period ``[period_start, period_end]``."""
+    filters = AnalyticsFilters(period_start, period_end + timedelta(days=1))
+    start, end = day_start(filters.start), day_start(filters.end)
+
+    facts = filters.collection_facts().aggregate(
+        total_requests=Coalesce(Sum("requests_created"), 0),
+        completed=Coalesce(Sum("requests_created", filter=Q(status="completed")), 0),
+        completion_seconds=Coalesce(Sum("completion_seconds_sum", filter=Q(status="completed")), 0.0),
+        completion_count=Coalesce(Sum("requests_completed", filter=Q(status="completed")), 0),
+        collected_kg=Coalesce(Sum("collected_weight_kg"), 0.0),
+        active_companies=Count("company", distinct=True),
+        active_zones=Count("zone", distinct=True),
+    )
+    estimated_kg = CollectionRequest.objects.filter(created_at__gte=start, created_at__lt=end).aggregate(
+        total=Coalesce(Sum("estimated_weight_kg"), 0.0)
+    )["total"]
+    active_vehicles = (
+        CollectionRecord.objects.filter(collected_at__gte=start, collected_at__lt=end, vehicle__isnull=False)
+        .values("vehicle")
+        .distinct()
+        .count()
+    )
+    # Recycling is only known from the companies' approved daily reports.
+    recycling = DailyCompanyReport.objects.filter(
+        status="approved", report_date__gte=period_start, report_date__lte=period_end
+    ).aggregate(
+        recycled=Coalesce(Sum("recycled_kg"), 0.0),
+        total=Coalesce(Sum("total_waste_kg"), 0.0),
+    )
+
+    collected_kg = facts["collected_kg"]
+    return {
+        # Residents' estimates; fall back to what was collected where none were given.
+        "total_waste_generated_tons": round(max(estimated_kg, collected_kg) / 1000, 3),
+        "total_waste_collected_tons": round(collected_kg / 1000, 3),
+        "recycling_rate_percentage": _percentage(recycling["recycled"], recycling["total"]),
+        "active_companies": facts["active_companies"],
+        "active_vehicles": active_vehicles,
+        "active_zones": facts["active_zones"],
+        "total_requests": facts["total_requests"],
+        "completion_rate": _percentage(facts["completed"], facts["total_requests"]),
+        "average_response_time": (
+            round(facts["completion_seconds"] / facts["completion_count"] / 3600, 2)
+            if facts["completion_count"]
+            else 0.0
+        ),
+        "zone_breakdown": {
+            item["zone_name"]: item for item in compute_area_insights(filters)["area_insights"]
+        },
+        "company_breakdown": {
+            item["company_name"]: item
+            for item in compute_company_performance(filters)["company_performance"]
+        },
+    }
+
+
+def period_bounds(period: str, anchor: date) -> tuple[date, date]:
+    """Inclusive ``(start_date, end_date)`` of the ``period`` containing ``anchor``."""
+    if period == "daily":
+        return anchor, anchor
+    if period == "weekly":
+        start = anchor - timedelta(days=anchor.weekday())
+        return start, start + timedelta(days=6)
+    if period == "monthly":
+        start = anchor.replace(day=1)
+    elif period == "quarterly":
+        start = anchor.replace(month=(anchor.month - 1) // 3 * 3 + 1, day=1)
+    elif period == "yearly":
+        start = anchor.replace(month=1, day=1)
+    else:
+        raise ValueError(f"Unknown period {period!r}; expected one of {', '.join(PERIODS)}.")
+    months = {"monthly": 1, "quarterly": 3, "yearly": 12}[period]
+    month = start.month - 1 + months
+    next_start = start.replace(year=start.year + month // 12, month=month % 12 + 1)
+    return start, next_start - timedelta(days=1)
+
+
+def _by_company(queryset, company_field: str, **measures) -> dict:
+    rows = queryset.values(company_field).annotate(**measures).order_by()
+    return {row.pop(company_field): row for row in rows}
+
+
+def generate_performance_reports(period: str, anchor: date, user=None) -> list:
+    """
+    Create the ``period`` report containing ``anchor`` for every approved
+    company and every company with activity in it, replacing any existing
+    reports for that period.
+    """
+    period_start, period_end = period_bounds(period, anchor)
+    filters = AnalyticsFilters(period_start, period_end + timedelta(days=1))
+    start, end = day_start(filters.start), day_start(filters.end)
+
+    collections = _by_company(
+        filters.collection_facts().filter(company__isnull=False),
+        "company",
+        created=Sum("requests_created"),
+        completed=Sum("requests_completed"),
+        completion_seconds=Sum("completion_seconds_sum", filter=Q(status="completed")),
+        completion_count=Sum("requests_completed", filter=Q(status="completed")),
+        collected_kg=Sum("collected_weight_kg"),
+    )
+    complaints = _by_company(
+        filters.complaint_facts().filter(company__isnull=False),
+        "company",
+        received=Sum("reports_count"),
+        resolved=Sum("resolved_count"),
+    )
+    # Missed: due in the period (by preferred date) and not collected by the
+    # end of that day. Only days that are already over can be missed.
+    today = timezone.localdate()
+    missed = _by_company(
+        CollectionRequest.objects.filter(
+            assigned_company__isnull=False,
+            preferred_date__gte=period_start,
+            preferred_date__lte=min(period_end, today - timedelta(days=1)),
+        ).exclude(status="cancelled"),
+        "assigned_company",
+        missed=Count(
+            "id",
+            filter=Q(collected_at__isnull=True) | Q(collected_at__date__gt=F("preferred_date")),
+        ),
+    )
+    ratings = _by_company(
+        CollectionRecord.objects.filter(
+            collected_at__gte=start,
+            collected_at__lt=end,
+            rating__isnull=False,
+            collection_request__assigned_company__isnull=False,
+        ),
+        "collection_request__assigned_company",
+        rating=Avg("rating"),
+    )
+    recycled = _by_company(
+        DailyCompanyReport.objects.filter(
+            status="approved", report_date__gte=period_start, report_date__lte=period_end
+        ),
+        "company",
+        recycled_kg=Sum("recycled_kg"),
+    )
+
+    company_ids = set(WasteCompany.objects.filter(status="approved").values_list("id", flat=True))
+    for measures in (collections, complaints, missed, ratings, recycled):
+        company_ids.update(measures)
+
+    reports = []
+    for company_id in sorted(company_ids):
+        collection = collections.get(company_id, {})
+        completion_count = collection.get("completion_count") or 0
+        reports.append(
+            PerformanceReport(
+                company_id=company_id,
+                period=period,
+                start_date=period_start,
+                end_date=period_end,
+                total_collections=collection.get("created") or 0,
+                completed_collections=collection.get("completed") or 0,
+                missed_collections=missed.get(company_id, {}).get("missed", 0),
+                average_response_time_hours=(
+                    round(collection["completion_seconds"] / completion_count / 3600, 2)
+                    if completion_count
+                    else 0
+                ),
+                total_waste_collected_kg=round(collection.get("collected_kg") or 0, 2),
+                recycled_waste_kg=round(recycled.get(company_id, {}).get("recycled_kg") or 0, 2),
+                customer_satisfaction_rating=round(ratings.get(company_id, {}).get("rating") or 0, 2),
+                complaints_received=complaints.get(company_id, {}).get("received") or 0,
+                complaints_resolved=complaints.get(company_id, {}).get("resolved") or 0,
+                generated_by=user if getattr(user, "is_authenticated", False) else None,
+            )
+        )
+    with transaction.atomic():
+        PerformanceReport.objects.filter(period=period, start_date=period_start, end_date=period_end).delete()
+        return PerformanceReport.objects.bulk_create(reports, batch_size=500)
@@ -0,0 +1,99 @@
+"""
+Precomputed density grid for collection requests and waste reports.
+
+Every point inside ``ADDIS_BOUNDS`` is counted in one cell per zoom level
+(``HeatmapCell``). Signals in ``reports.signals`` apply +1/-1 deltas when a
+point is created, moved or deleted; ``rebuild`` recounts a layer from the
+raw rows. ``grid`` answers a map request with the non-empty cells of one
+zoom level.
+"""
+from __future__ import annotations
+
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from complaints.models import WasteReport
+from waste_collections.models import ADDIS_BOUNDS, CollectionRequest, within_addis
+
+from .models import HeatmapCell
+
+MIN_ZOOM = 2
+MAX_ZOOM = 8
+ZOOM_LEVELS = range(MIN_ZOOM, MAX_ZOOM + 1)
+
+LAYER_MODELS = {
+    "requests": CollectionRequest,
+    "complaints": WasteReport,
+}
+
+
+def cell(zoom: int, lat: float, lng: float) -> tuple[int, int]:
+    """(row, col) of the point at ``zoom``; the north and east edges fall in the last cell."""
+    south, west, north, east = ADDIS_BOUNDS
+    size = 2**zoom
+    row = min(int((lat - south) / (north - south) * size), size - 1)
+    col = min(int((lng - west) / (east - west) * size), size - 1)
+    return row, col
+
+
+def cells(lat: float | None, lng: float | None) -> list[tuple[int, int, int]]:
+    """(zoom, row, col) for every zoom level, or nothing for a point outside the box."""
+    if not within_addis(lat, lng):
+        return []
+    return [(zoom, *cell(zoom, lat, lng)) for zoom in ZOOM_LEVELS]
+
+
+def apply_deltas(layer: str, deltas: Counter) -> None:
+    """Add ``deltas`` (``{(zoom, row, col): change}``) to the stored counts."""
+    for (zoom, row, col), delta in deltas.items():
+        if not delta:
+            continue
+        lookup = {"layer": layer, "zoom": zoom, "row": row, "col": col}
+        if HeatmapCell.objects.filter(**lookup).update(count=F("count") + delta):
+            continue
+        try:
+            with transaction.atomic():
+                HeatmapCell.objects.create(count=delta, **lookup)
+        except IntegrityError:
+            # Created concurrently since the update above.
+            HeatmapCell.objects.filter(**lookup).update(count=F("count") + delta)
+
+
+def rebuild(layer: str) -> int:
+    """Recount ``layer`` from the raw rows; returns the number of non-empty cells."""
+    counts = Counter()
+    points = LAYER_MODELS[layer].objects.filter(latitude__isnull=False, longitude__isnull=False)
+    for lat, lng in points.values_list("latitude", "longitude").iterator(chunk_size=5000):
+        counts.update(cells(lat, lng))
+    with transaction.atomic():
+        HeatmapCell.objects.filter(layer=layer).delete()
+        HeatmapCell.objects.bulk_create(
+            [
+                HeatmapCell(layer=layer, zoom=zoom, row=row, col=col, count=count)
+                for (zoom, row, col), count in counts.items()
+            ],
+            batch_size=1000,
+        )
+    return len(counts)
+
+
+def grid(layer: str, zoom: int) -> dict:
+    south, west, north, east = ADDIS_BOUNDS
+    size = 2**zoom
+    rows = (
+        HeatmapCell.objects.filter(layer=layer, zoom=zoom, count__gt=0)
+        .order_by("row", "col")
+        .values_list("row", "col", "count")
+    )
+    return {
+        "layer": layer,
+        "zoom": zoom,
+        "bounds": {"south": south, "west": west, "north": north, "east": east},
+        "rows": size,
+        "cols": size,
+        "cell_size": {"lat": (north - south) / size, "lng": (east - west) / size},
+        # [row, col, count]; row 0 is the southern edge, col 0 the western.
+        "cells": [list(item) for item in rows],
+    }
@@ -0,0 +1,18 @@
+"""Background job handlers for report generation (see ``JOB_QUEUE`` in settings)."""
+from datetime import date
+
+from .generation import citywide_metrics
+from .models import CityWideReport
+
+
+def generate_citywide_report(job):
+    period_start = date.fromisoformat(job.payload["period_start"])
+    period_end = date.fromisoformat(job.payload["period_end"])
+    report = CityWideReport.objects.create(
+        title=job.payload["title"],
+        period_start=period_start,
+        period_end=period_end,
+        generated_by_id=job.created_by_id,
+        **citywide_metrics(period_start, period_end),
+    )
+    return {"report_id": report.id}
@@ -0,0 +1,159 @@
+"""
+Completion- and resolution-time percentiles from persisted daily sketches.
+
+``record_completion`` / ``record_resolution`` add one observation to the
+sketch for its (metric, day, company, zone) while holding that row's lock;
+unique constraints keep one row per key, null company and zone included.
+``percentiles`` merges the stored sketches matching the analytics filters,
+overall and per company and zone. ``rebuild`` recreates the sketches from
+the raw rows.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import date
+
+from django.db import IntegrityError, transaction
+
+from companies.models import WasteCompany
+from complaints.models import WasteReport
+from waste_collections.models import CollectionRequest
+from zones.models import Zone
+
+from .facts import day_start, local_day
+from .models import LatencySketch
+from .sketch import DDSketch
+
+QUANTILES = {"p50": 0.5, "p90": 0.9, "p99": 0.99}
+METRICS = [value for value, _ in LatencySketch.METRICS]
+
+
+def _locked_row(metric: str, day: date, company_id, zone_id) -> LatencySketch:
+    lookup = {"metric": metric, "day": day, "company_id": company_id, "zone_id": zone_id}
+    row = LatencySketch.objects.select_for_update().filter(**lookup).first()
+    if row is not None:
+        return row
+    try:
+        with transaction.atomic():
+            return LatencySketch.objects.create(**lookup)
+    except IntegrityError:
+        # Created concurrently since the select above; wait for that one.
+        return LatencySketch.objects.select_for_update().get(**lookup)
+
+
+def record(metric: str, at, company_id, zone_id, seconds: float) -> None:
+    """Add ``seconds`` to the sketch of (``metric``, local day of ``at``, company, zone)."""
+    with transaction.atomic():
+        row = _locked_row(metric, local_day(at), company_id, zone_id)
+        sketch = DDSketch.from_dict(row.sketch) if row.sketch else DDSketch()
+        sketch.add(max(seconds, 0.0))
+        row.sketch = sketch.to_dict()
+        row.count = sketch.count
+        row.save(update_fields=["sketch", "count", "updated_at"])
+
+
+def record_completion(collection_request: CollectionRequest) -> None:
+    if not collection_request.collected_at:
+        return
+    record(
+        "completion",
+        collection_request.collected_at,
+        collection_request.assigned_company_id,
+        collection_request.zone_id,
+        (collection_request.collected_at - collection_request.created_at).total_seconds(),
+    )
+
+
+def record_resolution(report: WasteReport) -> None:
+    if not report.resolved_at:
+        return
+    record(
+        "resolution",
+        report.resolved_at,
+        report.assigned_company_id,
+        report.zone_id,
+        (report.resolved_at - report.reported_at).total_seconds(),
+    )
+
+
+def _summary(sketch: DDSketch) -> dict:
+    summary = {"count": sketch.count}
+    for name, q in QUANTILES.items():
+        value = sketch.quantile(q)
+        summary[f"{name}_hours"] = round(value / 3600, 2) if value is not None else None
+    return summary
+
+
+def percentiles(metric: str, filters) -> dict:
+    """p50/p90/p99 in hours for ``metric``, overall and per company and zone."""
+    overall = DDSketch()
+    by_company = defaultdict(DDSketch)
+    by_zone = defaultdict(DDSketch)
+    rows = filters.apply(
+        LatencySketch.objects.filter(metric=metric), day="day", zone="zone", company="company"
+    ).values_list("company_id", "zone_id", "sketch")
+    for company_id, zone_id, data in rows.iterator():
+        sketch = DDSketch.from_dict(data)
+        overall.merge(sketch)
+        by_company[company_id].merge(sketch)
+        by_zone[zone_id].merge(sketch)
+
+    company_names = dict(WasteCompany.objects.filter(id__in=[pk for pk in by_company if pk]).values_list("id", "name"))
+    zone_names = dict(Zone.objects.filter(id__in=[pk for pk in by_zone if pk]).values_list("id", "name"))
+    return {
+        "metric": metric,
+        "overall": _summary(overall),
+        "by_company": [
+            {"company_id": pk, "company_name": company_names.get(pk, "Unassigned"), **_summary(sketch)}
+            for pk, sketch in sorted(by_company.items(), key=lambda item: company_names.get(item[0], ""))
+        ],
+        "by_zone": [
+            {"zone_id": pk, "zone_name": zone_names.get(pk, "Unassigned"), **_summary(sketch)}
+            for pk, sketch in sorted(by_zone.items(), key=lambda item: zone_names.get(item[0], ""))
+        ],
+    }
+
+
+def rebuild(start: date | None = None, end: date | None = None) -> int:
+    """Recreate the sketches for local days in ``[start, end)`` (default: all) from raw rows."""
+    sources = {
+        "completion": CollectionRequest.objects.filter(collected_at__isnull=False).values_list(
+            "collected_at", "created_at", "assigned_company_id", "zone_id"
+        ),
+        "resolution": WasteReport.objects.filter(resolved_at__isnull=False).values_list(
+            "resolved_at", "reported_at", "assigned_company_id", "zone_id"
+        ),
+    }
+    date_fields = {"completion": "collected_at", "resolution": "resolved_at"}
+    sketches = defaultdict(DDSketch)
+    for metric, rows in sources.items():
+        if start:
+            rows = rows.filter(**{f"{date_fields[metric]}__gte": day_start(start)})
+        if end:
+            rows = rows.filter(**{f"{date_fields[metric]}__lt": day_start(end)})
+        for finished, began, company_id, zone_id in rows.iterator(chunk_size=5000):
+            key = (metric, local_day(finished), company_id, zone_id)
+            sketches[key].add(max((finished - began).total_seconds(), 0.0))
+
+    existing = LatencySketch.objects.all()
+    if start:
+        existing = existing.filter(day__gte=start)
+    if end:
+        existing = existing.filter(day__lt=end)
+    with transaction.atomic():
+        existing.delete()
+        LatencySketch.objects.bulk_create(
+            [
+                LatencySketch(
+                    metric=metric,
+                    day=day,
+                    company_id=company_id,
+                    zone_id=zone_id,
+                    count=sketch.count,
+                    sketch=sketch.to_dict(),
+                )
+                for (metric, day, company_id, zone_id), sketch in sketches.items()
+            ],
+            batch_size=500,
+        )
+    return len(sketches)
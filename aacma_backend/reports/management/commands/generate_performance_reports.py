@@ -0,0 +1,33 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from reports.generation import PERIODS, generate_performance_reports, period_bounds
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the performance report of every company for one period, replacing "
+        "existing reports for it. Defaults to the period containing yesterday, so a "
+        "run just after midnight covers the period that has just closed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--period", choices=PERIODS, default="monthly")
+        parser.add_argument("--date", help="Any day inside the period (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        try:
+            anchor = (
+                date.fromisoformat(options["date"])
+                if options["date"]
+                else timezone.localdate() - timedelta(days=1)
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        reports = generate_performance_reports(options["period"], anchor)
+        start, end = period_bounds(options["period"], anchor)
+        self.stdout.write(
+            self.style.SUCCESS(f"Generated {len(reports)} {options['period']} reports for {start} to {end}.")
+        )
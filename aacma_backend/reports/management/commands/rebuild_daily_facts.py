@@ -0,0 +1,38 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reports.facts import refresh_collection_facts, refresh_complaint_facts, source_day_range
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the daily collection and complaint fact tables from the raw "
+        "requests, records and waste reports. Defaults to the full history."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="start", help="First day to rebuild (YYYY-MM-DD).")
+        parser.add_argument("--to", dest="end", help="Last day to rebuild, inclusive (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options["start"]) if options["start"] else None
+            end = date.fromisoformat(options["end"]) + timedelta(days=1) if options["end"] else None
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        if start is None or end is None:
+            bounds = source_day_range()
+            if bounds is None:
+                self.stdout.write("No source rows; nothing to rebuild.")
+                return
+            start = start or bounds[0]
+            end = end or bounds[1]
+        collections = refresh_collection_facts(start, end)
+        complaints = refresh_complaint_facts(start, end)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {collections} collection and {complaints} complaint fact rows "
+                f"for {start} to {end - timedelta(days=1)}."
+            )
+        )
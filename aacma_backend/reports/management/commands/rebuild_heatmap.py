@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from reports.heatmap import LAYER_MODELS, rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount the collection request and waste report heatmap cells from the "
+        "raw coordinates, at every zoom level."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--layer", choices=list(LAYER_MODELS), help="Rebuild one layer only.")
+
+    def handle(self, *args, **options):
+        layers = [options["layer"]] if options["layer"] else list(LAYER_MODELS)
+        for layer in layers:
+            cells = rebuild(layer)
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {layer} heatmap: {cells} non-empty cells."))
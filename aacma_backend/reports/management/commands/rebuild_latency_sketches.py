@@ -0,0 +1,25 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reports.latency import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the daily completion- and resolution-time sketches from the "
+        "raw collection requests and waste reports. Defaults to the full history."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="start", help="First day to rebuild (YYYY-MM-DD).")
+        parser.add_argument("--to", dest="end", help="Last day to rebuild, inclusive (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options["start"]) if options["start"] else None
+            end = date.fromisoformat(options["end"]) + timedelta(days=1) if options["end"] else None
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        rows = rebuild(start, end)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} latency sketch rows."))
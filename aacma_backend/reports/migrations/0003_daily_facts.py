@@ -0,0 +1,89 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("companies", "0001_initial"),
+        ("reports", "0002_daily_company_report"),
+        ("zones", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyCollectionFact",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                ("day", models.DateField()),
+                ("waste_type", models.CharField(max_length=20)),
+                ("status", models.CharField(max_length=20)),
+                ("requests_created", models.PositiveIntegerField(default=0)),
+                ("requests_completed", models.PositiveIntegerField(default=0)),
+                ("collected_weight_kg", models.FloatField(default=0)),
+                ("completion_seconds_sum", models.FloatField(default=0)),
+                (
+                    "company",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="companies.wastecompany",
+                    ),
+                ),
+                (
+                    "zone",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="zones.zone",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-day"],
+                "indexes": [
+                    models.Index(fields=["day"], name="reports_coll_fact_day_idx")
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="DailyComplaintFact",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                ("day", models.DateField()),
+                ("report_type", models.CharField(max_length=30)),
+                ("status", models.CharField(max_length=20)),
+                ("reports_count", models.PositiveIntegerField(default=0)),
+                ("resolved_count", models.PositiveIntegerField(default=0)),
+                ("resolution_seconds_sum", models.FloatField(default=0)),
+                (
+                    "company",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="companies.wastecompany",
+                    ),
+                ),
+                (
+                    "zone",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="zones.zone",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-day"],
+                "indexes": [
+                    models.Index(fields=["day"], name="reports_compl_fact_day_idx")
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("companies", "0001_initial"),
+        ("reports", "0003_daily_facts"),
+        ("zones", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LatencySketch",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                (
+                    "metric",
+                    models.CharField(
+                        choices=[
+                            ("completion", "Request completion (created to collected)"),
+                            (
+                                "resolution",
+                                "Complaint resolution (reported to resolved)",
+                            ),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("count", models.PositiveIntegerField(default=0)),
+                ("sketch", models.JSONField(default=dict)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "company",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="companies.wastecompany",
+                    ),
+                ),
+                (
+                    "zone",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="zones.zone",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-day"],
+                "indexes": [
+                    models.Index(
+                        fields=["metric", "day"], name="reports_latency_metric_day_idx"
+                    )
+                ],
+            },
+        ),
+    ]
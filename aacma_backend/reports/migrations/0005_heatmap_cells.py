@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reports", "0004_latency_sketches"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HeatmapCell",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                (
+                    "layer",
+                    models.CharField(
+                        choices=[
+                            ("requests", "Collection requests"),
+                            ("complaints", "Waste reports"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("zoom", models.PositiveSmallIntegerField()),
+                ("row", models.PositiveIntegerField()),
+                ("col", models.PositiveIntegerField()),
+                ("count", models.IntegerField(default=0)),
+            ],
+            options={
+                "ordering": ["layer", "zoom", "row", "col"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("layer", "zoom", "row", "col"),
+                        name="reports_heatmap_cell_unique",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:33
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def drop_duplicate_facts(apps, schema_editor):
+    # Concurrent refreshes could store a day twice; each copy is a full
+    # recount, so keep the newest one per key.
+    for model_name, dimensions in (
+        ("DailyCollectionFact", ("day", "zone", "company", "waste_type", "status")),
+        ("DailyComplaintFact", ("day", "zone", "company", "report_type", "status")),
+    ):
+        model = apps.get_model("reports", model_name)
+        keep = (
+            model.objects.values(*dimensions)
+            .annotate(keep=Max("id"))
+            .values_list("keep", flat=True)
+        )
+        model.objects.exclude(id__in=list(keep)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("companies", "0001_initial"),
+        ("reports", "0005_heatmap_cells"),
+        ("zones", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_facts, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name="DailyFactLock",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                ("table", models.CharField(max_length=50)),
+                ("day", models.DateField()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="dailycollectionfact",
+            constraint=models.UniqueConstraint(
+                fields=("day", "zone", "company", "waste_type", "status"),
+                name="reports_coll_fact_unique",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="dailycomplaintfact",
+            constraint=models.UniqueConstraint(
+                fields=("day", "zone", "company", "report_type", "status"),
+                name="reports_compl_fact_unique",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="dailyfactlock",
+            constraint=models.UniqueConstraint(
+                fields=("table", "day"), name="reports_fact_lock_unique"
+            ),
+        ),
+    ]
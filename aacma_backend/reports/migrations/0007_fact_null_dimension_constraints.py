@@ -0,0 +1,82 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:51
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def drop_duplicate_facts(apps, schema_editor):
+    # The constraint added in 0006 treats null zones and companies as
+    # distinct, so such rows may still be stored twice. Each copy is a full
+    # recount of its day; GROUP BY puts nulls together, so keep the newest.
+    for model_name, dimensions in (
+        ("DailyCollectionFact", ("day", "zone", "company", "waste_type", "status")),
+        ("DailyComplaintFact", ("day", "zone", "company", "report_type", "status")),
+    ):
+        model = apps.get_model("reports", model_name)
+        keep = (
+            model.objects.values(*dimensions)
+            .annotate(keep=Max("id"))
+            .values_list("keep", flat=True)
+        )
+        model.objects.exclude(id__in=list(keep)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("companies", "0001_initial"),
+        ("reports", "0006_daily_fact_locks"),
+        ("zones", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_facts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="dailycollectionfact",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("zone__isnull", True)),
+                fields=("day", "company", "waste_type", "status"),
+                name="reports_coll_fact_unique_no_zone",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="dailycollectionfact",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("company__isnull", True)),
+                fields=("day", "zone", "waste_type", "status"),
+                name="reports_coll_fact_unique_no_company",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="dailycollectionfact",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("company__isnull", True), ("zone__isnull", True)),
+                fields=("day", "waste_type", "status"),
+                name="reports_coll_fact_unique_no_dims",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="dailycomplaintfact",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("zone__isnull", True)),
+                fields=("day", "company", "report_type", "status"),
+                name="reports_compl_fact_unique_no_zone",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="dailycomplaintfact",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("company__isnull", True)),
+                fields=("day", "zone", "report_type", "status"),
+                name="reports_compl_fact_unique_no_company",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="dailycomplaintfact",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("company__isnull", True), ("zone__isnull", True)),
+                fields=("day", "report_type", "status"),
+                name="reports_compl_fact_unique_no_dims",
+            ),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:53
+
+from django.db import migrations, models
+from django.db.models import Count
+
+from reports.sketch import DDSketch
+
+
+def merge_duplicate_sketches(apps, schema_editor):
+    # Concurrent first observations of a key could each create a row; every
+    # row holds different observations, so merge them into the oldest.
+    LatencySketch = apps.get_model("reports", "LatencySketch")
+    keys = (
+        LatencySketch.objects.values("metric", "day", "company", "zone")
+        .annotate(rows=Count("id"))
+        .filter(rows__gt=1)
+    )
+    for key in list(keys):
+        del key["rows"]
+        rows = list(LatencySketch.objects.filter(**key).order_by("id"))
+        merged = DDSketch()
+        for row in rows:
+            if row.sketch:
+                merged.merge(DDSketch.from_dict(row.sketch))
+        keep = rows[0]
+        keep.sketch = merged.to_dict()
+        keep.count = merged.count
+        keep.save()
+        LatencySketch.objects.filter(id__in=[row.id for row in rows[1:]]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("companies", "0001_initial"),
+        ("reports", "0007_fact_null_dimension_constraints"),
+        ("zones", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_sketches, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="latencysketch",
+            constraint=models.UniqueConstraint(
+                fields=("metric", "day", "company", "zone"),
+                name="reports_latency_unique",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="latencysketch",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("zone__isnull", True)),
+                fields=("metric", "day", "company"),
+                name="reports_latency_unique_no_zone",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="latencysketch",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("company__isnull", True)),
+                fields=("metric", "day", "zone"),
+                name="reports_latency_unique_no_company",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="latencysketch",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("company__isnull", True), ("zone__isnull", True)),
+                fields=("metric", "day"),
+                name="reports_latency_unique_no_dims",
+            ),
+        ),
+    ]
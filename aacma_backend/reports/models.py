@@ -119,3 +119,204 @@ class DailyCompanyReport(models.Model):
     def __str__(self) -> str:
         return f"{self.company} {self.report_date}"
 
+
+class DailyCollectionFact(models.Model):
+    """
+    Daily rollup of collection requests per (zone, company, waste type, status).
+
+    Dimensions come from the request as it is now (its own zone, not the
+    resident's). Each measure is bucketed
+    by its own date: ``requests_created`` by ``created_at``,
+    ``requests_completed`` and ``completion_seconds_sum`` by ``collected_at``,
+    and ``collected_weight_kg`` by the collection record's ``collected_at``.
+    Maintained by ``reports.facts``.
+    """
+
+    id = models.AutoField(primary_key=True)
+    day = models.DateField()
+    zone = models.ForeignKey("zones.Zone", on_delete=models.CASCADE, null=True, related_name="+")
+    company = models.ForeignKey(
+        "companies.WasteCompany", on_delete=models.CASCADE, null=True, related_name="+"
+    )
+    waste_type = models.CharField(max_length=20)
+    status = models.CharField(max_length=20)
+    requests_created = models.PositiveIntegerField(default=0)
+    requests_completed = models.PositiveIntegerField(default=0)
+    collected_weight_kg = models.FloatField(default=0)
+    completion_seconds_sum = models.FloatField(default=0)
+
+    class Meta:
+        ordering = ["-day"]
+        indexes = [models.Index(fields=["day"], name="reports_coll_fact_day_idx")]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "zone", "company", "waste_type", "status"], name="reports_coll_fact_unique"
+            ),
+            # NULLs are distinct in the constraint above.
+            models.UniqueConstraint(
+                fields=["day", "company", "waste_type", "status"],
+                condition=models.Q(zone__isnull=True),
+                name="reports_coll_fact_unique_no_zone",
+            ),
+            models.UniqueConstraint(
+                fields=["day", "zone", "waste_type", "status"],
+                condition=models.Q(company__isnull=True),
+                name="reports_coll_fact_unique_no_company",
+            ),
+            models.UniqueConstraint(
+                fields=["day", "waste_type", "status"],
+                condition=models.Q(zone__isnull=True, company__isnull=True),
+                name="reports_coll_fact_unique_no_dims",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.day} {self.waste_type} {self.status}"
+
+
+class DailyComplaintFact(models.Model):
+    """
+    Daily rollup of waste reports per (zone, company, report type, status).
+
+    ``reports_count`` is bucketed by ``reported_at``; ``resolved_count`` and
+    ``resolution_seconds_sum`` by ``resolved_at``.
+    """
+
+    id = models.AutoField(primary_key=True)
+    day = models.DateField()
+    zone = models.ForeignKey("zones.Zone", on_delete=models.CASCADE, null=True, related_name="+")
+    company = models.ForeignKey(
+        "companies.WasteCompany", on_delete=models.CASCADE, null=True, related_name="+"
+    )
+    report_type = models.CharField(max_length=30)
+    status = models.CharField(max_length=20)
+    reports_count = models.PositiveIntegerField(default=0)
+    resolved_count = models.PositiveIntegerField(default=0)
+    resolution_seconds_sum = models.FloatField(default=0)
+
+    class Meta:
+        ordering = ["-day"]
+        indexes = [models.Index(fields=["day"], name="reports_compl_fact_day_idx")]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "zone", "company", "report_type", "status"], name="reports_compl_fact_unique"
+            ),
+            # NULLs are distinct in the constraint above.
+            models.UniqueConstraint(
+                fields=["day", "company", "report_type", "status"],
+                condition=models.Q(zone__isnull=True),
+                name="reports_compl_fact_unique_no_zone",
+            ),
+            models.UniqueConstraint(
+                fields=["day", "zone", "report_type", "status"],
+                condition=models.Q(company__isnull=True),
+                name="reports_compl_fact_unique_no_company",
+            ),
+            models.UniqueConstraint(
+                fields=["day", "report_type", "status"],
+                condition=models.Q(zone__isnull=True, company__isnull=True),
+                name="reports_compl_fact_unique_no_dims",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.day} {self.report_type} {self.status}"
+
+
+class DailyFactLock(models.Model):
+    """
+    One row per (fact table, day), locked by ``reports.facts`` while it
+    recomputes that day so concurrent refreshes cannot interleave.
+    """
+
+    id = models.AutoField(primary_key=True)
+    table = models.CharField(max_length=50)
+    day = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["table", "day"], name="reports_fact_lock_unique"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.table} {self.day}"
+
+
+class LatencySketch(models.Model):
+    """
+    Daily quantile sketch (``reports.sketch.DDSketch``) of one latency metric
+    per (company, zone), in seconds. Rows merge exactly, so percentiles for
+    any range are answered from the stored sketches.
+    """
+
+    METRICS = [
+        ("completion", "Request completion (created to collected)"),
+        ("resolution", "Complaint resolution (reported to resolved)"),
+    ]
+
+    id = models.AutoField(primary_key=True)
+    metric = models.CharField(max_length=20, choices=METRICS)
+    day = models.DateField()
+    zone = models.ForeignKey("zones.Zone", on_delete=models.CASCADE, null=True, related_name="+")
+    company = models.ForeignKey(
+        "companies.WasteCompany", on_delete=models.CASCADE, null=True, related_name="+"
+    )
+    count = models.PositiveIntegerField(default=0)
+    sketch = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-day"]
+        indexes = [models.Index(fields=["metric", "day"], name="reports_latency_metric_day_idx")]
+        constraints = [
+            models.UniqueConstraint(fields=["metric", "day", "company", "zone"], name="reports_latency_unique"),
+            # NULLs are distinct in the constraint above.
+            models.UniqueConstraint(
+                fields=["metric", "day", "company"],
+                condition=models.Q(zone__isnull=True),
+                name="reports_latency_unique_no_zone",
+            ),
+            models.UniqueConstraint(
+                fields=["metric", "day", "zone"],
+                condition=models.Q(company__isnull=True),
+                name="reports_latency_unique_no_company",
+            ),
+            models.UniqueConstraint(
+                fields=["metric", "day"],
+                condition=models.Q(zone__isnull=True, company__isnull=True),
+                name="reports_latency_unique_no_dims",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.metric} {self.day}"
+
+
+class HeatmapCell(models.Model):
+    """
+    Point count of one layer in one grid cell of the Addis bounding box.
+
+    At zoom ``z`` the box is split into ``2**z`` rows (south to north) by
+    ``2**z`` columns (west to east). Maintained by ``reports.heatmap``.
+    """
+
+    LAYERS = [
+        ("requests", "Collection requests"),
+        ("complaints", "Waste reports"),
+    ]
+
+    id = models.AutoField(primary_key=True)
+    layer = models.CharField(max_length=20, choices=LAYERS)
+    zoom = models.PositiveSmallIntegerField()
+    row = models.PositiveIntegerField()
+    col = models.PositiveIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ["layer", "zoom", "row", "col"]
+        constraints = [
+            models.UniqueConstraint(fields=["layer", "zoom", "row", "col"], name="reports_heatmap_cell_unique"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.layer} z{self.zoom} ({self.row}, {self.col}): {self.count}"
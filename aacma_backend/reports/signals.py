@@ -0,0 +1,131 @@
+"""
+Keep the daily fact tables and the heatmap grid in step with their source rows.
+
+Each fact source instance remembers the fields its fact contribution depends
+on when it is loaded; on save or delete the change in its contribution is
+added to the fact rows once the surrounding transaction commits.
+
+Heatmap sources likewise remember their coordinates; a save that moves a
+point (or a create or delete) adds -1/+1 to the cells involved on commit.
+"""
+from collections import Counter
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+
+from . import facts, heatmap
+from .models import DailyCollectionFact, DailyComplaintFact
+
+# model label -> (fact model, fields read, function of the old and new field values returning the fact changes)
+FACT_SOURCES = {
+    "collections.CollectionRequest": (
+        DailyCollectionFact,
+        facts.COLLECTION_REQUEST_FIELDS,
+        facts.collection_request_changes,
+    ),
+    "collections.CollectionRecord": (
+        DailyCollectionFact,
+        facts.COLLECTION_RECORD_FIELDS,
+        facts.collection_record_changes,
+    ),
+    "complaints.WasteReport": (DailyComplaintFact, facts.COMPLAINT_FIELDS, facts.complaint_changes),
+}
+
+
+def _values(instance, fields) -> dict | None:
+    """The instance's ``fields``, or ``None`` if some were deferred when it was loaded."""
+    values = instance.__dict__
+    if any(field not in values for field in fields):
+        return None
+    return {field: values[field] for field in fields}
+
+
+def _stored_values(instance, fields) -> dict:
+    return type(instance)._base_manager.filter(pk=instance.pk).values(*fields).first() or {}
+
+
+def _queue(model, changes) -> None:
+    changes = {key: amounts for key, amounts in changes.items() if any(amounts.values())}
+    if changes:
+        # Dropped with the transaction (or savepoint) if it rolls back.
+        transaction.on_commit(partial(facts.apply_changes, model, changes), robust=True)
+
+
+def _connect(label, model, fields, changes) -> None:
+    def remember_values(sender, instance, **kwargs):
+        # Unsaved instances do not contribute yet.
+        instance._fact_values = _values(instance, fields) if instance.pk else {}
+
+    def read_deferred(sender, instance, raw=False, **kwargs):
+        # Loaded with .only() or .defer(): read what is stored before it changes.
+        if not raw and instance.pk and getattr(instance, "_fact_values", {}) is None:
+            instance._fact_values = _stored_values(instance, fields)
+
+    def queue_on_save(sender, instance, raw=False, **kwargs):
+        if raw:
+            return
+        values = _values(instance, fields) or _stored_values(instance, fields)
+        _queue(model, changes(getattr(instance, "_fact_values", None) or {}, values))
+        instance._fact_values = values
+
+    def queue_on_delete(sender, instance, **kwargs):
+        _queue(model, changes(getattr(instance, "_fact_values", None) or {}, {}))
+
+    uid = f"reports-facts-{label}"
+    post_init.connect(remember_values, sender=label, weak=False, dispatch_uid=uid)
+    pre_save.connect(read_deferred, sender=label, weak=False, dispatch_uid=uid)
+    pre_delete.connect(read_deferred, sender=label, weak=False, dispatch_uid=uid)
+    post_save.connect(queue_on_save, sender=label, weak=False, dispatch_uid=uid)
+    post_delete.connect(queue_on_delete, sender=label, weak=False, dispatch_uid=uid)
+
+
+for _label, (_model, _fields, _changes) in FACT_SOURCES.items():
+    _connect(_label, _model, _fields, _changes)
+
+
+# model label -> heatmap layer
+HEATMAP_SOURCES = {
+    "collections.CollectionRequest": "requests",
+    "complaints.WasteReport": "complaints",
+}
+
+
+def _point(instance):
+    values = instance.__dict__
+    return values.get("latitude"), values.get("longitude")
+
+
+def _queue_move(layer, old, new) -> None:
+    if old == new:
+        return
+    deltas = Counter(heatmap.cells(*new))
+    deltas.subtract(heatmap.cells(*old))
+    if any(deltas.values()):
+        # Dropped with the transaction (or savepoint) if it rolls back.
+        transaction.on_commit(partial(heatmap.apply_deltas, layer, deltas), robust=True)
+
+
+def _connect_heatmap(label, layer) -> None:
+    def remember_point(sender, instance, **kwargs):
+        # Unsaved instances have not been counted yet.
+        instance._heatmap_point = _point(instance) if instance.pk else (None, None)
+
+    def move_on_save(sender, instance, raw=False, **kwargs):
+        if raw:
+            return
+        point = _point(instance)
+        _queue_move(layer, getattr(instance, "_heatmap_point", (None, None)), point)
+        instance._heatmap_point = point
+
+    def remove_on_delete(sender, instance, **kwargs):
+        _queue_move(layer, getattr(instance, "_heatmap_point", _point(instance)), (None, None))
+
+    uid = f"reports-heatmap-{label}"
+    post_init.connect(remember_point, sender=label, weak=False, dispatch_uid=uid)
+    post_save.connect(move_on_save, sender=label, weak=False, dispatch_uid=uid)
+    post_delete.connect(remove_on_delete, sender=label, weak=False, dispatch_uid=uid)
+
+
+for _label, _layer in HEATMAP_SOURCES.items():
+    _connect_heatmap(_label, _layer)
@@ -0,0 +1,444 @@
+import math
+import random
+from datetime import date, datetime, timedelta
+from unittest import mock
+
+from django.db import IntegrityError, transaction
+from django.db.models.query import QuerySet
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import Role, User
+from companies.models import WasteCompany
+from complaints.models import WasteReport
+from waste_collections.models import ADDIS_BOUNDS, CollectionRecord, CollectionRequest
+from zones.models import Zone
+
+from . import facts, generation, heatmap, latency
+from .models import (
+    DailyCollectionFact,
+    DailyCompanyReport,
+    DailyComplaintFact,
+    HeatmapCell,
+    LatencySketch,
+    PerformanceReport,
+)
+from .sketch import DDSketch
+
+
+def stored_facts(model) -> dict:
+    """Non-empty fact rows as ``{(day, *dimensions): {measure: value}}``."""
+    dimensions = ("day",) + facts.DIMENSIONS[model]
+    measures = [field.attname for field in model._meta.concrete_fields if field.attname not in ("id",) + dimensions]
+    rows = {}
+    for row in model.objects.values(*dimensions, *measures):
+        values = {name: round(row[name], 3) for name in measures}
+        if any(values.values()):
+            rows[tuple(row[name] for name in dimensions)] = values
+    return rows
+
+
+class FactDeltaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = WasteCompany.objects.create(
+            name="Clean City", license_number="L-1", contact_email="a@example.com", contact_phone="1", address="-"
+        )
+        cls.zone = Zone.objects.create(name="Bole", code="BL")
+        cls.resident = User.objects.create_user("resident", password="x", user_type="resident")
+
+    def create_request(self, **fields):
+        return CollectionRequest.objects.create(
+            resident=self.resident,
+            waste_type=fields.pop("waste_type", "general"),
+            preferred_date=date.today(),
+            preferred_time="morning",
+            address="-",
+            **fields,
+        )
+
+    def assert_matches_refresh(self):
+        stored = {model: stored_facts(model) for model in (DailyCollectionFact, DailyComplaintFact)}
+        start, end = facts.source_day_range()
+        facts.refresh_collection_facts(start, end)
+        facts.refresh_complaint_facts(start, end)
+        for model, rows in stored.items():
+            self.assertEqual(rows, stored_facts(model), model.__name__)
+        return stored
+
+    def test_request_and_record_changes(self):
+        now = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            pending = self.create_request(zone=self.zone)
+            moved = self.create_request(status="assigned", assigned_company=self.company)
+            done = self.create_request(status="assigned", assigned_company=self.company, zone=self.zone)
+        with self.captureOnCommitCallbacks(execute=True):
+            CollectionRecord.objects.create(
+                collection_request=done, collected_at=now - timedelta(days=2), actual_weight_kg=12.5
+            )
+            done.status = "completed"
+            done.collected_at = now + timedelta(days=1)
+            done.save()
+        stored = self.assert_matches_refresh()
+        key = (timezone.localdate(now - timedelta(days=2)), self.zone.pk, self.company.pk, "general", "completed")
+        self.assertEqual(stored[DailyCollectionFact][key]["collected_weight_kg"], 12.5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            # Dimension changes move the record's weight along with the request.
+            done.zone = None
+            done.waste_type = "organic"
+            done.save()
+            moved.assigned_company = None
+            moved.status = "pending"
+            moved.save()
+            pending.delete()
+        self.assert_matches_refresh()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            done.delete()
+        self.assert_matches_refresh()
+        self.assertFalse(any(key[2] == self.company.pk for key in stored_facts(DailyCollectionFact)))
+
+    def test_deferred_fields(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            request = self.create_request(zone=self.zone)
+        with self.captureOnCommitCallbacks(execute=True):
+            request = CollectionRequest.objects.only("id", "status").get(pk=request.pk)
+            request.status = "cancelled"
+            request.save()
+        rows = self.assert_matches_refresh()[DailyCollectionFact]
+        self.assertEqual([key[-1] for key in rows], ["cancelled"])
+
+    def test_complaint_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            report = WasteReport.objects.create(
+                resident=self.resident, report_type="other", description="-", location_address="-"
+            )
+            WasteReport.objects.create(
+                resident=self.resident, report_type="late_pickup", description="-", location_address="-"
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            report.status = "resolved"
+            report.assigned_company = self.company
+            report.resolved_at = report.reported_at + timedelta(hours=30)
+            report.save()
+        rows = self.assert_matches_refresh()[DailyComplaintFact]
+        resolved = [values for key, values in rows.items() if key[-1] == "resolved"]
+        self.assertEqual(len(resolved), 2)
+        self.assertEqual(sum(values["resolution_seconds_sum"] for values in resolved), 30 * 3600)
+
+    def test_write_does_not_recount_its_day(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            requests = [self.create_request() for _ in range(20)]
+        with self.captureOnCommitCallbacks() as callbacks:
+            requests[0].status = "cancelled"
+            requests[0].save()
+        # A savepoint around the day lock (create + select), an update of the
+        # pending row and a create of the cancelled one; the rest of the day
+        # is not read.
+        fact_changes = [callback for callback in callbacks if getattr(callback, "func", None) is facts.apply_changes]
+        with self.assertNumQueries(7):
+            for callback in fact_changes:
+                callback()
+        for callback in callbacks:
+            if callback not in fact_changes:
+                callback()
+        self.assert_matches_refresh()
+
+
+class FactConstraintTests(TestCase):
+    def test_null_dimensions_are_unique(self):
+        zone = Zone.objects.create(name="Bole", code="BL")
+        for dimensions in ({}, {"zone": zone}):
+            DailyCollectionFact.objects.create(day=date.today(), waste_type="general", status="pending", **dimensions)
+            with self.subTest(**dimensions), self.assertRaises(IntegrityError), transaction.atomic():
+                DailyCollectionFact.objects.create(
+                    day=date.today(), waste_type="general", status="pending", **dimensions
+                )
+
+
+class DDSketchTests(SimpleTestCase):
+    def sketch(self, values, relative_accuracy=0.01):
+        sketch = DDSketch(relative_accuracy)
+        for value in values:
+            sketch.add(value)
+        return sketch
+
+    def assert_quantiles_within_accuracy(self, sketch, values):
+        ordered = sorted(values)
+        for q in (0.0, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99, 1.0):
+            actual = ordered[math.floor(q * (len(ordered) - 1))]
+            estimate = sketch.quantile(q)
+            if actual == 0:
+                self.assertEqual(estimate, 0.0)
+            else:
+                self.assertLessEqual(abs(estimate - actual) / actual, sketch.relative_accuracy + 1e-12, q)
+
+    def test_quantiles_within_relative_accuracy(self):
+        rng = random.Random(3)
+        values = [rng.lognormvariate(3, 1.5) for _ in range(20_000)] + [0.0] * 500
+        self.assert_quantiles_within_accuracy(self.sketch(values), values)
+
+    def test_merge_equals_one_sketch_of_all_values(self):
+        rng = random.Random(4)
+        days = [[rng.expovariate(1 / 40) for _ in range(rng.randint(0, 3000))] for _ in range(10)]
+        days[3] += [0.0, 0.0]
+        merged = DDSketch()
+        for values in days:
+            merged.merge(self.sketch(values))
+        everything = [value for values in days for value in values]
+        whole = self.sketch(everything)
+        self.assertEqual(merged.bins, whole.bins)
+        self.assertEqual(
+            (merged.zero_count, merged.count, merged.min, merged.max),
+            (whole.zero_count, whole.count, whole.min, whole.max),
+        )
+        self.assertAlmostEqual(merged.sum, whole.sum, places=6)
+        self.assertEqual([merged.quantile(q / 20) for q in range(21)], [whole.quantile(q / 20) for q in range(21)])
+        self.assert_quantiles_within_accuracy(merged, everything)
+
+    def test_merge_through_stored_dicts(self):
+        first, second = self.sketch([1.5, 20.0, 300.0]), self.sketch([0.0, 7.0])
+        merged = DDSketch.from_dict(first.to_dict())
+        merged.merge(DDSketch.from_dict(second.to_dict()))
+        merged.merge(DDSketch.from_dict(DDSketch().to_dict()))
+        self.assertEqual(merged.to_dict(), self.sketch([1.5, 20.0, 300.0, 0.0, 7.0]).to_dict())
+
+    def test_merge_rejects_other_accuracy(self):
+        with self.assertRaises(ValueError):
+            DDSketch(0.01).merge(DDSketch(0.02))
+
+    def test_empty_sketch(self):
+        self.assertIsNone(DDSketch().quantile(0.5))
+        self.assertEqual(self.sketch([5.0]).quantile(0.99), 5.0)
+
+
+class LatencyRecordTests(TestCase):
+    def test_one_row_per_key(self):
+        zone = Zone.objects.create(name="Bole", code="BL")
+        at = timezone.now()
+        for zone_id in (None, None, zone.pk, zone.pk):
+            latency.record("completion", at, None, zone_id, 3600)
+        self.assertEqual(dict(LatencySketch.objects.values_list("zone_id", "count")), {None: 2, zone.pk: 2})
+
+    def test_created_concurrently(self):
+        at = timezone.now()
+        latency.record("resolution", at, None, None, 60)
+        # Another transaction created the row between the select and the create.
+        with mock.patch.object(QuerySet, "first", return_value=None):
+            latency.record("resolution", at, None, None, 120)
+        row = LatencySketch.objects.get()
+        self.assertEqual(row.count, 2)
+        self.assertEqual(DDSketch.from_dict(row.sketch).max, 120)
+
+    def test_null_dimensions_are_unique(self):
+        LatencySketch.objects.create(metric="completion", day=date.today())
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            LatencySketch.objects.create(metric="completion", day=date.today())
+
+
+class PerformanceReportGenerationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.resident = User.objects.create_user("resident", password="x", user_type="resident")
+        cls.director = User.objects.create_user("director", password="x", user_type="central_authority")
+        cls.active, cls.idle = (cls.create_company(n, "approved") for n in (1, 2))
+        january = timezone.make_aware(datetime(2026, 1, 10, 9))
+        # Created and collected 5 hours later, rated 4; and due but never collected.
+        done = cls.create_request(cls.active, january, collected_at=january + timedelta(hours=5), status="completed")
+        CollectionRecord.objects.create(
+            collection_request=done, collected_at=done.collected_at, actual_weight_kg=40, rating=4
+        )
+        cls.create_request(cls.active, january, status="assigned")
+        report = WasteReport.objects.create(
+            resident=cls.resident,
+            report_type="other",
+            description="-",
+            location_address="-",
+            assigned_company=cls.active,
+            status="resolved",
+            resolved_at=january + timedelta(days=1),
+        )
+        WasteReport.objects.filter(pk=report.pk).update(reported_at=january)
+        DailyCompanyReport.objects.create(
+            company=cls.active, report_date=date(2026, 1, 10), recycled_kg=12.5, status="approved"
+        )
+        start, end = facts.source_day_range()
+        facts.refresh_collection_facts(start, end)
+        facts.refresh_complaint_facts(start, end)
+
+    @classmethod
+    def create_company(cls, number, status):
+        return WasteCompany.objects.create(
+            name=f"Company {number}",
+            license_number=f"L-{number}",
+            contact_email="a@example.com",
+            contact_phone="1",
+            address="-",
+            status=status,
+        )
+
+    @classmethod
+    def create_request(cls, company, created_at, **fields):
+        request = CollectionRequest.objects.create(
+            resident=cls.resident,
+            waste_type="general",
+            preferred_date=created_at.date(),
+            preferred_time="morning",
+            address="-",
+            assigned_company=company,
+            **fields,
+        )
+        CollectionRequest.objects.filter(pk=request.pk).update(created_at=created_at)
+        return request
+
+    def test_period_bounds(self):
+        anchor = date(2026, 2, 18)
+        expected = {
+            "daily": (anchor, anchor),
+            "weekly": (date(2026, 2, 16), date(2026, 2, 22)),
+            "monthly": (date(2026, 2, 1), date(2026, 2, 28)),
+            "quarterly": (date(2026, 1, 1), date(2026, 3, 31)),
+            "yearly": (date(2026, 1, 1), date(2026, 12, 31)),
+        }
+        for period, bounds in expected.items():
+            self.assertEqual(generation.period_bounds(period, anchor), bounds, period)
+        self.assertEqual(generation.period_bounds("quarterly", date(2026, 11, 30))[1], date(2026, 12, 31))
+        with self.assertRaises(ValueError):
+            generation.period_bounds("hourly", anchor)
+
+    def test_reports(self):
+        reports = generation.generate_performance_reports("monthly", date(2026, 1, 1))
+        reports = {report.company_id: report for report in reports}
+        self.assertEqual(set(reports), {self.active.pk, self.idle.pk})
+        report = reports[self.active.pk]
+        self.assertEqual((report.start_date, report.end_date), (date(2026, 1, 1), date(2026, 1, 31)))
+        self.assertEqual(
+            (
+                report.total_collections,
+                report.completed_collections,
+                report.missed_collections,
+                report.average_response_time_hours,
+                report.total_waste_collected_kg,
+                report.recycled_waste_kg,
+                report.customer_satisfaction_rating,
+                report.complaints_received,
+                report.complaints_resolved,
+            ),
+            (2, 1, 1, 5.0, 40.0, 12.5, 4.0, 1, 1),
+        )
+        self.assertEqual(reports[self.idle.pk].total_collections, 0)
+        # Regenerating replaces the period's reports.
+        generation.generate_performance_reports("monthly", date(2026, 1, 20))
+        self.assertEqual(PerformanceReport.objects.count(), 2)
+
+    def test_queries_do_not_grow_with_companies(self):
+        with self.assertNumQueries(10) as first:
+            generation.generate_performance_reports("yearly", date(2026, 1, 1))
+        for number in range(3, 30):
+            company = self.create_company(number, "approved")
+            self.create_request(company, timezone.make_aware(datetime(2026, 3, 1, 9)))
+        with self.assertNumQueries(len(first.captured_queries)):
+            reports = generation.generate_performance_reports("yearly", date(2026, 1, 1))
+        self.assertEqual(len(reports), 29)
+
+    def test_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.director)
+        response = client.post("/api/reports/company/generate/", {"period": "monthly", "date": "2026-01-15"})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(client.post("/api/reports/company/generate/", {"period": "hourly"}).status_code, 400)
+        self.assertEqual(client.post("/api/reports/company/generate/", {"date": "15/01/2026"}).status_code, 400)
+        client.force_authenticate(self.resident)
+        self.assertEqual(client.post("/api/reports/company/generate/", {"period": "daily"}).status_code, 403)
+
+
+class HeatmapTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.resident = User.objects.create_user("resident", password="x", user_type="resident")
+
+    def create_request(self, lat, lng):
+        return CollectionRequest.objects.create(
+            resident=self.resident,
+            waste_type="general",
+            preferred_date=date.today(),
+            preferred_time="morning",
+            address="-",
+            latitude=lat,
+            longitude=lng,
+        )
+
+    def stored_cells(self, layer="requests") -> dict:
+        cells = HeatmapCell.objects.filter(layer=layer, count__gt=0).values_list("zoom", "row", "col", "count")
+        return {(zoom, row, col): count for zoom, row, col, count in cells}
+
+    def assert_matches_rebuild(self, layer="requests"):
+        stored = self.stored_cells(layer)
+        heatmap.rebuild(layer)
+        self.assertEqual(stored, self.stored_cells(layer))
+        return stored
+
+    def test_cells(self):
+        south, west, north, east = ADDIS_BOUNDS
+        self.assertEqual(heatmap.cell(2, south, west), (0, 0))
+        # The north and east edges fall in the last cell.
+        self.assertEqual(heatmap.cell(2, north, east), (3, 3))
+        self.assertEqual(heatmap.cell(3, 8.96, 38.82), (4, 4))
+        self.assertEqual(len(heatmap.cells(9.0, 38.75)), len(heatmap.ZOOM_LEVELS))
+        self.assertEqual(heatmap.cells(9.5, 38.75), [])
+        self.assertEqual(heatmap.cells(None, None), [])
+
+    def test_counts_follow_creates_moves_and_deletes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.create_request(9.0, 38.75)
+            self.create_request(9.0, 38.75)
+            moved = self.create_request(8.85, 38.65)
+            deleted = self.create_request(8.9, 38.9)
+            self.create_request(9.5, 38.75)  # outside the box
+        with self.captureOnCommitCallbacks(execute=True):
+            moved.latitude = 9.05
+            moved.save()
+            deleted.delete()
+        stored = self.assert_matches_rebuild()
+        self.assertEqual(stored[(heatmap.MAX_ZOOM, *heatmap.cell(heatmap.MAX_ZOOM, 9.0, 38.75))], 2)
+        self.assertEqual(sum(count for (zoom, _, _), count in stored.items() if zoom == heatmap.MIN_ZOOM), 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            first.latitude = None
+            first.save()
+        self.assertEqual(sum(count for (zoom, _, _), count in self.assert_matches_rebuild().items() if zoom == 2), 2)
+
+    def test_rolled_back_points_are_not_counted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.create_request(9.0, 38.75)
+                    raise IntegrityError
+            except IntegrityError:
+                pass
+            self.create_request(8.9, 38.7)
+        self.assertEqual(sum(self.assert_matches_rebuild().values()), len(heatmap.ZOOM_LEVELS))
+
+    def test_endpoint(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            WasteReport.objects.create(
+                resident=self.resident,
+                report_type="other",
+                description="-",
+                location_address="-",
+                latitude=8.96,
+                longitude=38.82,
+            )
+        role = Role.objects.create(name="Analytics", slug="analytics", level="Strategic", authority_type="Central")
+        client = APIClient()
+        client.force_authenticate(
+            User.objects.create_user("analyst", password="x", user_type="central_authority", role=role)
+        )
+        response = client.get("/api/central/role/analytics/heatmap/", {"layer": "complaints", "zoom": 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["rows"], response.data["cells"]), (8, [[4, 4, 1]]))
+        for params in ({"layer": "trucks"}, {"zoom": 9}, {"zoom": "near"}):
+            with self.subTest(**params):
+                self.assertEqual(client.get("/api/central/role/analytics/heatmap/", params).status_code, 400)
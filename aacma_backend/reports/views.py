@@ -1,13 +1,19 @@
+from datetime import date
+
 from django.utils import timezone
 from rest_framework import viewsets, permissions, status
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 
+from .generation import PERIODS, generate_performance_reports
 from .models import PerformanceReport, CityWideReport, DailyCompanyReport
 from .serializers import PerformanceReportSerializer, CityWideReportSerializer, DailyCompanyReportSerializer
 from accounts.permissions import IsCentralAuthority, IsWasteCompany, IsSupervisor
 from companies.models import WasteCompany
+from jobs.queue import enqueue
+from jobs.serializers import JobSerializer
 
 
 class PerformanceReportViewSet(viewsets.ModelViewSet):
@@ -18,6 +24,25 @@ class PerformanceReportViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(generated_by=self.request.user)
 
+    @action(detail=False, methods=["post"], permission_classes=[permissions.IsAuthenticated, IsCentralAuthority])
+    def generate(self, request):
+        """
+        Generate every company's report for the ``period`` containing ``date``
+        (default today), replacing existing reports for that period.
+        """
+        period = request.data.get("period", "monthly")
+        if period not in PERIODS:
+            return Response(
+                {"detail": f"period must be one of {', '.join(PERIODS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            anchor = date.fromisoformat(request.data["date"]) if request.data.get("date") else timezone.localdate()
+        except (TypeError, ValueError):
+            return Response({"detail": "date must be YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+        reports = generate_performance_reports(period, anchor, user=request.user)
+        return Response(self.get_serializer(reports, many=True).data, status=status.HTTP_201_CREATED)
+
 
 class CityWideReportViewSet(viewsets.ModelViewSet):
     queryset = CityWideReport.objects.all()
@@ -30,12 +55,26 @@ class CityWideReportViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=["post"])
     def generate(self, request):
         """
-        Placeholder for async heavy analytics generation.
+        Queue generation of a city-wide report for ``period_start`` to
+        ``period_end``. Returns 202 with the job; poll ``/api/jobs/<id>/``
+        until it succeeds, its result then holds the new ``report_id``.
         """
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        report = serializer.save(generated_by=request.user)
-        return Response(self.get_serializer(report).data, status=status.HTTP_201_CREATED)
+        job = enqueue(
+            "reports.citywide",
+            {
+                "title": serializer.validated_data["title"],
+                "period_start": serializer.validated_data["period_start"].isoformat(),
+                "period_end": serializer.validated_data["period_end"].isoformat(),
+            },
+            user=request.user,
+        )
+        return Response(
+            JobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={"Location": reverse("jobs-detail", args=[job.id], request=request)},
+        )
 
 
 class DailyCompanyReportViewSet(viewsets.ModelViewSet):
@@ -0,0 +1,136 @@
+"""
+Planned and driven route distances.
+
+``Route.planned_distance_km`` follows the stops in ``sequence_number`` order
+and is recomputed when a stop changes. ``Route.total_distance_km`` is the
+path of the assigned vehicle's location history between the route's actual
+start and end. It grows incrementally as fixes are stored
+(``fleet.telemetry.pings_stored``): the new fixes are measured from the last
+one counted (``distance_through``). The first fixes of a route, fixes that
+arrive out of order, or a concurrent update fall back to measuring the
+whole route again, as does completing a route. A route with no fixes in its
+window keeps whatever ``total_distance_km`` it already has (for example a
+value entered before distances were measured).
+
+Incremental updates use ``QuerySet.update`` and do not invalidate the cached
+analytics; those pick the new totals up within their TTL.
+"""
+from __future__ import annotations
+
+from django.db.models import F, Q
+
+from fleet.geo import path_km
+from fleet.models import VehicleLocationPing
+
+from .models import Route, RouteStop
+
+
+def planned_km(route_id: int) -> float:
+    stops = RouteStop.objects.filter(route_id=route_id).order_by("sequence_number", "id")
+    coordinates = list(stops.values_list("latitude", "longitude"))
+    return path_km([lat for lat, _ in coordinates], [lng for _, lng in coordinates])
+
+
+def update_planned(route_id: int) -> float:
+    distance = planned_km(route_id)
+    Route.objects.filter(pk=route_id).update(planned_distance_km=distance)
+    return distance
+
+
+def _pings(route: Route):
+    pings = VehicleLocationPing.objects.filter(
+        vehicle_id=route.assigned_vehicle_id, recorded_at__gte=route.actual_start_time
+    )
+    if route.actual_end_time:
+        pings = pings.filter(recorded_at__lte=route.actual_end_time)
+    return pings.order_by("recorded_at")
+
+
+def measure_driven(route: Route) -> bool:
+    """
+    Set ``route``'s driven distance from its whole history (not saved).
+    Returns False, leaving the route as it was, when there are no fixes.
+    """
+    if not route.assigned_vehicle_id or not route.actual_start_time:
+        return False
+    fixes = list(_pings(route).values_list("latitude", "longitude", "recorded_at"))
+    if not fixes:
+        return False
+    route.total_distance_km = path_km([fix[0] for fix in fixes], [fix[1] for fix in fixes])
+    route.distance_through = fixes[-1][2]
+    return True
+
+
+def rebuild_driven(route: Route) -> bool:
+    if not measure_driven(route):
+        return False
+    Route.objects.filter(pk=route.pk).update(
+        total_distance_km=route.total_distance_km, distance_through=route.distance_through
+    )
+    return True
+
+
+def record_pings(vehicle_id: int, pings: list) -> int:
+    """
+    Add newly stored ``VehicleLocationPing`` objects to the driven distance
+    of the vehicle's routes that cover them. Returns the routes updated.
+    """
+    if not pings:
+        return 0
+    pings = sorted(pings, key=lambda ping: ping.recorded_at)
+    first, last = pings[0].recorded_at, pings[-1].recorded_at
+    routes = Route.objects.filter(
+        Q(actual_end_time__isnull=True) | Q(actual_end_time__gte=first),
+        assigned_vehicle_id=vehicle_id,
+        actual_start_time__lte=last,
+    ).only("id", "assigned_vehicle_id", "actual_start_time", "actual_end_time", "distance_through")
+    updated = 0
+    for route in routes:
+        new = [
+            ping
+            for ping in pings
+            if ping.recorded_at >= route.actual_start_time
+            and (route.actual_end_time is None or ping.recorded_at <= route.actual_end_time)
+        ]
+        if not new:
+            continue
+        through = route.distance_through
+        if through is None or new[0].recorded_at <= through:
+            # First fixes replace any legacy total rather than adding to it.
+            rebuild_driven(route)
+            updated += 1
+            continue
+        lats = [ping.latitude for ping in new]
+        lngs = [ping.longitude for ping in new]
+        anchor = (
+            VehicleLocationPing.objects.filter(vehicle_id=vehicle_id, recorded_at=through)
+            .values_list("latitude", "longitude")
+            .first()
+        )
+        if anchor:
+            lats.insert(0, anchor[0])
+            lngs.insert(0, anchor[1])
+        # Only move forward from the state measured against; otherwise start over.
+        if not Route.objects.filter(pk=route.pk, distance_through=through).update(
+            total_distance_km=F("total_distance_km") + path_km(lats, lngs),
+            distance_through=new[-1].recorded_at,
+        ):
+            rebuild_driven(Route.objects.get(pk=route.pk))
+        updated += 1
+    return updated
+
+
+def rebuild(queryset=None) -> int:
+    """
+    Recompute both distances of the routes in ``queryset`` (default: all).
+    Driven distances are only replaced for routes with fixes to measure.
+    """
+    routes = (queryset if queryset is not None else Route.objects.all()).only(
+        "id", "assigned_vehicle_id", "actual_start_time", "actual_end_time"
+    )
+    count = 0
+    for route in routes.iterator():
+        update_planned(route.pk)
+        rebuild_driven(route)
+        count += 1
+    return count
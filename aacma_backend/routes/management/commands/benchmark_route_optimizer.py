@@ -0,0 +1,57 @@
+import math
+import random
+import statistics
+
+from django.core.management.base import BaseCommand
+
+from routes import optimizer
+from waste_collections.models import ADDIS_BOUNDS
+
+
+def synthetic_stops(count: int, rng: random.Random) -> list[tuple[float, float]]:
+    """Stops clustered around a few neighbourhood centres, as collection rounds are."""
+    south, west, north, east = ADDIS_BOUNDS
+    centres = [(rng.uniform(south, north), rng.uniform(west, east)) for _ in range(max(1, count // 40))]
+    stops = []
+    for _ in range(count):
+        lat, lng = rng.choice(centres)
+        stops.append((lat + rng.gauss(0, 0.01), lng + rng.gauss(0, 0.01)))
+    return stops
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the route stop optimizer on synthetic routes: tour length of "
+        "the given order, nearest neighbour and 2-opt/Or-opt, and runtime."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="50,200,1000", help="Comma-separated stop counts")
+        parser.add_argument("--routes", type=int, default=5, help="Routes per size")
+        parser.add_argument("--time-budget-ms", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        budget = options["time_budget_ms"] / 1000
+        self.stdout.write(
+            f"{'stops':>6} {'given km':>10} {'NN km':>10} {'opt km':>10} {'vs given':>9} "
+            f"{'vs NN':>7} {'ms median':>10} {'ms max':>8} {'converged':>9}"
+        )
+        for size in (int(value) for value in options["sizes"].split(",")):
+            given, nearest, optimized, runtimes, converged = [], [], [], [], 0
+            for _ in range(options["routes"]):
+                stops = synthetic_stops(size, rng)
+                depot = (rng.uniform(ADDIS_BOUNDS[0], ADDIS_BOUNDS[2]), rng.uniform(ADDIS_BOUNDS[1], ADDIS_BOUNDS[3]))
+                xy = optimizer._project([depot] + stops, depot)
+                given.append(sum(math.dist(a, b) for a, b in zip(xy, xy[1:] + xy[:1])))
+                _, stats = optimizer.solve(stops, depot, budget)
+                nearest.append(stats["nearest_neighbour_km"])
+                optimized.append(stats["optimized_km"])
+                runtimes.append(stats["runtime_ms"])
+                converged += stats["runtime_ms"] < options["time_budget_ms"]
+            mean_given, mean_nn, mean_opt = map(statistics.mean, (given, nearest, optimized))
+            self.stdout.write(
+                f"{size:>6} {mean_given:>10.1f} {mean_nn:>10.1f} {mean_opt:>10.1f} "
+                f"{(1 - mean_opt / mean_given) * 100:>8.1f}% {(1 - mean_opt / mean_nn) * 100:>6.1f}% "
+                f"{statistics.median(runtimes):>10.1f} {max(runtimes):>8.1f} {converged:>5}/{options['routes']}"
+            )
@@ -0,0 +1,179 @@
+import gc
+import random
+import time
+import tracemalloc
+from datetime import date, time as clock, timedelta
+from functools import partial
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from aacma.benchmarking import benchmark_database
+from companies.models import WasteCompany
+from fleet.models import Vehicle
+from routes import utilization
+from routes.models import Route
+from zones.models import Zone
+
+
+def orm_loop(queryset, keep_routes=True):
+    """
+    The previous implementation: one Route and Vehicle instance per row.
+
+    With ``keep_routes=False`` the rows are streamed in chunks and each
+    route's entry is built and dropped, so only the vehicle totals stay in
+    memory.
+    """
+    vehicle_utilization = {}
+    route_utilization = []
+    routes = queryset.select_related("assigned_vehicle")
+    if not keep_routes:
+        routes = routes.iterator(chunk_size=2000)
+    for route in routes:
+        duration_hours = 0.0
+        if route.actual_start_time and route.actual_end_time:
+            duration_hours = round((route.actual_end_time - route.actual_start_time).total_seconds() / 3600, 2)
+        row = {
+            "route_id": route.id,
+            "route_name": route.name,
+            "status": route.status,
+            "vehicle_id": route.assigned_vehicle_id,
+            "distance_km": float(route.total_distance_km or 0),
+            "actual_start_time": route.actual_start_time.isoformat() if route.actual_start_time else None,
+            "actual_end_time": route.actual_end_time.isoformat() if route.actual_end_time else None,
+            "duration_hours": duration_hours,
+        }
+        if keep_routes:
+            route_utilization.append(row)
+        if route.assigned_vehicle_id:
+            bucket = vehicle_utilization.setdefault(
+                route.assigned_vehicle_id,
+                {
+                    "vehicle_id": route.assigned_vehicle_id,
+                    "plate_number": route.assigned_vehicle.plate_number if route.assigned_vehicle else None,
+                    "total_routes": 0,
+                    "total_distance_km": 0.0,
+                    "total_active_hours": 0.0,
+                },
+            )
+            bucket["total_routes"] += 1
+            bucket["total_distance_km"] += float(route.total_distance_km or 0)
+            bucket["total_active_hours"] += duration_hours
+    return {
+        "vehicle_utilization": list(vehicle_utilization.values()),
+        "route_utilization": route_utilization,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the ORM-object route utilization loop with the columnar engine in "
+        "routes.utilization on a synthetic route table: wall time, peak Python memory "
+        "and, with --window-days, a time-windowed query. Outputs are compared on the "
+        "first --parity-routes routes. The ORM loop's memory is measured with its "
+        "route rows streamed and dropped, so its peak is a lower bound. Runs against "
+        "a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        # Each route costs the ORM loop several KiB of objects and tracemalloc
+        # adds more, so millions of routes need several GiB.
+        parser.add_argument("--routes", type=int, default=200_000)
+        parser.add_argument("--vehicles", type=int, default=500)
+        parser.add_argument("--window-days", type=int, default=30)
+        parser.add_argument("--parity-routes", type=int, default=20_000)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self._seed(options["routes"], options["vehicles"])
+            everything = Route.objects.all()
+            window_start = date.today() - timedelta(days=options["window_days"])
+            window = Route.objects.filter(scheduled_date__gte=window_start)
+
+            sample_ids = everything.order_by("id").values_list("id", flat=True)[: options["parity_routes"]]
+            sample = everything.filter(id__lte=max(sample_ids, default=0))
+            if self._normalise(orm_loop(sample)) != self._normalise(utilization.compute(sample)):
+                raise CommandError("Columnar engine output differs from the ORM loop.")
+
+            orm_streamed = partial(orm_loop, keep_routes=False)
+            self.stdout.write(f"{'case':<28} {'seconds':>9} {'peak MiB':>10}")
+            for label, func, memory_func, queryset in (
+                ("ORM loop, all routes", orm_loop, orm_streamed, everything),
+                ("columnar, all routes", utilization.compute, utilization.compute, everything),
+                (f"ORM loop, last {options['window_days']} days", orm_loop, orm_streamed, window),
+                (f"columnar, last {options['window_days']} days", utilization.compute, utilization.compute, window),
+            ):
+                seconds, peak = self._measure(func, memory_func, queryset)
+                self.stdout.write(f"{label:<28} {seconds:>9.2f} {peak / 2**20:>10.1f}")
+            self.stdout.write("(ORM loop memory: route rows streamed and dropped, so a lower bound.)")
+
+    def _measure(self, func, memory_func, queryset):
+        gc.collect()
+        start = time.perf_counter()
+        func(queryset)
+        seconds = time.perf_counter() - start
+        gc.collect()
+        # Memory is measured in a second run: tracemalloc slows allocation down.
+        tracemalloc.start()
+        memory_func(queryset)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return seconds, peak
+
+    def _normalise(self, result):
+        return (
+            sorted(result["route_utilization"], key=lambda row: row["route_id"]),
+            sorted(
+                (
+                    {**row, "total_distance_km": round(row["total_distance_km"], 6),
+                     "total_active_hours": round(row["total_active_hours"], 6)}
+                    for row in result["vehicle_utilization"]
+                ),
+                key=lambda row: row["vehicle_id"],
+            ),
+        )
+
+    def _seed(self, count, vehicles, batch_size=10_000):
+        call_command("seed_data", stdout=StringIO())
+        call_command("seed_waste_company_sample", stdout=StringIO())
+        company = WasteCompany.objects.first()
+        zone = Zone.objects.first()
+        Vehicle.objects.bulk_create(
+            [
+                Vehicle(
+                    plate_number=f"BENCH-{index}",
+                    vehicle_type=Vehicle.VEHICLE_TYPES[0][0],
+                    capacity_kg=5000,
+                    company=company,
+                )
+                for index in range(vehicles)
+            ]
+        )
+        vehicle_ids = list(Vehicle.objects.values_list("id", flat=True)) + [None]
+        self.stdout.write(f"Seeding {count:,} routes...")
+        rng = random.Random(0)
+        today = date.today()
+        now = timezone.now()
+        statuses = [value for value, _ in Route.STATUS_CHOICES]
+        for offset in range(0, count, batch_size):
+            routes = []
+            for index in range(offset, min(offset + batch_size, count)):
+                started = now - timedelta(days=rng.randint(0, 365), hours=rng.randint(0, 12))
+                finished = rng.random() < 0.8
+                routes.append(
+                    Route(
+                        name=f"Route {index}",
+                        company=company,
+                        zone=zone,
+                        assigned_vehicle_id=rng.choice(vehicle_ids),
+                        status=rng.choice(statuses),
+                        scheduled_date=today - timedelta(days=rng.randint(0, 365)),
+                        scheduled_start_time=clock(6, 0),
+                        actual_start_time=started if finished else None,
+                        actual_end_time=started + timedelta(minutes=rng.randint(30, 600)) if finished else None,
+                        total_distance_km=round(rng.uniform(1, 80), 2),
+                    )
+                )
+            Route.objects.bulk_create(routes, batch_size=batch_size)
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from routes import distance
+from routes.models import Route
+
+
+class Command(BaseCommand):
+    help = "Recompute planned (stop sequence) and driven (location history) route distances."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--route", type=int, action="append", help="Only this route id (repeatable)")
+
+    def handle(self, *args, **options):
+        routes = Route.objects.all()
+        if options["route"]:
+            routes = routes.filter(pk__in=options["route"])
+        count = distance.rebuild(routes)
+        self.stdout.write(self.style.SUCCESS(f"Recomputed distances for {count} routes."))
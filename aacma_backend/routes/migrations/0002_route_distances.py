@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("routes", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="route",
+            name="distance_through",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="route",
+            name="planned_distance_km",
+            field=models.FloatField(default=0),
+        ),
+    ]
@@ -36,7 +36,12 @@ class Route(models.Model):
     actual_end_time = models.DateTimeField(null=True, blank=True)
     total_stops = models.IntegerField(default=0)
     completed_stops = models.IntegerField(default=0)
+    # Along the stops in sequence order (routes.distance.update_planned).
+    planned_distance_km = models.FloatField(default=0)
+    # Driven by the assigned vehicle since actual_start_time, from its location
+    # history; distance_through is the last fix counted.
     total_distance_km = models.FloatField(default=0)
+    distance_through = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
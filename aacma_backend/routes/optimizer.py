@@ -0,0 +1,247 @@
+"""
+Stop sequencing: a short tour from a depot through every stop.
+
+``solve`` builds a nearest-neighbour tour and improves it with 2-opt (reverse
+a stretch of the tour) and Or-opt (move a run of one to three stops, either
+way round, elsewhere) until neither finds an improving move or the time
+budget runs out. Candidate moves only look at each stop's ``NEIGHBOURS``
+nearest stops, so a pass costs O(n) rather than O(n^2).
+
+The time budget covers the local search only. Setting up (the distance
+matrix, each stop's sorted neighbours and the nearest-neighbour tour) costs
+O(n^2 log n) whatever the budget: about 65 ms for 400 stops and 0.5 s for
+1000. ``optimize_route`` therefore refuses routes with more than
+``MAX_STOPS`` pending stops.
+
+Distances are straight lines on an equirectangular projection around the
+depot, which at city scale is within a fraction of a percent of haversine.
+With ``return_to_depot=False`` the tour is a path: legs back to the depot
+cost nothing.
+
+``optimize_route`` applies this to a route's pending stops and saves the new
+``sequence_number`` values in one bulk update. The solver runs without
+holding locks; the stops are then locked with ``select_for_update`` and the
+new order is only saved if the route and its stops are as they were read,
+so a concurrent optimize or stop update is never silently overwritten.
+"""
+from __future__ import annotations
+
+import math
+import time
+from array import array
+from itertools import repeat
+
+from django.db import transaction
+
+from fleet.geo import EARTH_RADIUS_KM
+
+from . import distance
+from .models import Route, RouteStop
+
+DEFAULT_TIME_BUDGET_S = 1.0
+NEIGHBOURS = 10
+EPSILON = 1e-9
+OPTIMIZABLE_STATUSES = ("scheduled", "in_progress")
+MAX_STOPS = 400
+
+
+class RouteChanged(Exception):
+    """The route or its stops changed while a new order was being computed."""
+
+
+class TooManyStops(Exception):
+    """The route has more pending stops than ``MAX_STOPS``."""
+
+
+def _project(points, origin) -> list[tuple[float, float]]:
+    scale = math.cos(math.radians(origin[0]))
+    km = math.radians(1) * EARTH_RADIUS_KM
+    return [((lng - origin[1]) * scale * km, (lat - origin[0]) * km) for lat, lng in points]
+
+
+class _Tour:
+    """Node 0 is the depot and stays at position 0."""
+
+    def __init__(self, xy, return_to_depot: bool):
+        self.size = len(xy)
+        self.matrix = [array("d", map(math.dist, repeat(p), xy)) for p in xy]
+        if not return_to_depot:
+            for row in self.matrix:
+                row[0] = 0.0
+        count = min(NEIGHBOURS, self.size - 2)
+        self.neighbours = [
+            sorted((j for j in range(1, self.size) if j != i), key=row.__getitem__)[:count]
+            for i, row in enumerate(self.matrix)
+        ]
+        self.order: list[int] = []
+        self.position: list[int] = []
+
+    def nearest_neighbour(self) -> None:
+        unvisited = set(range(1, self.size))
+        order = [0]
+        while unvisited:
+            row = self.matrix[order[-1]]
+            nearest = min(unvisited, key=row.__getitem__)
+            unvisited.remove(nearest)
+            order.append(nearest)
+        self._set(order)
+
+    def _set(self, order: list[int]) -> None:
+        self.order = order
+        self.position = [0] * self.size
+        for index, node in enumerate(order):
+            self.position[node] = index
+
+    def length(self) -> float:
+        d, order = self.matrix, self.order
+        return math.fsum(d[a][b] for a, b in zip(order, order[1:] + order[:1]))
+
+    def _next(self, index: int) -> int:
+        return self.order[index + 1] if index + 1 < self.size else self.order[0]
+
+    def two_opt(self, deadline: float) -> int:
+        """One pass of improving 2-opt moves. Returns the moves made."""
+        d, moves = self.matrix, 0
+        for a in range(self.size):
+            if time.perf_counter() > deadline:
+                break
+            # Replace the edge after a, then the one before it, by an edge to a
+            # neighbour. Both are needed: legs back to the depot cost nothing
+            # on a path, so some improving moves only shorten the edge before.
+            for after in (True, False):
+                i = self.position[a]
+                removed = d[a][self._next(i)] if after else d[self.order[i - 1]][a]
+                for c in self.neighbours[a]:
+                    if d[a][c] >= removed - EPSILON:
+                        break
+                    j = self.position[c]
+                    # The edges leaving positions low and high are replaced by
+                    # reversing the stretch between them.
+                    low, high = sorted((i, j) if after else ((i - 1) % self.size, (j - 1) % self.size))
+                    if high - low < 2:
+                        continue
+                    first, last = self.order[low], self.order[high]
+                    after_first, after_last = self._next(low), self._next(high)
+                    delta = d[first][last] + d[after_first][after_last] - d[first][after_first] - d[last][after_last]
+                    if delta < -EPSILON:
+                        self.order[low + 1 : high + 1] = self.order[low + 1 : high + 1][::-1]
+                        self._set(self.order)
+                        moves += 1
+                        break
+        return moves
+
+    def or_opt(self, deadline: float) -> int:
+        """One pass of improving Or-opt moves (runs of 1-3 stops). Returns the moves made."""
+        d, moves = self.matrix, 0
+        for length in (1, 2, 3):
+            for start_node in range(1, self.size):
+                if time.perf_counter() > deadline:
+                    return moves
+                start = self.position[start_node]
+                end = start + length - 1
+                if end >= self.size:
+                    continue
+                run = self.order[start : end + 1]
+                head, tail = run[0], run[-1]
+                before, after = self.order[start - 1], self._next(end)
+                gain = d[before][head] + d[tail][after] - d[before][after]
+                best = None
+                for c in {0, *self.neighbours[head], *self.neighbours[tail]}:
+                    k = self.position[c]
+                    if start - 1 <= k <= end:
+                        continue
+                    e = self._next(k)
+                    # Insert between c and e, forwards or reversed.
+                    for cost, reverse in (
+                        (d[c][head] + d[tail][e] - d[c][e], False),
+                        (d[c][tail] + d[head][e] - d[c][e], True),
+                    ):
+                        if cost < gain - EPSILON and (best is None or cost < best[0]):
+                            best = (cost, c, reverse)
+                if best:
+                    _, c, reverse = best
+                    rest = self.order[:start] + self.order[end + 1 :]
+                    k = rest.index(c)
+                    self._set(rest[: k + 1] + (run[::-1] if reverse else run) + rest[k + 1 :])
+                    moves += 1
+        return moves
+
+
+def solve(
+    points: list[tuple[float, float]],
+    depot: tuple[float, float],
+    time_budget_s: float = DEFAULT_TIME_BUDGET_S,
+    return_to_depot: bool = True,
+) -> tuple[list[int], dict]:
+    """
+    Visiting order of the (lat, lng) ``points`` (as indexes) from ``depot``,
+    and stats: ``nearest_neighbour_km``, ``optimized_km``, ``passes``,
+    ``moves``, ``runtime_ms``. ``time_budget_s`` bounds the improvement
+    passes, not the set-up before them.
+    """
+    started = time.perf_counter()
+    deadline = started + time_budget_s
+    if len(points) < 2:
+        stats = {"nearest_neighbour_km": 0.0, "optimized_km": 0.0, "passes": 0, "moves": 0, "runtime_ms": 0.0}
+        return list(range(len(points))), stats
+    tour = _Tour(_project([depot] + list(points), depot), return_to_depot)
+    tour.nearest_neighbour()
+    nearest_neighbour_km = tour.length()
+    passes = moves = 0
+    while time.perf_counter() < deadline:
+        improved = tour.two_opt(deadline) + tour.or_opt(deadline)
+        passes += 1
+        moves += improved
+        if not improved:
+            break
+    return [node - 1 for node in tour.order[1:]], {
+        "nearest_neighbour_km": round(nearest_neighbour_km, 3),
+        "optimized_km": round(tour.length(), 3),
+        "passes": passes,
+        "moves": moves,
+        "runtime_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def _state(stop: RouteStop) -> tuple:
+    return stop.pk, stop.sequence_number, stop.status, stop.latitude, stop.longitude
+
+
+def optimize_route(route, depot, time_budget_s: float = DEFAULT_TIME_BUDGET_S, return_to_depot: bool = True) -> dict:
+    """
+    Reorder ``route``'s pending stops after the ones already visited (or
+    skipped), starting from ``depot``, and save the new sequence numbers.
+    Raises ``TooManyStops`` beyond ``MAX_STOPS`` pending stops, and
+    ``RouteChanged`` if the route is no longer scheduled or in progress, or
+    its stops changed meanwhile.
+    """
+    stops = list(RouteStop.objects.filter(route_id=route.pk).order_by("sequence_number", "id"))
+    snapshot = [_state(stop) for stop in stops]
+    fixed = [stop for stop in stops if stop.status != "pending"]
+    pending = [stop for stop in stops if stop.status == "pending"]
+    if len(pending) > MAX_STOPS:
+        raise TooManyStops(f"Routes with more than {MAX_STOPS} pending stops cannot be optimized.")
+    order, stats = solve(
+        [(stop.latitude, stop.longitude) for stop in pending], depot, time_budget_s, return_to_depot
+    )
+    before_km = distance.planned_km(route.pk)
+    sequence = fixed + [pending[index] for index in order]
+    for number, stop in enumerate(sequence, start=1):
+        stop.sequence_number = number
+    with transaction.atomic():
+        if not Route.objects.select_for_update().filter(pk=route.pk, status__in=OPTIMIZABLE_STATUSES).exists():
+            raise RouteChanged("Route is no longer scheduled or in progress.")
+        locked = RouteStop.objects.select_for_update().filter(route_id=route.pk).order_by("sequence_number", "id")
+        if [_state(stop) for stop in locked] != snapshot:
+            raise RouteChanged("Route stops changed while the new order was computed.")
+        RouteStop.objects.bulk_update(sequence, ["sequence_number"])
+        after_km = distance.update_planned(route.pk)
+    return {
+        "route_id": route.pk,
+        "stops": len(sequence),
+        "reordered": len(pending),
+        "planned_km_before": round(before_km, 3),
+        "planned_km_after": round(after_km, 3),
+        **stats,
+        "sequence": [stop.pk for stop in sequence],
+    }
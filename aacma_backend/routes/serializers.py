@@ -16,5 +16,19 @@ class RouteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Route
         fields = "__all__"
-        read_only_fields = ["id", "created_at", "updated_at", "total_stops", "completed_stops"]
+        read_only_fields = [
+            "id",
+            "created_at",
+            "updated_at",
+            "total_stops",
+            "completed_stops",
+            "planned_distance_km",
+            "total_distance_km",
+            "distance_through",
+        ]
 
+
+class RouteOptimizeSerializer(serializers.Serializer):
+    depot = serializers.ListField(child=serializers.FloatField(), min_length=2, max_length=2, required=False)
+    return_to_depot = serializers.BooleanField(default=True)
+    time_budget_ms = serializers.IntegerField(min_value=10, max_value=10000, default=1000)
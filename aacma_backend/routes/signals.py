@@ -0,0 +1,24 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from fleet.models import Vehicle
+from fleet.telemetry import pings_stored
+
+from . import distance
+from .models import RouteStop
+
+
+@receiver(post_save, sender=RouteStop, dispatch_uid="route-planned-distance-save")
+@receiver(post_delete, sender=RouteStop, dispatch_uid="route-planned-distance-delete")
+def update_planned_distance(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    route_id = instance.route_id
+    transaction.on_commit(lambda: distance.update_planned(route_id))
+
+
+@receiver(pings_stored, sender=Vehicle, dispatch_uid="route-driven-distance")
+def record_driven_distance(sender, vehicle, pings, **kwargs):
+    vehicle_id = vehicle.pk
+    transaction.on_commit(lambda: distance.record_pings(vehicle_id, pings))
@@ -0,0 +1,300 @@
+import math
+import random
+from datetime import date, time, timedelta
+from itertools import permutations
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from companies.models import WasteCompany
+from fleet import telemetry
+from fleet.geo import haversine_km, path_km
+from fleet.models import Vehicle
+from fleet.positions import PositionStore
+from zones.models import Zone
+
+from . import distance, utilization
+from .management.commands.benchmark_route_utilization import orm_loop
+from .models import Route, RouteStop
+from .optimizer import _project, solve
+
+User = get_user_model()
+
+
+DEPOT = (9.0, 38.75)
+
+
+def stops(count, seed, spread=0.05):
+    rng = random.Random(seed)
+    return [(DEPOT[0] + rng.uniform(-spread, spread), DEPOT[1] + rng.uniform(-spread, spread)) for _ in range(count)]
+
+
+def tour_km(points, order, return_to_depot):
+    """Length of visiting ``points`` in ``order`` from the depot, as ``solve`` measures it."""
+    xy = _project([DEPOT] + points, DEPOT)
+    path = [0] + [index + 1 for index in order] + ([0] if return_to_depot else [])
+    return math.fsum(math.dist(xy[a], xy[b]) for a, b in zip(path, path[1:]))
+
+
+class SolveTests(SimpleTestCase):
+    def solve(self, points, return_to_depot):
+        order, stats = solve(points, DEPOT, time_budget_s=10.0, return_to_depot=return_to_depot)
+        self.assertEqual(sorted(order), list(range(len(points))))
+        length = tour_km(points, order, return_to_depot)
+        self.assertAlmostEqual(stats["optimized_km"], length, places=3)
+        self.assertLessEqual(stats["optimized_km"], stats["nearest_neighbour_km"])
+        return order, length
+
+    def test_close_to_brute_force_optimum(self):
+        for return_to_depot in (True, False):
+            exact = 0
+            for seed in range(60):
+                points = stops(3 + seed % 5, seed)
+                _, length = self.solve(points, return_to_depot)
+                best = min(tour_km(points, order, return_to_depot) for order in permutations(range(len(points))))
+                self.assertGreaterEqual(length, best - 1e-9)
+                self.assertLessEqual(length, best * 1.1, (return_to_depot, seed))
+                exact += length <= best + 1e-9
+            self.assertGreaterEqual(exact, 50, return_to_depot)
+
+    def test_no_improving_move_left(self):
+        # With fewer stops than NEIGHBOURS the candidate lists are complete, so no
+        # 2-opt reversal or Or-opt move may shorten the result. On an open path
+        # the legs back to the depot are free, so the matrix is asymmetric.
+        for return_to_depot in (True, False):
+            for seed in range(40):
+                points = stops(10, 100 + seed)
+                order, length = self.solve(points, return_to_depot)
+                for i in range(len(order)):
+                    for j in range(i + 2, len(order) + 1):
+                        reversed_ = order[:i] + order[i:j][::-1] + order[j:]
+                        self.assertGreater(tour_km(points, reversed_, return_to_depot), length - 1e-6)
+                    for size in (1, 2, 3):
+                        run, rest = order[i : i + size], order[:i] + order[i + size :]
+                        for k in range(len(rest) + 1):
+                            for moved in (run, run[::-1]):
+                                candidate = rest[:k] + moved + rest[k:]
+                                self.assertGreater(tour_km(points, candidate, return_to_depot), length - 1e-6)
+
+    def test_open_path_ends_away_from_the_depot(self):
+        # Stops on a line leading away from the depot: a path visits them
+        # outwards; a round trip costs twice as much.
+        points = [(DEPOT[0] + 0.01 * step, DEPOT[1]) for step in (3, 1, 4, 2, 5)]
+        order, length = self.solve(points, return_to_depot=False)
+        self.assertEqual(order, [1, 3, 0, 2, 4])
+        _, round_trip = self.solve(points, return_to_depot=True)
+        self.assertAlmostEqual(round_trip, 2 * length, places=6)
+
+    def test_trivial_routes(self):
+        self.assertEqual(solve([], DEPOT)[0], [])
+        self.assertEqual(solve([(9.01, 38.76)], DEPOT)[0], [0])
+        self.solve(stops(2, 1), return_to_depot=False)
+
+
+class PathTests(SimpleTestCase):
+    def test_matches_summed_haversine(self):
+        points = stops(200, seed=24)
+        lats, lngs = [lat for lat, _ in points], [lng for _, lng in points]
+        legs = sum(haversine_km(*a, *b) for a, b in zip(points, points[1:]))
+        self.assertAlmostEqual(path_km(lats, lngs), legs, places=9)
+
+    def test_fewer_than_two_points(self):
+        self.assertEqual(path_km([], []), 0.0)
+        self.assertEqual(path_km([9.0], [38.75]), 0.0)
+
+
+class RouteDistanceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        company = WasteCompany.objects.create(
+            name="Test Haulage", license_number="T-1", contact_email="t@example.com", contact_phone="1", address="-"
+        )
+        cls.vehicle = Vehicle.objects.create(
+            plate_number="AA-1", vehicle_type="compactor", capacity_kg=5000, company=company
+        )
+        cls.start = timezone.now() - timedelta(hours=2)
+        cls.route = Route.objects.create(
+            name="Bole",
+            company=company,
+            zone=Zone.objects.create(name="Bole", code="BL"),
+            assigned_vehicle=cls.vehicle,
+            status="in_progress",
+            scheduled_date=date.today(),
+            scheduled_start_time=time(6, 0),
+            actual_start_time=cls.start,
+            total_distance_km=12.5,
+        )
+        # A drive east along the depot's parallel, one fix a minute.
+        cls.track = [(DEPOT[0], DEPOT[1] + minute * 0.001) for minute in range(60)]
+
+    def setUp(self):
+        store = PositionStore(flush_interval=10.0, cache_ttl=60, async_mode=False)
+        patcher = mock.patch("fleet.telemetry.get_position_store", return_value=store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def ingest(self, minutes):
+        fixes = [
+            {"recorded_at": self.start + timedelta(minutes=minute), "lat": lat, "lng": lng}
+            for minute, (lat, lng) in ((minute, self.track[minute]) for minute in minutes)
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            telemetry.ingest(self.vehicle, fixes)
+
+    def driven(self):
+        return Route.objects.values_list("total_distance_km", flat=True).get(pk=self.route.pk)
+
+    def expected(self, minutes):
+        points = [self.track[minute] for minute in sorted(minutes)]
+        return path_km([lat for lat, _ in points], [lng for _, lng in points])
+
+    def test_planned_distance_follows_stop_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first, _, last = (
+                RouteStop.objects.create(
+                    route=self.route, sequence_number=number, address="-", latitude=DEPOT[0], longitude=lng
+                )
+                for number, lng in enumerate((38.76, 38.78, 38.77), start=1)
+            )
+        km = Route.objects.values_list("planned_distance_km", flat=True).get(pk=self.route.pk)
+        self.assertAlmostEqual(km, path_km([DEPOT[0]] * 3, [38.76, 38.78, 38.77]))
+        self.assertAlmostEqual(km, distance.planned_km(self.route.pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            last.delete()
+        km = Route.objects.values_list("planned_distance_km", flat=True).get(pk=self.route.pk)
+        self.assertAlmostEqual(km, path_km([DEPOT[0]] * 2, [38.76, 38.78]))
+
+    def test_batches_add_up_to_the_whole_drive(self):
+        # The first fixes replace the total entered before distances were measured.
+        self.ingest(range(0, 20))
+        self.assertAlmostEqual(self.driven(), self.expected(range(0, 20)))
+        for batch in (range(20, 40), range(40, 60)):
+            with self.assertNumQueries(5):
+                self.ingest(batch)
+        self.assertAlmostEqual(self.driven(), self.expected(range(60)))
+        self.route.refresh_from_db()
+        self.assertTrue(distance.measure_driven(self.route))
+        self.assertAlmostEqual(self.route.total_distance_km, self.driven())
+        self.assertEqual(self.route.distance_through, self.start + timedelta(minutes=59))
+
+    def test_late_fixes_remeasure_the_route(self):
+        self.ingest(range(0, 60, 2))
+        self.ingest(range(1, 60, 2))
+        self.assertAlmostEqual(self.driven(), self.expected(range(60)))
+
+    def test_fixes_outside_the_route_are_not_counted(self):
+        Route.objects.filter(pk=self.route.pk).update(actual_end_time=self.start + timedelta(minutes=29))
+        self.ingest(range(60))
+        self.assertAlmostEqual(self.driven(), self.expected(range(30)))
+
+    def test_route_without_fixes_keeps_its_total(self):
+        self.assertFalse(distance.rebuild_driven(self.route))
+        self.assertEqual(self.driven(), 12.5)
+
+
+class OptimizeViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        company = WasteCompany.objects.create(
+            name="Test Haulage", license_number="T-1", contact_email="t@example.com", contact_phone="1", address="-"
+        )
+        cls.user = User.objects.create_user("manager", password="x", user_type="waste_company", company=company)
+        cls.route = Route.objects.create(
+            name="Bole",
+            company=company,
+            zone=Zone.objects.create(name="Bole", code="BL"),
+            scheduled_date=date.today(),
+            scheduled_start_time=time(6, 0),
+        )
+        # Stops on a line east of the depot, in a scrambled order.
+        RouteStop.objects.bulk_create(
+            [
+                RouteStop(route=cls.route, sequence_number=number, address="-", latitude=DEPOT[0], longitude=lng)
+                for number, lng in enumerate((38.78, 38.76, 38.79, 38.77), start=1)
+            ]
+        )
+
+    def optimize(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        # An open path, so only the outward order is shortest.
+        data = {"depot": list(DEPOT), "return_to_depot": False}
+        return client.post(f"/api/routes/{self.route.pk}/optimize/", data, format="json")
+
+    def test_reorders_pending_stops(self):
+        response = self.optimize()
+        self.assertEqual(response.status_code, 200)
+        longitudes = list(self.route.stops.order_by("sequence_number").values_list("longitude", flat=True))
+        self.assertEqual(longitudes, [38.76, 38.77, 38.78, 38.79])
+
+    def test_refuses_more_stops_than_the_set_up_can_handle_in_time(self):
+        with mock.patch("routes.optimizer.MAX_STOPS", 3):
+            response = self.optimize()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            list(self.route.stops.order_by("sequence_number").values_list("longitude", flat=True)),
+            [38.78, 38.76, 38.79, 38.77],
+        )
+
+
+class UtilizationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        company = WasteCompany.objects.create(
+            name="Test Haulage", license_number="T-1", contact_email="t@example.com", contact_phone="1", address="-"
+        )
+        zone = Zone.objects.create(name="Bole", code="BL")
+        vehicles = [
+            Vehicle.objects.create(
+                plate_number=f"AA-{index}", vehicle_type="compactor", capacity_kg=5000, company=company
+            )
+            for index in range(4)
+        ]
+        rng = random.Random(14)
+        now = timezone.now()
+        routes = []
+        for index in range(300):
+            started = now - timedelta(days=rng.randint(0, 60), minutes=rng.randint(0, 600))
+            finished = rng.random() < 0.7
+            routes.append(
+                Route(
+                    name=f"Route {index}",
+                    company=company,
+                    zone=zone,
+                    assigned_vehicle=rng.choice(vehicles + [None]),
+                    status=rng.choice(Route.STATUS_CHOICES)[0],
+                    scheduled_date=date.today() - timedelta(days=rng.randint(0, 60)),
+                    scheduled_start_time=time(6, 0),
+                    actual_start_time=started if finished or rng.random() < 0.5 else None,
+                    actual_end_time=started + timedelta(minutes=rng.randint(20, 500)) if finished else None,
+                    total_distance_km=round(rng.uniform(0, 80), 2),
+                )
+            )
+        Route.objects.bulk_create(routes)
+
+    def test_matches_row_by_row_loop(self):
+        recent = Route.objects.filter(scheduled_date__gte=date.today() - timedelta(days=20))
+        for queryset in (Route.objects.all(), recent):
+            expected, result = orm_loop(queryset), utilization.compute(queryset)
+            self.assertEqual(result["route_utilization"], expected["route_utilization"])
+            self.assertEqual(
+                [row["vehicle_id"] for row in result["vehicle_utilization"]],
+                [row["vehicle_id"] for row in expected["vehicle_utilization"]],
+            )
+            for row, expected_row in zip(result["vehicle_utilization"], expected["vehicle_utilization"]):
+                self.assertEqual(row["plate_number"], expected_row["plate_number"])
+                self.assertEqual(row["total_routes"], expected_row["total_routes"])
+                self.assertAlmostEqual(row["total_distance_km"], expected_row["total_distance_km"], places=6)
+                self.assertAlmostEqual(row["total_active_hours"], expected_row["total_active_hours"], places=6)
+
+    def test_empty_queryset(self):
+        self.assertEqual(
+            utilization.compute(Route.objects.none()), {"vehicle_utilization": [], "route_utilization": []}
+        )
+
+    def test_streamed_orm_loop_keeps_only_vehicle_totals(self):
+        streamed, full = orm_loop(Route.objects.all(), keep_routes=False), orm_loop(Route.objects.all())
+        self.assertEqual(streamed, {**full, "route_utilization": []})
@@ -0,0 +1,148 @@
+"""
+Columnar route and vehicle utilization.
+
+Routes are read with ``values_list`` in chunks and each chunk is transposed
+into typed arrays, one per column, instead of instantiating ``Route`` and
+``Vehicle`` objects. The database fills in missing vehicles and distances,
+so loading only transposes chunks. Active hours are then mapped over the
+start and end columns, and per-vehicle totals are summed in one pass over
+the vehicle, distance and hour arrays. (Sorting the rows by vehicle to sum
+each vehicle's slice was measured and is several times slower here.)
+
+Time windows come from the queryset passed in (for the analytics endpoints,
+``AnalyticsFilters.routes()`` on ``scheduled_date``).
+"""
+from __future__ import annotations
+
+from array import array
+from itertools import islice
+
+from django.db.models import FloatField, IntegerField, Value
+from django.db.models.functions import Coalesce
+
+from fleet.models import Vehicle
+
+ROUTE_FIELDS = (
+    "id",
+    "name",
+    "status",
+    "vehicle",
+    "distance",
+    "actual_start_time",
+    "actual_end_time",
+)
+NO_VEHICLE = 0
+CHUNK_SIZE = 5000
+
+
+class RouteColumns:
+    """One typed array (or list, for strings and datetimes) per route column."""
+
+    def __init__(self):
+        self.ids = array("q")
+        self.vehicle_ids = array("q")
+        self.distance_km = array("d")
+        self.names = []
+        self.statuses = []
+        self.starts = []
+        self.ends = []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def load(cls, queryset, chunk_size: int = CHUNK_SIZE) -> "RouteColumns":
+        columns = cls()
+        statuses = {}
+        rows = (
+            queryset.order_by("id")
+            .annotate(
+                vehicle=Coalesce("assigned_vehicle_id", Value(NO_VEHICLE), output_field=IntegerField()),
+                distance=Coalesce("total_distance_km", Value(0.0), output_field=FloatField()),
+            )
+            .values_list(*ROUTE_FIELDS)
+            .iterator(chunk_size=chunk_size)
+        )
+        while chunk := list(islice(rows, chunk_size)):
+            ids, names, status, vehicle_ids, distances, starts, ends = zip(*chunk)
+            columns.ids.extend(ids)
+            columns.names.extend(names)
+            # A handful of distinct statuses; share one string object each.
+            columns.statuses.extend(map(statuses.setdefault, status, status))
+            columns.vehicle_ids.extend(vehicle_ids)
+            columns.distance_km.extend(distances)
+            columns.starts.extend(starts)
+            columns.ends.extend(ends)
+        return columns
+
+
+def _active_hours(start, end) -> float:
+    if start is None or end is None:
+        return 0.0
+    return round((end - start).total_seconds() / 3600, 2)
+
+
+def active_hours(columns: RouteColumns) -> array:
+    return array("d", map(_active_hours, columns.starts, columns.ends))
+
+
+def vehicle_totals(columns: RouteColumns, hours: array) -> dict:
+    """``{vehicle_id: [routes, distance_km, active_hours]}`` in first-seen order."""
+    totals = {}
+    for vehicle_id, distance, duration in zip(columns.vehicle_ids, columns.distance_km, hours):
+        if vehicle_id == NO_VEHICLE:
+            continue
+        bucket = totals.get(vehicle_id)
+        if bucket is None:
+            totals[vehicle_id] = [1, distance, duration]
+        else:
+            bucket[0] += 1
+            bucket[1] += distance
+            bucket[2] += duration
+    return totals
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def compute(queryset) -> dict:
+    """Route and vehicle utilization for the routes in ``queryset``."""
+    columns = RouteColumns.load(queryset)
+    hours = active_hours(columns)
+    totals = vehicle_totals(columns, hours)
+    plates = dict(Vehicle.objects.filter(id__in=list(totals)).values_list("id", "plate_number")) if totals else {}
+    return {
+        "vehicle_utilization": [
+            {
+                "vehicle_id": vehicle_id,
+                "plate_number": plates.get(vehicle_id),
+                "total_routes": routes,
+                "total_distance_km": distance,
+                "total_active_hours": duration,
+            }
+            for vehicle_id, (routes, distance, duration) in totals.items()
+        ],
+        "route_utilization": [
+            {
+                "route_id": pk,
+                "route_name": name,
+                "status": status,
+                "vehicle_id": vehicle_id or None,
+                "distance_km": distance,
+                "actual_start_time": _isoformat(start),
+                "actual_end_time": _isoformat(end),
+                "duration_hours": duration,
+            }
+            for pk, name, status, vehicle_id, distance, start, end, duration in zip(
+                columns.ids,
+                columns.names,
+                columns.statuses,
+                columns.vehicle_ids,
+                columns.distance_km,
+                columns.starts,
+                columns.ends,
+                hours,
+            )
+        ],
+    }
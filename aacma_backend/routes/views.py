@@ -3,8 +3,11 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
+from fleet import trajectory
+from fleet.positions import get_position_store
+from . import distance, optimizer
 from .models import Route, RouteStop
-from .serializers import RouteSerializer, RouteStopSerializer
+from .serializers import RouteOptimizeSerializer, RouteSerializer, RouteStopSerializer
 from accounts.permissions import IsWasteCompany, IsDriver
 
 
@@ -24,6 +27,7 @@ class CompanyRouteViewSet(viewsets.ModelViewSet):
         route = self.get_object()
         route.status = "in_progress"
         route.actual_start_time = timezone.now()
+        distance.measure_driven(route)
         route.save()
         return Response(self.get_serializer(route).data)
 
@@ -32,6 +36,7 @@ class CompanyRouteViewSet(viewsets.ModelViewSet):
         route = self.get_object()
         route.status = "completed"
         route.actual_end_time = timezone.now()
+        distance.measure_driven(route)
         route.save()
         return Response(self.get_serializer(route).data)
 
@@ -41,6 +46,55 @@ class CompanyRouteViewSet(viewsets.ModelViewSet):
         serializer = RouteStopSerializer(route.stops.all(), many=True)
         return Response(serializer.data)
 
+    @action(detail=True, methods=["post"])
+    def optimize(self, request, pk=None):
+        """
+        Reorder the pending stops for the shortest drive from ``depot``
+        (``[lat, lng]``, default: the assigned vehicle's position).
+        """
+        route = self.get_object()
+        if route.status not in optimizer.OPTIMIZABLE_STATUSES:
+            return Response(
+                {"detail": "Only scheduled or in-progress routes can be optimized"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        serializer = RouteOptimizeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        depot = data.get("depot")
+        if depot is None and route.assigned_vehicle_id:
+            position = get_position_store().get(route.assigned_vehicle)
+            if position:
+                depot = [position["lat"], position["lng"]]
+        if depot is None:
+            return Response(
+                {"detail": "depot is required when the route's vehicle has no known position"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            result = optimizer.optimize_route(
+                route, tuple(depot), data["time_budget_ms"] / 1000, data["return_to_depot"]
+            )
+        except optimizer.TooManyStops as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        except optimizer.RouteChanged as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_409_CONFLICT)
+        return Response(result)
+
+    @action(detail=True, methods=["get"])
+    def trajectory(self, request, pk=None):
+        """Simplified trace of the route's vehicle between its actual start and end, for replay."""
+        route = self.get_object()
+        if not route.assigned_vehicle_id or not route.actual_start_time:
+            return Response(
+                {"detail": "Route has no vehicle or has not started"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        tolerance = trajectory.tolerance_from_query_params(request.query_params)
+        end = route.actual_end_time or timezone.now()
+        data = trajectory.trace(route.assigned_vehicle_id, route.actual_start_time, end, tolerance)
+        return Response({"route_id": route.id, "vehicle_id": route.assigned_vehicle_id, **data})
+
 
 class CompanyRouteStopUpdateViewSet(viewsets.GenericViewSet):
     """
@@ -89,6 +143,7 @@ class DriverRouteViewSet(viewsets.ViewSet):
             return Response({"detail": "No scheduled route"}, status=status.HTTP_404_NOT_FOUND)
         route.status = "in_progress"
         route.actual_start_time = timezone.now()
+        distance.measure_driven(route)
         route.save()
         return Response(RouteSerializer(route).data)
 
@@ -120,6 +175,7 @@ class DriverRouteViewSet(viewsets.ViewSet):
             return Response({"detail": "No in-progress route"}, status=status.HTTP_404_NOT_FOUND)
         route.status = "completed"
         route.actual_end_time = timezone.now()
+        distance.measure_driven(route)
         route.save()
         return Response(RouteSerializer(route).data)
 
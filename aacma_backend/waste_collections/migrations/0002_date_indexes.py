@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("collections", "0001_initial"),
+        ("companies", "0001_initial"),
+        ("fleet", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="collectionrecord",
+            index=models.Index(
+                fields=["collected_at"], name="collrec_collected_at_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="collectionrequest",
+            index=models.Index(fields=["created_at"], name="collreq_created_at_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="collectionrequest",
+            index=models.Index(
+                fields=["collected_at"], name="collreq_collected_at_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("collections", "0002_date_indexes"),
+        ("zones", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="collectionrequest",
+            name="zone",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="collection_requests",
+                to="zones.zone",
+            ),
+        ),
+    ]
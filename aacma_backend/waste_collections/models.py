@@ -1,15 +1,24 @@
 from django.db import models
 
 
+# Approximate Addis Ababa bounding box: (south, west, north, east).
+ADDIS_BOUNDS = (8.8, 38.6, 9.1, 39.0)
+
+
+def within_addis(lat: float | None, lng: float | None) -> bool:
+    south, west, north, east = ADDIS_BOUNDS
+    return lat is not None and lng is not None and south <= lat <= north and west <= lng <= east
+
+
 def validate_addis_coordinates(lat: float | None, lng: float | None) -> None:
     """
     Very simple GPS validation to ensure coordinates are roughly within Addis Ababa.
 
-    Approx bounding box: lat 8.8 - 9.1, lng 38.6 - 39.0
+    Approx bounding box: lat 8.8 - 9.1, lng 38.6 - 39.0 (``ADDIS_BOUNDS``)
     """
     if lat is None or lng is None:
         return
-    if not (8.8 <= lat <= 9.1 and 38.6 <= lng <= 39.0):
+    if not within_addis(lat, lng):
         raise ValueError("Coordinates must be within Addis Ababa boundaries.")
 
 
@@ -54,6 +63,14 @@ class CollectionRequest(models.Model):
     address = models.TextField()
     latitude = models.FloatField(null=True, blank=True)
     longitude = models.FloatField(null=True, blank=True)
+    # Zone containing the coordinates, set from zones.geofence when they change.
+    zone = models.ForeignKey(
+        "zones.Zone",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="collection_requests",
+    )
     special_instructions = models.TextField(blank=True)
     status = models.CharField(
         max_length=20, choices=STATUS_CHOICES, default="pending"
@@ -81,6 +98,12 @@ class CollectionRequest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at"], name="collreq_created_at_idx"),
+            models.Index(fields=["collected_at"], name="collreq_collected_at_idx"),
+        ]
+
     def clean(self):
         validate_addis_coordinates(self.latitude, self.longitude)
 
@@ -112,6 +135,9 @@ class CollectionRecord(models.Model):
     feedback = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["collected_at"], name="collrec_collected_at_idx")]
+
     def __str__(self) -> str:
         return f"Record for request {self.collection_request_id}"
 
@@ -17,6 +17,7 @@ class CollectionRequestSerializer(serializers.ModelSerializer):
         read_only_fields = [
             "id",
             "resident",
+            "zone",
             "created_at",
             "updated_at",
             "assigned_company",
@@ -0,0 +1,100 @@
+from datetime import date
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from companies.models import WasteCompany
+from fleet import dispatch
+from fleet.live import LiveFleetIndex
+from fleet.models import Vehicle
+
+from .models import CollectionRequest
+
+User = get_user_model()
+
+
+class AssignTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = WasteCompany.objects.create(
+            name="Clean City", license_number="L-1", contact_email="a@example.com", contact_phone="1", address="-"
+        )
+        now = timezone.now()
+        cls.small, cls.large = (
+            Vehicle.objects.create(
+                plate_number=plate,
+                vehicle_type="compactor",
+                capacity_kg=capacity,
+                company=cls.company,
+                current_status="active",
+                last_location_lat=lat,
+                last_location_lng=38.75,
+                last_location_update=now,
+            )
+            for plate, capacity, lat in (("AA-1", 15, 9.0), ("AA-2", 500, 9.05))
+        )
+        cls.resident = User.objects.create_user("resident", password="x", user_type="resident")
+        cls.manager = User.objects.create_user("manager", password="x", user_type="waste_company", company=cls.company)
+        # Two bags: 20 kg, which only the large vehicle can take.
+        cls.request = cls.create_request(quantity_bags=2, latitude=9.0, longitude=38.75)
+
+    @classmethod
+    def create_request(cls, **fields):
+        return CollectionRequest.objects.create(
+            resident=cls.resident,
+            waste_type="general",
+            preferred_date=date.today(),
+            preferred_time="morning",
+            address="-",
+            **fields,
+        )
+
+    def setUp(self):
+        patcher = mock.patch("fleet.dispatch.get_live_index", return_value=LiveFleetIndex())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def assign(self, **data):
+        return self.client.post(f"/api/collections/company/requests/{self.request.pk}/assign/", data, format="json")
+
+    def assert_unassigned(self):
+        self.request.refresh_from_db()
+        self.assertEqual(
+            (self.request.status, self.request.assigned_company_id, self.request.assigned_vehicle_id),
+            ("pending", None, None),
+        )
+
+    def test_nearest_vehicles_with_room(self):
+        vehicles = dispatch.nearest_vehicles(9.0, 38.75, self.company.pk, min_capacity_kg=20)
+        self.assertEqual([vehicle["vehicle_id"] for vehicle in vehicles], [self.large.pk])
+        self.assertEqual(vehicles[0]["remaining_capacity_kg"], 500)
+
+    def test_assigns_nearest_vehicle_with_room(self):
+        response = self.assign()
+        self.assertEqual(response.status_code, 200)
+        self.request.refresh_from_db()
+        self.assertEqual(
+            (self.request.status, self.request.assigned_company_id, self.request.assigned_vehicle_id),
+            ("assigned", self.company.pk, self.large.pk),
+        )
+
+    def test_refused_when_no_vehicle_has_room(self):
+        # Open requests already on the large vehicle count against its capacity.
+        self.create_request(estimated_weight_kg=490, status="assigned", assigned_vehicle=self.large)
+        response = self.assign()
+        self.assertEqual(response.status_code, 409)
+        self.assert_unassigned()
+
+    def test_chosen_vehicle_must_have_room(self):
+        response = self.assign(vehicle=self.small.pk)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("15.0 kg", response.data["detail"])
+        self.assert_unassigned()
+        Vehicle.objects.filter(pk=self.large.pk).update(current_status="maintenance")
+        self.assertEqual(self.assign(vehicle=self.large.pk).status_code, 400)
+        self.assert_unassigned()
@@ -1,11 +1,17 @@
+from django.db import transaction
 from django.utils import timezone
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
 from .models import CollectionRequest, CollectionRecord
 from .serializers import CollectionRequestSerializer, CollectionRecordSerializer
 from accounts.permissions import IsWasteCompany, IsResident
+from fleet import dispatch
+from fleet.models import Vehicle
+from reports import latency
+from zones import geofence
 
 
 class ResidentCollectionRequestViewSet(viewsets.ModelViewSet):
@@ -20,7 +26,13 @@ class ResidentCollectionRequestViewSet(viewsets.ModelViewSet):
         return CollectionRequest.objects.filter(resident=self.request.user)
 
     def perform_create(self, serializer):
-        serializer.save(resident=self.request.user)
+        serializer.save(
+            resident=self.request.user,
+            zone_id=geofence.locate_for(serializer.validated_data),
+        )
+
+    def perform_update(self, serializer):
+        serializer.save(zone_id=geofence.locate_for(serializer.validated_data, serializer.instance))
 
     @action(detail=True, methods=["get"])
     def track(self, request, pk=None):
@@ -45,12 +57,101 @@ class CompanyCollectionRequestViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         return CollectionRequest.objects.all()
 
+    def _get_company(self):
+        company = self.request.user.company
+        if company is None:
+            raise ValidationError({"detail": "Your account is not linked to a waste company."})
+        return company
+
+    def _nearest(self, req, company, k):
+        if req.latitude is None or req.longitude is None or company is None:
+            return []
+        return dispatch.nearest_vehicles(
+            req.latitude,
+            req.longitude,
+            company.id,
+            k=k,
+            min_capacity_kg=dispatch.request_weight_kg(req),
+            exclude_request_id=req.pk,
+        )
+
+    @action(detail=True, methods=["get"], url_path="nearest-vehicles")
+    def nearest_vehicles(self, request, pk=None):
+        """Closest active vehicles with room for the request, nearest first."""
+        req = self.get_object()
+        if req.latitude is None or req.longitude is None:
+            return Response(
+                {"detail": "Request has no coordinates"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            k = int(request.query_params.get("k", dispatch.DEFAULT_K))
+        except ValueError:
+            k = 0
+        if not 1 <= k <= dispatch.MAX_K:
+            return Response(
+                {"detail": f"k must be between 1 and {dispatch.MAX_K}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(
+            {
+                "request_id": req.pk,
+                "required_kg": dispatch.request_weight_kg(req),
+                "vehicles": self._nearest(req, self._get_company(), k),
+            }
+        )
+
     @action(detail=True, methods=["post"])
     def assign(self, request, pk=None):
+        """
+        Assign the request to the user's company and to ``vehicle`` (an id),
+        or to the nearest active vehicle with room for it when none is given.
+        An explicit vehicle must also be active and have room for the request
+        (``400`` otherwise); ``409`` when no vehicle nearby has room. The
+        request is left unchanged when it is refused.
+        """
         req = self.get_object()
-        req.status = "assigned"
-        # In a full impl, bind to driver/vehicle/company
-        req.save()
+        company = self._get_company()
+        vehicle_id = request.data.get("vehicle")
+        chosen = vehicle_id not in (None, "")
+        if not chosen:
+            if req.latitude is None or req.longitude is None:
+                return Response(
+                    {"detail": "Request has no coordinates; choose a vehicle"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            candidates = self._nearest(req, company, 1)
+            if not candidates:
+                return Response(
+                    {"detail": "No active vehicle has room for the request"},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            vehicle_id = candidates[0]["vehicle_id"]
+        refused = status.HTTP_400_BAD_REQUEST if chosen else status.HTTP_409_CONFLICT
+        with transaction.atomic():
+            # Locked so concurrent assignments to one vehicle see each other's load.
+            try:
+                vehicle = Vehicle.objects.select_for_update().filter(pk=int(vehicle_id), company=company).first()
+            except (TypeError, ValueError):
+                vehicle = None
+            if vehicle is None:
+                return Response(
+                    {"detail": "Unknown vehicle"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            remaining = dispatch.remaining_capacity(company.id, exclude_request_id=req.pk).get(vehicle.pk)
+            if remaining is None:
+                return Response({"detail": "Vehicle is not active"}, status=refused)
+            if remaining < dispatch.request_weight_kg(req):
+                return Response(
+                    {"detail": f"Vehicle has only {remaining:.1f} kg of capacity left"},
+                    status=refused,
+                )
+            req.status = "assigned"
+            req.assigned_company = company
+            req.assigned_vehicle = vehicle
+            req.assigned_driver = vehicle.assigned_driver.first()
+            req.save()
         return Response(self.get_serializer(req).data)
 
     @action(detail=True, methods=["put"])
@@ -69,9 +170,12 @@ class CompanyCollectionRequestViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=True, methods=["post"])
     def complete(self, request, pk=None):
         req = self.get_object()
+        already_completed = req.status == "completed" and req.collected_at is not None
         req.status = "completed"
         req.collected_at = timezone.now()
         req.save()
+        if not already_completed:
+            transaction.on_commit(lambda: latency.record_completion(req))
         record, _ = CollectionRecord.objects.get_or_create(
             collection_request=req,
             defaults={
@@ -1,5 +1,25 @@
+from django import forms
 from django.contrib import admin
+
+from .geofence import parse_boundaries
 from .models import Zone
 
 
-admin.site.register(Zone)
\ No newline at end of file
+class ZoneAdminForm(forms.ModelForm):
+    class Meta:
+        model = Zone
+        fields = "__all__"
+
+    def clean_boundaries(self):
+        value = self.cleaned_data.get("boundaries")
+        if value:
+            try:
+                parse_boundaries(value)
+            except ValueError as exc:
+                raise forms.ValidationError(str(exc))
+        return value
+
+
+@admin.register(Zone)
+class ZoneAdmin(admin.ModelAdmin):
+    form = ZoneAdminForm
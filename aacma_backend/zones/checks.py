@@ -0,0 +1,33 @@
+from django.core import checks
+from django.db import DatabaseError
+
+from .geofence import parse_boundaries
+
+
+@checks.register(checks.Tags.database)
+def check_zone_boundaries(app_configs=None, databases=None, **kwargs):
+    """Zones whose stored boundaries the geofence cannot use (``check --database default``)."""
+    from .models import Zone
+
+    if not databases:
+        return []
+    errors = []
+    try:
+        zones = list(Zone.objects.exclude(boundaries__isnull=True).values_list("id", "name", "boundaries"))
+    except DatabaseError:
+        return []
+    for zone_id, name, boundaries in zones:
+        if not boundaries:
+            continue
+        try:
+            parse_boundaries(boundaries)
+        except ValueError as exc:
+            errors.append(
+                checks.Warning(
+                    f"Zone {zone_id} ({name}) has boundaries the geofence ignores: {exc}",
+                    hint="Save a GeoJSON Polygon or MultiPolygon with [lng, lat] positions, or clear them.",
+                    obj=f"zones.Zone:{zone_id}",
+                    id="zones.W001",
+                )
+            )
+    return errors
@@ -0,0 +1,260 @@
+"""
+Point-in-zone lookups over ``Zone.boundaries``.
+
+Boundaries are GeoJSON ``Polygon`` or ``MultiPolygon`` geometries (or a
+``Feature`` wrapping one), with positions in ``[lng, lat]`` order. A
+``Geofence`` compiles every active zone once into its edge list and a grid of
+``CELL_DEGREES`` square cells:
+
+* a cell no edge passes through is wholly inside one zone or in none, so a
+  point there is answered with one dict lookup;
+* a cell crossed by edges keeps, per zone, those edges and whether the cell's
+  centre is inside. A point in the cell is inside when the centre is and the
+  segment between them crosses an even number of edges.
+
+Either way a lookup touches a handful of edges, whatever the size of the
+polygons. Zones are expected not to overlap.
+
+``get_geofence`` keeps one compiled ``Geofence`` per process and recompiles it
+(one query) when a zone changes, as signalled through a cache version that is
+checked at most every ``CHECK_SECONDS``. Zones whose boundaries do not parse
+(free-form JSON saved before boundaries were validated) are logged and left
+out; ``manage.py check --database default`` lists them.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import threading
+import time
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+CELL_DEGREES = 0.005  # about 550 m at Addis Ababa's latitude
+CHECK_SECONDS = 5.0
+VERSION_KEY = "zones:geofence:version"
+
+
+def parse_boundaries(value) -> list[list[list[tuple[float, float]]]]:
+    """
+    Polygons of a GeoJSON geometry, each a list of (lng, lat) rings. Raises
+    ``ValueError`` for anything that is not a valid Polygon or MultiPolygon.
+    """
+    if not isinstance(value, dict):
+        raise ValueError("Expected a GeoJSON Polygon or MultiPolygon object.")
+    if value.get("type") == "Feature":
+        value = value.get("geometry") or {}
+    kind, coordinates = value.get("type"), value.get("coordinates")
+    if kind == "Polygon":
+        polygons = [coordinates]
+    elif kind == "MultiPolygon" and isinstance(coordinates, list):
+        polygons = coordinates
+    else:
+        raise ValueError("Expected a GeoJSON Polygon or MultiPolygon object.")
+    parsed = []
+    for polygon in polygons:
+        if not isinstance(polygon, list) or not polygon:
+            raise ValueError("Each polygon needs at least one ring.")
+        parsed.append([_parse_ring(ring) for ring in polygon])
+    if not parsed:
+        raise ValueError("A MultiPolygon needs at least one polygon.")
+    return parsed
+
+
+def _parse_ring(ring) -> list[tuple[float, float]]:
+    if not isinstance(ring, list):
+        raise ValueError("Each ring must be a list of [lng, lat] positions.")
+    points = []
+    for position in ring:
+        if (
+            not isinstance(position, (list, tuple))
+            or len(position) < 2
+            or not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in position[:2])
+        ):
+            raise ValueError("Each position must be [lng, lat].")
+        lng, lat = float(position[0]), float(position[1])
+        if not (-180 <= lng <= 180 and -90 <= lat <= 90):
+            raise ValueError("Positions must be [lng, lat] in degrees.")
+        points.append((lng, lat))
+    if len(points) > 1 and points[0] == points[-1]:
+        points.pop()
+    if len(set(points)) < 3:
+        raise ValueError("Each ring needs at least three distinct positions.")
+    return points
+
+
+def _edges(polygons) -> list[tuple[float, float, float, float]]:
+    edges = []
+    for polygon in polygons:
+        for ring in polygon:
+            for index, (x1, y1) in enumerate(ring):
+                x2, y2 = ring[index - 1]
+                if (x1, y1) != (x2, y2):
+                    edges.append((x1, y1, x2, y2))
+    return edges
+
+
+def _contains(edges, x: float, y: float) -> bool:
+    """Even-odd ray casting; holes and the parts of a MultiPolygon need no special case."""
+    inside = False
+    for x1, y1, x2, y2 in edges:
+        if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+            inside = not inside
+    return inside
+
+
+class Geofence:
+    def __init__(self, zones, cell_degrees: float = CELL_DEGREES):
+        """
+        ``zones``: (zone id, boundaries) pairs. Zones without boundaries are
+        skipped, as are (with a warning) zones whose boundaries do not parse.
+        """
+        self.cell_degrees = cell_degrees
+        # cell -> zone id, for cells wholly inside a zone
+        self._interior: dict[tuple[int, int], int] = {}
+        # cell -> [(zone id, centre lng, centre lat, centre inside, edges crossing the cell)]
+        self._boundary: dict[tuple[int, int], list[tuple]] = {}
+        self.zone_ids: list[int] = []
+        self.edge_count = 0
+        self.invalid_zone_ids: list[int] = []
+        for zone_id, boundaries in zones:
+            if not boundaries:
+                continue
+            try:
+                polygons = parse_boundaries(boundaries)
+            except ValueError as exc:
+                logger.warning("Zone %s left out of the geofence: %s", zone_id, exc)
+                self.invalid_zone_ids.append(zone_id)
+                continue
+            self._add(zone_id, _edges(polygons))
+
+    @classmethod
+    def from_zones(cls) -> "Geofence":
+        from .models import Zone
+
+        zones = Zone.objects.filter(is_active=True, boundaries__isnull=False).order_by("id")
+        return cls(zones.values_list("id", "boundaries"))
+
+    def _cell(self, lat: float, lng: float) -> tuple[int, int]:
+        return math.floor(lat / self.cell_degrees), math.floor(lng / self.cell_degrees)
+
+    def _add(self, zone_id: int, edges: list) -> None:
+        size = self.cell_degrees
+        crossing: dict[tuple[int, int], list] = {}
+        for edge in edges:
+            x1, y1, x2, y2 = edge
+            # Every cell of the edge's box: a superset of the cells it passes through.
+            low_row, low_col = self._cell(min(y1, y2), min(x1, x2))
+            high_row, high_col = self._cell(max(y1, y2), max(x1, x2))
+            for row in range(low_row, high_row + 1):
+                for col in range(low_col, high_col + 1):
+                    crossing.setdefault((row, col), []).append(edge)
+        low_row, low_col = self._cell(min(e[1] for e in edges), min(e[0] for e in edges))
+        high_row, high_col = self._cell(max(e[1] for e in edges), max(e[0] for e in edges))
+        for row in range(low_row, high_row + 1):
+            for col in range(low_col, high_col + 1):
+                lng, lat = (col + 0.5) * size, (row + 0.5) * size
+                inside = _contains(edges, lng, lat)
+                cell_edges = crossing.get((row, col))
+                if cell_edges:
+                    self._boundary.setdefault((row, col), []).append((zone_id, lng, lat, inside, tuple(cell_edges)))
+                elif inside:
+                    self._interior.setdefault((row, col), zone_id)
+        self.zone_ids.append(zone_id)
+        self.edge_count += len(edges)
+
+    def locate(self, lat: float, lng: float) -> int | None:
+        """Id of the zone containing the point, or None."""
+        cell = (math.floor(lat / self.cell_degrees), math.floor(lng / self.cell_degrees))
+        zone_id = self._interior.get(cell)
+        if zone_id is not None:
+            return zone_id
+        for zone_id, cx, cy, inside, edges in self._boundary.get(cell, ()):
+            # Count the edges crossing the segment from the point to the cell centre.
+            dx, dy = cx - lng, cy - lat
+            for x1, y1, x2, y2 in edges:
+                if ((dx * (y1 - lat) - dy * (x1 - lng)) > 0) != ((dx * (y2 - lat) - dy * (x2 - lng)) > 0):
+                    ex, ey = x2 - x1, y2 - y1
+                    if ((ex * (lat - y1) - ey * (lng - x1)) > 0) != ((ex * (cy - y1) - ey * (cx - x1)) > 0):
+                        inside = not inside
+            if inside:
+                return zone_id
+        return None
+
+    def locate_many(self, points) -> list[int | None]:
+        """``locate`` for each (lat, lng) pair."""
+        locate = self.locate
+        return [locate(lat, lng) for lat, lng in points]
+
+    def stats(self) -> dict:
+        return {
+            "zones": len(self.zone_ids),
+            "invalid_zones": len(self.invalid_zone_ids),
+            "edges": self.edge_count,
+            "interior_cells": len(self._interior),
+            "boundary_cells": len(self._boundary),
+        }
+
+
+_geofence: Geofence | None = None
+_version = None
+_checked_at = 0.0
+_geofence_lock = threading.Lock()
+
+
+def _current_version() -> int:
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = int(time.time() * 1000)
+        if not cache.add(VERSION_KEY, version, timeout=None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def get_geofence() -> Geofence:
+    """This process's compiled zones, recompiled after ``invalidate``."""
+    global _geofence, _version, _checked_at
+    now = time.monotonic()
+    if _geofence is not None and now - _checked_at < CHECK_SECONDS:
+        return _geofence
+    with _geofence_lock:
+        if _geofence is None or now - _checked_at >= CHECK_SECONDS:
+            version = _current_version()
+            if _geofence is None or version != _version:
+                _geofence = Geofence.from_zones()
+                _version = version
+            _checked_at = now
+    return _geofence
+
+
+def invalidate() -> None:
+    """Make every process recompile its zones within ``CHECK_SECONDS``; this one immediately."""
+    global _checked_at
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, int(time.time() * 1000), timeout=None)
+    _checked_at = 0.0
+
+
+def locate(lat: float | None, lng: float | None) -> int | None:
+    """Id of the zone containing the point, or None (also for a missing coordinate)."""
+    if lat is None or lng is None:
+        return None
+    return get_geofence().locate(lat, lng)
+
+
+def locate_for(data: dict, instance=None) -> int | None:
+    """
+    Zone of a serializer's validated ``latitude``/``longitude``, falling back to
+    ``instance``'s coordinates for a partial update.
+    """
+    lat = data.get("latitude", getattr(instance, "latitude", None))
+    lng = data.get("longitude", getattr(instance, "longitude", None))
+    return locate(lat, lng)
+
+
+def locate_many(points) -> list[int | None]:
+    return get_geofence().locate_many(points)
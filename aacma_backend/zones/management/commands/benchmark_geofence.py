@@ -0,0 +1,101 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from aacma.benchmarking import best_of
+from waste_collections.models import ADDIS_BOUNDS
+from zones.geofence import Geofence, _contains, _edges, parse_boundaries
+
+
+def tiled_zones(rows: int, cols: int, vertices: int, seed: int = 0) -> list[tuple[int, dict]]:
+    """
+    ``rows`` x ``cols`` zones tiling the Addis bounding box, with ragged
+    borders of ``vertices`` points per side shared exactly by neighbours.
+    """
+    rng = random.Random(seed)
+    south, west, north, east = ADDIS_BOUNDS
+    step_lat, step_lng = (north - south) / rows, (east - west) / cols
+    corners = {
+        (r, c): (
+            west + c * step_lng + (rng.uniform(-0.2, 0.2) * step_lng if 0 < c < cols else 0),
+            south + r * step_lat + (rng.uniform(-0.2, 0.2) * step_lat if 0 < r < rows else 0),
+        )
+        for r in range(rows + 1)
+        for c in range(cols + 1)
+    }
+    borders = {}
+
+    def border(a, b):
+        key = (min(a, b), max(a, b))
+        if key not in borders:
+            (x1, y1), (x2, y2) = corners[key[0]], corners[key[1]]
+            # Jitter across the side only, so neighbouring borders never cross.
+            nx, ny = -(y2 - y1) * 0.05, (x2 - x1) * 0.05
+            inner = [(x1 + (x2 - x1) * t, y1 + (y2 - y1) * t) for t in (i / vertices for i in range(1, vertices))]
+            (r1, c1), (r2, c2) = key
+            outer = (r1 == r2 and r1 in (0, rows)) or (c1 == c2 and c1 in (0, cols))
+            borders[key] = [corners[key[0]]] + [
+                (x, y) if outer else (x + nx * rng.uniform(-1, 1), y + ny * rng.uniform(-1, 1)) for x, y in inner
+            ]
+        points = borders[key]
+        return points if key[0] == a else [corners[b]] + points[:0:-1]
+
+    zones = []
+    for r in range(rows):
+        for c in range(cols):
+            ring = []
+            around = [(r, c), (r, c + 1), (r + 1, c + 1), (r + 1, c), (r, c)]
+            for a, b in zip(around, around[1:]):
+                ring.extend(border(a, b))
+            ring.append(ring[0])
+            zones.append((r * cols + c + 1, {"type": "Polygon", "coordinates": [[list(p) for p in ring]]}))
+    return zones
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure point-in-zone lookups: the compiled geofence against ray "
+        "casting every zone's full polygon, on synthetic zones tiling Addis Ababa."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=3)
+        parser.add_argument("--cols", type=int, default=4)
+        parser.add_argument("--vertices", type=int, default=200, help="Points per zone side")
+        parser.add_argument("--points", type=int, default=100_000)
+
+    def handle(self, *args, **options):
+        zones = tiled_zones(options["rows"], options["cols"], options["vertices"])
+        started = time.perf_counter()
+        fence = Geofence(zones)
+        compile_ms = (time.perf_counter() - started) * 1000
+
+        rng = random.Random(1)
+        south, west, north, east = ADDIS_BOUNDS
+        points = [(rng.uniform(south, north), rng.uniform(west, east)) for _ in range(options["points"])]
+        compiled = [(zone_id, _edges(parse_boundaries(boundaries))) for zone_id, boundaries in zones]
+
+        def naive():
+            return [
+                next((zone_id for zone_id, edges in compiled if _contains(edges, lng, lat)), None)
+                for lat, lng in points
+            ]
+
+        started = time.perf_counter()
+        expected = naive()
+        naive_ms = (time.perf_counter() - started) * 1000
+        mismatches = sum(1 for a, b in zip(fence.locate_many(points), expected) if a != b)
+        fence_ms = best_of(lambda: fence.locate_many(points))
+
+        stats = fence.stats()
+        count = len(points)
+        self.stdout.write(f"zones                 {stats['zones']:>10,}")
+        self.stdout.write(f"edges                 {stats['edges']:>10,}")
+        self.stdout.write(f"interior cells        {stats['interior_cells']:>10,}")
+        self.stdout.write(f"boundary cells        {stats['boundary_cells']:>10,}")
+        self.stdout.write(f"compile ms            {compile_ms:>10.1f}")
+        self.stdout.write(f"points                {count:>10,}")
+        self.stdout.write(f"full ray casting      {naive_ms * 1000 / count:>10.2f} us/point")
+        self.stdout.write(f"geofence              {fence_ms * 1000 / count:>10.2f} us/point")
+        self.stdout.write(f"mismatches            {mismatches:>10,}")
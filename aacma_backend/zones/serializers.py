@@ -1,5 +1,6 @@
 from rest_framework import serializers
 
+from .geofence import parse_boundaries
 from .models import Zone
 
 
@@ -9,3 +10,17 @@ class ZoneSerializer(serializers.ModelSerializer):
         fields = "__all__"
         read_only_fields = ["id", "created_at"]
 
+    def validate_boundaries(self, value):
+        if value:
+            try:
+                parse_boundaries(value)
+            except ValueError as exc:
+                raise serializers.ValidationError(str(exc))
+        return value
+
+
+class LocatePointsSerializer(serializers.Serializer):
+    points = serializers.ListField(
+        child=serializers.ListField(child=serializers.FloatField(), min_length=2, max_length=2),
+        max_length=10000,
+    )
@@ -0,0 +1,13 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import geofence
+from .models import Zone
+
+
+@receiver(post_save, sender=Zone, dispatch_uid="geofence-zone-save")
+@receiver(post_delete, sender=Zone, dispatch_uid="geofence-zone-delete")
+def invalidate_geofence(sender, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(geofence.invalidate)
@@ -0,0 +1,90 @@
+import random
+
+from django.test import SimpleTestCase, TestCase
+
+from .geofence import Geofence, _contains, _edges, parse_boundaries
+from .models import Zone
+
+
+def square(west, south, size):
+    return [[west, south], [west + size, south], [west + size, south + size], [west, south + size], [west, south]]
+
+
+# A concave "U" with a square hole in its base, and a two-part MultiPolygon
+# next to it, both drawn across many 0.005 degree cells.
+U_ZONE = {
+    "type": "Polygon",
+    "coordinates": [
+        [
+            [38.700, 8.950], [38.760, 8.950], [38.760, 9.010], [38.745, 9.010], [38.745, 8.970],
+            [38.715, 8.970], [38.715, 9.010], [38.700, 9.010], [38.700, 8.950],
+        ],
+        square(38.7203, 8.9533, 0.0091),
+    ],
+}
+SPLIT_ZONE = {
+    "type": "MultiPolygon",
+    "coordinates": [
+        [[[38.770, 8.950], [38.8011, 8.9602], [38.7804, 8.9917], [38.770, 8.950]]],
+        [square(38.790, 8.995, 0.0137)],
+    ],
+}
+ZONES = {1: U_ZONE, 2: SPLIT_ZONE}
+
+
+class GeofenceTests(SimpleTestCase):
+    def setUp(self):
+        self.geofence = Geofence(ZONES.items())
+        self.edges = {zone_id: _edges(parse_boundaries(boundaries)) for zone_id, boundaries in ZONES.items()}
+
+    def brute_force(self, lat, lng):
+        for zone_id, edges in self.edges.items():
+            if _contains(edges, lng, lat):
+                return zone_id
+        return None
+
+    def test_matches_ray_casting_at_random_points(self):
+        rng = random.Random(22)
+        points = [(rng.uniform(8.94, 9.02), rng.uniform(38.69, 38.81)) for _ in range(20_000)]
+        self.assertEqual(self.geofence.locate_many(points), [self.brute_force(lat, lng) for lat, lng in points])
+
+    def test_boundary_cells_match_ray_casting(self):
+        # Points only in cells crossed by edges, where the answer comes from
+        # counting crossings between the point and the cell centre.
+        rng = random.Random(7)
+        size = self.geofence.cell_degrees
+        cells = sorted(self.geofence._boundary)
+        self.assertTrue(cells)
+        for row, col in cells:
+            for _ in range(25):
+                lat, lng = (row + rng.random()) * size, (col + rng.random()) * size
+                self.assertEqual(self.geofence.locate(lat, lng), self.brute_force(lat, lng), (lat, lng))
+
+    def test_hole_and_outside(self):
+        self.assertEqual(self.geofence.locate(8.955, 38.705), 1)
+        self.assertIsNone(self.geofence.locate(8.9575, 38.725))  # in the hole
+        self.assertIsNone(self.geofence.locate(9.000, 38.730))  # between the arms of the U
+        self.assertEqual(self.geofence.locate(9.000, 38.800), 2)
+        self.assertIsNone(self.geofence.locate(0.0, 0.0))
+
+    def test_unparseable_boundaries_are_skipped(self):
+        broken = {"type": "Polygon", "coordinates": [[[38.7, 8.9], [38.8, 8.9]]]}
+        with self.assertLogs("zones.geofence", "WARNING"):
+            geofence = Geofence([(1, U_ZONE), (3, broken), (4, "not geojson")])
+        self.assertEqual(geofence.zone_ids, [1])
+        self.assertEqual(geofence.invalid_zone_ids, [3, 4])
+        self.assertEqual(geofence.locate(8.955, 38.705), 1)
+
+    def test_parse_boundaries_rejects_lat_lng_order(self):
+        with self.assertRaises(ValueError):
+            parse_boundaries({"type": "Polygon", "coordinates": [[[8.9, 138.7], [8.9, 138.8], [9.0, 138.8]]]})
+
+
+class GeofenceFromZonesTests(TestCase):
+    def test_compiles_active_zones_only(self):
+        Zone.objects.create(name="U", code="U", boundaries=U_ZONE)
+        Zone.objects.create(name="Split", code="S", boundaries=SPLIT_ZONE, is_active=False)
+        Zone.objects.create(name="Unmapped", code="N")
+        geofence = Geofence.from_zones()
+        self.assertEqual(len(geofence.zone_ids), 1)
+        self.assertIsNone(geofence.locate(9.000, 38.800))
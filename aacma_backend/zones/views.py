@@ -1,7 +1,10 @@
 from rest_framework import viewsets, permissions
+from rest_framework.decorators import action
+from rest_framework.response import Response
 
+from . import geofence
 from .models import Zone
-from .serializers import ZoneSerializer
+from .serializers import LocatePointsSerializer, ZoneSerializer
 from accounts.permissions import IsDirectorate
 
 
@@ -10,3 +13,9 @@ class ZoneViewSet(viewsets.ModelViewSet):
     serializer_class = ZoneSerializer
     permission_classes = [permissions.IsAuthenticated, IsDirectorate]
 
+    @action(detail=False, methods=["post"], permission_classes=[permissions.IsAuthenticated])
+    def locate(self, request):
+        """Zone id (or null) for each ``[lat, lng]`` in ``points``, in order."""
+        serializer = LocatePointsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response({"zones": geofence.locate_many(serializer.validated_data["points"])})